@@ -0,0 +1,75 @@
+import json
+import os
+from types import CodeType, ModuleType
+from bytecode import Bytecode
+from rinhac import Compiler
+from rinhac.ast.json_parser import parse_json_to_object
+from rinhac.optimizer import infer_types
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+
+def program_path(name: str) -> str:
+    return os.path.join(PROGRAMS_DIR, name + ".json")
+
+
+def compile_program(json_path: str, entry_function: bool = False, **options) -> CodeType:
+    with open(json_path) as f:
+        json_ast = json.load(f)
+    ast = parse_json_to_object(json_ast, IndexLineMapper(json_path))
+    symbol_table = create_symbol_table(ast, entry_function=entry_function)
+    options.setdefault("types", infer_types(ast))
+    return Compiler(**options).to_bytecode(ast, Bytecode(), symbol_table).to_code()
+
+
+def load_program(json_path: str, **options) -> ModuleType:
+    code = compile_program(json_path, **options)
+    module = ModuleType(os.path.splitext(os.path.basename(json_path))[0])
+    exec(code, module.__dict__)
+    return module
+
+
+def _location() -> str:
+    return '"location": {"start": 0, "end": 0, "filename": "deep.rinha"}'
+
+
+def let_chain_json(depth: int) -> str:
+    """``let v0 = 0; let v1 = v0 + 1; ...; v<depth-1>`` as JSON text.
+
+    Built by string concatenation since json.dumps recurses per level too.
+    """
+    parts = ['{"name": "deep.rinha", "expression": ']
+    for index in range(depth):
+        if index == 0:
+            value = f'{{"kind": "Int", "value": 0, {_location()}}}'
+        else:
+            value = (
+                f'{{"kind": "Binary", "op": "Add", '
+                f'"lhs": {{"kind": "Var", "text": "v{index - 1}", {_location()}}}, '
+                f'"rhs": {{"kind": "Int", "value": 1, {_location()}}}, {_location()}}}'
+            )
+        parts.append(
+            f'{{"kind": "Let", "name": {{"text": "v{index}", {_location()}}}, '
+            f'"value": {value}, "next": '
+        )
+    parts.append(f'{{"kind": "Var", "text": "v{depth - 1}", {_location()}}}')
+    parts.append(f", {_location()}}}" * depth)
+    parts.append(f", {_location()}}}")
+    return "".join(parts)
+
+
+def nested_binary_json(depth: int) -> str:
+    """``let x = 1; x + (x + (... + x))`` with ``depth`` additions."""
+    var = f'{{"kind": "Var", "text": "x", {_location()}}}'
+    expression = f'{{"kind": "Binary", "op": "Add", "lhs": {var}, "rhs": ' * depth
+    expression += var + f", {_location()}}}" * depth
+    return (
+        '{"name": "deep.rinha", "expression": '
+        f'{{"kind": "Let", "name": {{"text": "x", {_location()}}}, '
+        f'"value": {{"kind": "Int", "value": 1, {_location()}}}, '
+        f'"next": {{"kind": "Let", "name": {{"text": "result", {_location()}}}, '
+        f'"value": {expression}, "next": {var}, {_location()}}}, {_location()}}}, '
+        f"{_location()}}}"
+    )
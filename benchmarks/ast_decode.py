@@ -0,0 +1,91 @@
+"""Parse time and peak RSS of decoding multi-megabyte JSON ASTs.
+
+``two-pass`` is ``load_json_ast`` followed by ``parse_json_to_object``,
+which keeps the whole dict tree alive while the AST objects are built;
+``single-pass`` is ``load_ast``, which builds them from the decoder's
+``object_hook``. Every measurement runs in a fresh interpreter so that the
+peak RSS (``ru_maxrss``) belongs to that decode alone; the RSS before
+decoding is subtracted.
+
+Usage: python -m benchmarks.ast_decode [sizes...] [--repeat N]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks import let_chain_json, nested_binary_json
+
+SHAPES = {
+    "let chain": let_chain_json,
+    "nested +": nested_binary_json,
+}
+METHODS = ("two-pass", "single-pass")
+
+
+def _max_rss_kib() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(method: str, json_path: str) -> dict:
+    """Decode ``json_path`` in this process; meant to run in a child."""
+    from rinhac.ast.json_parser import load_ast, load_json_ast, parse_json_to_object
+    from rinhac.utils.index_line_mapper import IndexLineMapper
+
+    rss_before = _max_rss_kib()
+    start = time.perf_counter()
+    with open(json_path, "rb") as f:
+        if method == "single-pass":
+            ast = load_ast(f, json_path)
+        else:
+            json_ast = load_json_ast(f)
+            ast = parse_json_to_object(json_ast, IndexLineMapper.for_ast(json_path, json_ast))
+            del json_ast
+    elapsed = time.perf_counter() - start
+    del ast
+    return {"seconds": elapsed, "peak_kib": _max_rss_kib() - rss_before}
+
+
+def run_child(method: str, json_path: str) -> dict:
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.ast_decode", "--child", method, json_path],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(process.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", nargs=2, metavar=("METHOD", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    print(f"{'shape':<11}{'nodes':>8}{'MiB':>7}{'method':>13}{'parse (ms)':>12}{'peak RSS (MiB)':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, make_json in SHAPES.items():
+            for size in args.sizes:
+                json_path = os.path.join(directory, "deep.json")
+                with open(json_path, "w") as f:
+                    f.write(make_json(size))
+                megabytes = os.path.getsize(json_path) / 2**20
+                for method in METHODS:
+                    samples = [run_child(method, json_path) for _ in range(args.repeat)]
+                    seconds = min(sample["seconds"] for sample in samples)
+                    peak = min(sample["peak_kib"] for sample in samples) / 1024
+                    print(
+                        f"{label:<11}{size:>8}{megabytes:>7.1f}{method:>13}"
+                        f"{seconds * 1e3:>12.1f}{peak:>16.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Bytes per node of a decoded AST, with and without the location table.
+
+``table`` is the AST as ``load_ast`` returns it: nodes hold integer ids
+into a ``LocationTable``. ``objects`` rebuilds the previous layout on the
+same tree, a ``Location`` object per node with its own copy of the
+filename, as the JSON decoder produced it. Both are measured as the memory
+still allocated (``tracemalloc``) once the tree is built.
+
+Usage: python -m benchmarks.ast_memory [sizes...]
+"""
+import argparse
+import dataclasses
+import gc
+import os
+import tempfile
+import tracemalloc
+from benchmarks import let_chain_json, nested_binary_json
+from rinhac.ast import LocationTable
+from rinhac.ast.json_parser import load_ast
+
+SHAPES = {
+    "let chain": let_chain_json,
+    "nested +": nested_binary_json,
+}
+
+
+def _nodes(ast):
+    pending = [ast]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif dataclasses.is_dataclass(node):
+            yield node
+            pending.extend(
+                getattr(node, field.name) for field in dataclasses.fields(node) if field.compare
+            )
+
+
+def to_location_objects(ast):
+    """Give every node of ``ast`` its own ``Location``, dropping the table."""
+    locations = ast.locations
+    for node in list(_nodes(ast)):
+        location = locations[node.location]
+        # The decoder created a new filename string per location.
+        location.filename = location.filename.encode().decode()
+        node.location = location
+    ast.locations = LocationTable()
+
+
+def retained_bytes(json_path: str, layout: str) -> tuple[int, int]:
+    """Bytes still allocated after building the AST, and its node count."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    with open(json_path, "rb") as f:
+        ast = load_ast(f, json_path)
+    nodes = len(ast.locations)
+    if layout == "objects":
+        to_location_objects(ast)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del ast
+    return retained, nodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 50_000])
+    args = parser.parse_args(argv)
+
+    print(f"{'shape':<11}{'depth':>8}{'nodes':>9}{'layout':>9}{'MiB':>8}{'bytes/node':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, make_json in SHAPES.items():
+            for size in args.sizes:
+                json_path = os.path.join(directory, "deep.json")
+                with open(json_path, "w") as f:
+                    f.write(make_json(size))
+                for layout in ("objects", "table"):
+                    retained, nodes = retained_bytes(json_path, layout)
+                    print(
+                        f"{label:<11}{size:>8}{nodes:>9}{layout:>9}"
+                        f"{retained / 2**20:>8.1f}{retained / nodes:>12.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
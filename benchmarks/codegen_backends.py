@@ -0,0 +1,102 @@
+"""Compile and run time of the bytecode and the Python source code generators.
+
+Both compile the same parsed, type-inferred AST. ``bytecode`` is
+``Compiler.to_bytecode`` with the peephole rewrites and assembly, as
+``rinhac -b`` builds; ``source`` is ``SourceCompiler.to_source`` followed by
+the builtin ``compile``. Run time is that of the module code with stdout
+discarded, printed output included.
+
+Usage: python -m benchmarks.codegen_backends [programs...] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import time
+from bytecode import Bytecode
+from benchmarks import program_path
+from rinhac import Compiler, SourceCompiler
+from rinhac.ast.json_parser import load_ast
+from rinhac.optimizer import PeepholeOptimizer, infer_types
+from rinhac.runtime import close_output
+from rinhac.symbol_table import create_symbol_table
+
+PROGRAMS = [
+    "fib",
+    "combination",
+    "sum",
+    "sum_to_n",
+    "tuple_list",
+    "string_building",
+    "deep_lets",
+    "print_loop",
+]
+
+
+def compile_bytecode(ast, symbol_table, types):
+    optimizer = PeepholeOptimizer()
+    compiler = Compiler(types=types, optimizer=optimizer)
+    bytecode = compiler.to_bytecode(ast, Bytecode(), symbol_table)
+    optimizer.optimize(bytecode, nested=False)
+    return bytecode.to_code()
+
+
+def compile_source(ast, symbol_table, types):
+    return SourceCompiler(types=types).to_code(ast, symbol_table)
+
+
+BACKENDS = {"bytecode": compile_bytecode, "source": compile_source}
+
+
+def best_compile_time(compile_backend, ast, symbol_table, types, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        code = compile_backend(ast, symbol_table, types)
+        best = min(best, time.perf_counter() - start)
+    return best, code
+
+
+def best_run_time(code, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        namespace = {"__name__": "__main__"}
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            exec(code, namespace)
+            close_output(namespace)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("programs", nargs="*", default=PROGRAMS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'program':<17}{'compile bytecode':>17}{'source':>11}"
+        f"{'run bytecode':>15}{'source':>11}{'ratio':>8}"
+    )
+    for program in args.programs:
+        json_path = program_path(program)
+        with open(json_path, "rb") as f:
+            ast = load_ast(f, json_path)
+        symbol_table = create_symbol_table(ast)
+        types = infer_types(ast)
+        compile_times, run_times = {}, {}
+        for name, compile_backend in BACKENDS.items():
+            compile_times[name], code = best_compile_time(
+                compile_backend, ast, symbol_table, types, args.repeat
+            )
+            run_times[name] = best_run_time(code, args.repeat)
+        print(
+            f"{program:<17}{compile_times['bytecode'] * 1e3:>14.2f} ms"
+            f"{compile_times['source'] * 1e3:>8.2f} ms"
+            f"{run_times['bytecode'] * 1e3:>12.1f} ms{run_times['source'] * 1e3:>8.1f} ms"
+            f"{run_times['source'] / run_times['bytecode']:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compile time of Compiler.to_bytecode as the AST grows.
+
+Deep ``Let`` chains and deeply nested ``+`` expressions are compiled at
+doubling sizes. With a single instruction buffer per code object the time
+per node stays flat; copying every child's instructions into its parent
+made it grow with the depth.
+
+Usage: python -m benchmarks.codegen_scaling [max_size] [repeat]
+"""
+import os
+import sys
+import tempfile
+import time
+from bytecode import Bytecode
+from benchmarks import let_chain_json, nested_binary_json
+from rinhac import Compiler
+from rinhac.ast.json_parser import load_json_ast, parse_json_to_object
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+SHAPES = {
+    "let chain": let_chain_json,
+    "nested +": nested_binary_json,
+}
+
+
+def parse(json_text: str):
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "deep.json")
+        with open(json_path, "w") as f:
+            f.write(json_text)
+        with open(json_path) as f:
+            json_ast = load_json_ast(f)
+        return parse_json_to_object(json_ast, IndexLineMapper(json_path))
+
+
+def best_compile_time(ast, repeat: int) -> float:
+    symbol_table = create_symbol_table(ast)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Compiler().to_bytecode(ast, Bytecode(), symbol_table)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(max_size: int = 100_000, repeat: int = 3):
+    print(f"{'shape':<12}{'size':>10}{'to_bytecode (ms)':>18}{'ns/node':>10}")
+    for label, make_json in SHAPES.items():
+        size = 1_000
+        while size <= max_size:
+            elapsed = best_compile_time(parse(make_json(size)), repeat)
+            print(f"{label:<12}{size:>10}{elapsed * 1e3:>18.1f}{elapsed / size * 1e9:>10.0f}")
+            size *= 2
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,97 @@
+"""Run time of the benchmark programs under several CPython versions.
+
+Each interpreter compiles the programs with its own backend (3.10 opcodes,
+or ``RESUME``/``CALL``/``BINARY_OP`` from 3.11) and runs the module code
+``--repeat`` times in a child process; the best run is reported, and the
+speedup is relative to the first interpreter. Interpreters are looked up
+as ``python3.10``, ``python3.11`` and ``python3.12`` unless given with
+``--python``, and need the ``bytecode`` package installed.
+
+Usage: python -m benchmarks.cross_version [programs...] [--python PATH ...]
+                                          [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from benchmarks import compile_program, program_path
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAMS = ["fib", "combination", "sum_to_n", "tuple_list", "string_building"]
+DEFAULT_PYTHONS = ["python3.10", "python3.11", "python3.12"]
+
+
+def measure(programs: list[str], repeat: int) -> dict:
+    """Best run time of each program in this interpreter; run in a child."""
+    from rinhac.backend import backend_for
+
+    results = {}
+    for program in programs:
+        code = compile_program(program_path(program))
+        best = float("inf")
+        for _ in range(repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                exec(code, {"__name__": "__main__"})
+                best = min(best, time.perf_counter() - start)
+        results[program] = best
+    version = ".".join(map(str, backend_for().version))
+    return {"version": version, "seconds": results}
+
+
+def run_child(python: str, programs: list[str], repeat: int) -> dict:
+    process = subprocess.run(
+        [python, "-m", "benchmarks.cross_version", "--child", "--repeat", str(repeat), *programs],
+        cwd=REPOSITORY_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        error = process.stderr.strip().splitlines()
+        return {"error": error[-1] if error else f"exit status {process.returncode}"}
+    return json.loads(process.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("programs", nargs="*", default=PROGRAMS)
+    parser.add_argument("--python", action="append", help="Interpreter to compare; repeatable.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(measure(args.programs, args.repeat)))
+        return
+
+    pythons = args.python or [python for python in DEFAULT_PYTHONS if shutil.which(python)]
+    if not pythons:
+        sys.exit("no interpreter found; pass --python")
+    columns = []
+    for python in pythons:
+        result = run_child(python, args.programs, args.repeat)
+        if "error" in result:
+            print(f"{python}: skipped ({result['error']})", file=sys.stderr)
+            continue
+        columns.append(result)
+    if not columns:
+        sys.exit("no interpreter could run the programs")
+
+    baseline = columns[0]
+    print(f"{'program':<18}" + "".join(f"{'py' + column['version']:>12}" for column in columns))
+    for program in args.programs:
+        cells = []
+        for column in columns:
+            seconds = column["seconds"][program]
+            speedup = baseline["seconds"][program] / seconds
+            cells.append(f"{seconds * 1e3:>8.1f} ms" if column is baseline else f"{speedup:>11.2f}x")
+        print(f"{program:<18}" + "".join(f"{cell:>12}" for cell in cells))
+    print(f"(best of {args.repeat}; later columns are speedups over py{baseline['version']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Run time of whole programs compiled as module code or as an entry function.
+
+In module mode top-level bindings are globals (``STORE_NAME``/``LOAD_NAME``)
+and recursive functions find themselves with ``LOAD_GLOBAL``; with an entry
+function they are fast locals and closure cells.
+
+Usage: python -m benchmarks.entry_function [programs...] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import time
+from benchmarks import compile_program, program_path
+
+PROGRAMS = ["fib", "combination", "sum_to_n", "tuple_list", "string_building"]
+
+
+def best_time(code, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            exec(code, {"__name__": "__main__"})
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("programs", nargs="*", default=PROGRAMS)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print(f"{'program':<18}{'module (ms)':>13}{'entry fn (ms)':>15}{'speedup':>10}")
+    for program in args.programs:
+        path = program_path(program)
+        module_time = best_time(compile_program(path), args.repeat)
+        entry_time = best_time(compile_program(path, entry_function=True), args.repeat)
+        print(
+            f"{program:<18}{module_time * 1e3:>13.3f}{entry_time * 1e3:>15.3f}"
+            f"{module_time / entry_time:>9.2f}x"
+        )
+    print(f"(best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Build time of a large program after one of its functions is edited.
+
+The program binds ``functions`` top-level functions, each a chain of
+``body`` lets with a nested closure. ``full`` builds it without any cache,
+``cold`` fills an empty function cache, and ``edit`` rebuilds after the
+constant in one function changed: the whole-program compile cache misses,
+and only that function is compiled again, the others' code objects come
+from the function cache.
+
+Usage: python -m benchmarks.incremental_build [--functions N] [--body N]
+                                              [--repeat N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+import rinhac.__main__ as rinhac_main
+
+
+def _location() -> dict:
+    return {"start": 0, "end": 0, "filename": "incremental.rinha"}
+
+
+def _node(kind: str, **fields) -> dict:
+    return {"kind": kind, **fields, "location": _location()}
+
+
+def _function(index: int, body: int, constant: int) -> dict:
+    """``fn(n) => { let v0 = n; let v1 = v0 + c; ...; (fn() => v<body-1>)() }``."""
+    last = _node("Var", text=f"v{body - 1}")
+    term = _node("Call", callee=_node("Function", parameters=[], value=last), arguments=[])
+    for position in reversed(range(body)):
+        if position == 0:
+            value = _node("Var", text="n")
+        else:
+            value = _node(
+                "Binary",
+                op="Add",
+                lhs=_node("Var", text=f"v{position - 1}"),
+                rhs=_node("Int", value=constant + index),
+            )
+        term = _node(
+            "Let", name={"text": f"v{position}", "location": _location()}, value=value, next=term
+        )
+    return _node("Function", parameters=[{"text": "n", "location": _location()}], value=term)
+
+
+def program_json(functions: int, body: int, edited: int = -1) -> str:
+    term = _node("Print", value=_node("Int", value=0))
+    for index in reversed(range(functions)):
+        function = _function(index, body, 1000 if index == edited else 1)
+        term = _node(
+            "Let", name={"text": f"f{index}", "location": _location()}, value=function, next=term
+        )
+    return json.dumps({"name": "incremental.rinha", "expression": term, "location": _location()})
+
+
+def timed_build(ast_file: str, output: str, cache: bool) -> float:
+    start = time.perf_counter()
+    rinhac_main.build(ast_file, output, cache=cache)
+    return time.perf_counter() - start
+
+
+def measure(functions: int, body: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        ast_file = os.path.join(directory, "incremental.json")
+        output = os.path.join(directory, "incremental.pyc")
+        with open(ast_file, "w") as f:
+            f.write(program_json(functions, body))
+        with mock.patch.dict(os.environ, {"RINHAC_CACHE_DIR": os.path.join(directory, "cache")}):
+            full = timed_build(ast_file, output, cache=False)
+            cold = timed_build(ast_file, output, cache=True)
+            with open(ast_file, "w") as f:
+                f.write(program_json(functions, body, edited=functions // 2))
+            edit = timed_build(ast_file, output, cache=True)
+    return {"full": full, "cold": cold, "edit": edit}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", type=int, default=200)
+    parser.add_argument("--body", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.functions, args.body) for _ in range(args.repeat)]
+    best = {phase: min(run[phase] for run in runs) for phase in runs[0]}
+    print(f"{args.functions} functions of {args.body} lets (best of {args.repeat})")
+    for phase, seconds in best.items():
+        print(f"{phase:<6}{seconds * 1e3:>10.1f} ms{best['full'] / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
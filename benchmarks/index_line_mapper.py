@@ -0,0 +1,71 @@
+"""Construction time and lookup throughput of IndexLineMapper.
+
+The previous mapper scanned a dict of line ranges on every lookup, so it is
+timed on a small sample and extrapolated.
+
+Usage: python -m benchmarks.index_line_mapper [lines] [lookups]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+
+class LegacyIndexLineMapper:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.index_line_map = {}
+
+        with open(self.file_path) as f:
+            char_count = 0
+            for index, line in enumerate(f):
+                line_number = index + 1
+                self.index_line_map[line_number] = {}
+                self.index_line_map[line_number]['start'] = char_count
+                char_count += len(line)
+                self.index_line_map[line_number]['end'] = char_count - 1
+
+    def get_line_number(self, char_index: int) -> int:
+        for index, line in self.index_line_map.items():
+            if line['start'] <= char_index <= line['end']:
+                return index
+        raise Exception('char_index out of bounds')
+
+
+def time_lookups(mapper, offsets) -> float:
+    get_line_number = mapper.get_line_number
+    start = time.perf_counter()
+    for offset in offsets:
+        get_line_number(offset)
+    return time.perf_counter() - start
+
+
+def main(lines: int = 100_000, lookups: int = 1_000_000):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "source.rinha")
+        with open(path, "w") as f:
+            for index in range(lines):
+                f.write(f"let v{index} = v{index - 1} + {index};\n")
+        size = os.path.getsize(path)
+        offsets = [random.randrange(size) for _ in range(lookups)]
+
+        print(f"{lines} lines, {size} bytes, {lookups} lookups")
+        print(f"{'mapper':<10}{'build (ms)':>12}{'lookups (s)':>14}{'ns/lookup':>12}")
+        for label, mapper_class, sample in (
+            ("bisect", IndexLineMapper, lookups),
+            ("legacy", LegacyIndexLineMapper, 200),
+        ):
+            start = time.perf_counter()
+            mapper = mapper_class(path)
+            build = time.perf_counter() - start
+            elapsed = time_lookups(mapper, offsets[:sample]) * lookups / sample
+            print(
+                f"{label:<10}{build * 1e3:>12.1f}{elapsed:>14.2f}"
+                f"{elapsed / lookups * 1e9:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
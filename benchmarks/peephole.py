@@ -0,0 +1,82 @@
+"""Instruction counts and run time with and without the peephole optimizer.
+
+Programs are compiled once without peephole rewrites, once with all of them
+and once with each rewrite on its own. Static instruction counts include
+nested code objects; run time is the best wall time of executing the module.
+
+Usage: python -m benchmarks.peephole [programs...] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+from bytecode import Bytecode
+from benchmarks import program_path
+from rinhac import Compiler
+from rinhac.ast.json_parser import load_json_ast, parse_json_to_object
+from rinhac.optimizer import infer_types, optimize_bytecode
+from rinhac.optimizer.peephole import REWRITES
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.build_profile import count_instructions
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+PROGRAMS = ["fib", "combination", "sum_to_n", "tuple_list", "string_building", "deep_lets"]
+
+
+def compile_with(json_path: str, rewrites) -> tuple:
+    with open(json_path) as f:
+        json_ast = load_json_ast(f)
+    ast = parse_json_to_object(json_ast, IndexLineMapper.for_ast(json_path, json_ast))
+    bytecode = Compiler(types=infer_types(ast)).to_bytecode(
+        ast, Bytecode(), create_symbol_table(ast)
+    )
+    optimizer = optimize_bytecode(bytecode, rewrites)
+    return bytecode.to_code(), optimizer.stats
+
+
+def best_time(code, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            exec(code, {"__name__": "__main__"})
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("programs", nargs="*", default=PROGRAMS)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'program':<18}{'instrs':>8}{'optimized':>11}"
+        f"{'run (ms)':>11}{'optimized':>11}{'speedup':>9}  rewrites"
+    )
+    for program in args.programs:
+        path = program_path(program)
+        plain, _ = compile_with(path, ())
+        optimized, stats = compile_with(path, REWRITES)
+        plain_time = best_time(plain, args.repeat)
+        optimized_time = best_time(optimized, args.repeat)
+        print(
+            f"{program:<18}{count_instructions(plain)[0]:>8}{count_instructions(optimized)[0]:>11}"
+            f"{plain_time * 1e3:>11.3f}{optimized_time * 1e3:>11.3f}"
+            f"{plain_time / optimized_time:>8.2f}x  {json.dumps(dict(stats))}"
+        )
+
+    print()
+    print(f"{'rewrite':<18}" + "".join(f"{program[:10]:>11}" for program in args.programs))
+    for rewrite in REWRITES:
+        cells = []
+        for program in args.programs:
+            code, _ = compile_with(program_path(program), (rewrite,))
+            cells.append(f"{count_instructions(code)[0]:>11}")
+        print(f"{rewrite:<18}" + "".join(cells))
+    print(f"(instructions with a single rewrite enabled; run time best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Run time of print-heavy programs with the buffered print helper.
+
+``builtin`` runs the same compiled code with its ``print`` calls sent to
+the builtin ``print``, as the compiler emitted them before (the global the
+calls load is renamed in every code object). ``rinha`` uses the runtime's
+``rinha_print``, which formats the value itself and appends it to a buffer
+written out when full. stdout is ``/dev/null``, opened line buffered as for a
+terminal, or block buffered as for a pipe or file.
+
+Usage: python -m benchmarks.print_output [programs...] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+from types import CodeType
+from bytecode import Bytecode, Instr
+from benchmarks import compile_program, program_path
+from rinhac.runtime import PRINT_HELPER_NAME, close_output
+
+PROGRAMS = ["print_loop"]
+
+
+def with_builtin_print(code: CodeType) -> CodeType:
+    """``code`` with every call of the print helper going to ``print``."""
+    bytecode = Bytecode.from_code(code)
+    for instr in bytecode:
+        if not isinstance(instr, Instr):
+            continue
+        if instr.name == "LOAD_GLOBAL":
+            # From 3.11 the argument also tells whether NULL is pushed.
+            if instr.arg == PRINT_HELPER_NAME:
+                instr.arg = "print"
+            elif isinstance(instr.arg, tuple) and instr.arg[1] == PRINT_HELPER_NAME:
+                instr.arg = (instr.arg[0], "print")
+        elif instr.name == "LOAD_CONST" and isinstance(instr.arg, CodeType):
+            instr.arg = with_builtin_print(instr.arg)
+    return bytecode.to_code()
+
+
+def best_run_time(code: CodeType, buffering: int, repeat: int) -> float:
+    best = float("inf")
+    stdout = sys.stdout
+    for _ in range(repeat):
+        with open(os.devnull, "w", buffering=buffering) as devnull:
+            sys.stdout = devnull
+            namespace = {"__name__": "__main__"}
+            try:
+                start = time.perf_counter()
+                exec(code, namespace)
+                close_output(namespace)
+                best = min(best, time.perf_counter() - start)
+            finally:
+                sys.stdout = stdout
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("programs", nargs="*", default=PROGRAMS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'program':<14}{'stdout':<8}{'builtin':>12}{'rinha':>12}{'speedup':>9}")
+    for program in args.programs:
+        code = compile_program(program_path(program))
+        variants = {"builtin": with_builtin_print(code), "rinha": code}
+        for stdout, buffering in (("line", 1), ("block", -1)):
+            seconds = {
+                name: best_run_time(variant, buffering, args.repeat)
+                for name, variant in variants.items()
+            }
+            print(
+                f"{program:<14}{stdout:<8}{seconds['builtin'] * 1e3:>9.1f} ms"
+                f"{seconds['rinha'] * 1e3:>9.1f} ms"
+                f"{seconds['builtin'] / seconds['rinha']:>8.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
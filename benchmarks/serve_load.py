@@ -0,0 +1,119 @@
+"""Request latency of ``rinhac serve`` under concurrent clients.
+
+Starts a server on a temporary socket and sends ``--requests`` requests from
+each of ``--clients`` threads, through the client library so that client
+interpreter startup is not counted. Latencies are compared with
+``python -m rinhac.client`` and ``rinhac run`` processes, which do pay for it.
+
+Usage: python -m benchmarks.serve_load [program] [--clients N] [--requests N]
+"""
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from benchmarks import program_path
+from rinhac.client import request
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    """p50 and p99 of ``samples``, in milliseconds."""
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return cuts[49] * 1e3, cuts[98] * 1e3
+
+
+def load(json_path: str, socket_path: str, clients: int, requests: int) -> tuple[list, float]:
+    latencies = []
+    failures = []
+
+    def client():
+        for _ in range(requests):
+            start = time.perf_counter()
+            status = request(json_path, socket_path, stdout=io.BytesIO(), stderr=io.BytesIO())
+            latencies.append(time.perf_counter() - start)
+            if status:
+                failures.append(status)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if failures:
+        raise RuntimeError(f"{len(failures)} requests failed")
+    return latencies, elapsed
+
+
+def process_latencies(command: list[str], environ: dict, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, env=environ, cwd=REPOSITORY_DIR, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("program", nargs="?", default="sum")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--process-repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    json_path = program_path(args.program)
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, "rinhac.sock")
+        environ = dict(os.environ, RINHAC_CACHE_DIR=os.path.join(directory, "cache"))
+        command = [sys.executable, "-m", "rinhac", "serve", "--socket", socket_path]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        server = subprocess.Popen(
+            command, env=environ, cwd=REPOSITORY_DIR, stderr=subprocess.PIPE, text=True
+        )
+        try:
+            print(server.stderr.readline().strip())
+            latencies, elapsed = load(json_path, socket_path, args.clients, args.requests)
+            rows = [
+                (f"serve, {args.clients} clients", latencies),
+                (
+                    "rinhac.client",
+                    process_latencies(
+                        [sys.executable, "-m", "rinhac.client", json_path],
+                        dict(environ, RINHAC_SOCKET=socket_path),
+                        args.process_repeat,
+                    ),
+                ),
+                (
+                    "rinhac run",
+                    process_latencies(
+                        [sys.executable, "-m", "rinhac", "run", json_path, "--no-pyc"],
+                        environ,
+                        args.process_repeat,
+                    ),
+                ),
+            ]
+        finally:
+            server.terminate()
+            server.wait()
+            server.stderr.close()
+
+    print(f"{args.program}: {len(latencies)} requests in {elapsed:.2f} s "
+          f"({len(latencies) / elapsed:.1f} requests/s)")
+    print(f"{'path':<22}{'requests':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for label, samples in rows:
+        p50, p99 = percentiles(samples)
+        print(f"{label:<22}{len(samples):>9}{p50:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""End-to-end latency of building and running a program.
+
+Compares the two-process path (``rinhac -b`` then ``python source.pyc``) with
+``rinhac run``, each with a cold and a warm compile cache.
+
+Usage: python -m benchmarks.startup [program] [repeat]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks import program_path
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rinhac(*args) -> list[str]:
+    return [sys.executable, "-m", "rinhac", *args]
+
+
+def time_commands(commands: list[list[str]], environ: dict, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for command in commands:
+            subprocess.run(
+                command, env=environ, cwd=REPOSITORY_DIR, check=True, stdout=subprocess.DEVNULL
+            )
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(program: str = "sum", repeat: int = 20):
+    json_path = program_path(program)
+    with tempfile.TemporaryDirectory() as directory:
+        pyc_path = os.path.join(directory, "source.pyc")
+        environ = dict(os.environ, RINHAC_CACHE_DIR=os.path.join(directory, "cache"))
+        paths = {
+            "build + python": [
+                _rinhac(json_path, "-o", pyc_path),
+                [sys.executable, pyc_path],
+            ],
+            "run": [_rinhac("run", json_path, "-o", pyc_path)],
+        }
+
+        print(f"{program}, {repeat} runs")
+        print(f"{'path':<18}{'cache':<8}{'median (ms)':>13}{'min (ms)':>11}")
+        for label, commands in paths.items():
+            for cache, extra in (("cold", ["--no-cache"]), ("warm", [])):
+                commands_with_cache = [commands[0] + extra] + commands[1:]
+                samples = time_commands(commands_with_cache, environ, repeat)
+                print(
+                    f"{label:<18}{cache:<8}{statistics.median(samples) * 1e3:>13.1f}"
+                    f"{min(samples) * 1e3:>11.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "sum", *map(int, sys.argv[2:]))
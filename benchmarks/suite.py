@@ -0,0 +1,153 @@
+"""Per-phase timings of the compiler pipeline over the benchmark programs.
+
+Every program goes through each phase ``repeat`` times; the best and median
+wall times of each phase are reported. ``--json`` writes the results so two
+runs can be compared with ``--compare``.
+
+Usage: python -m benchmarks.suite [programs...] [--repeat N] [--json out.json]
+                                  [--compare baseline.json] [--threshold 1.10]
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from bytecode import Bytecode
+from benchmarks import program_path
+from rinhac import Compiler
+from rinhac.ast.json_parser import load_json_ast, parse_json_to_object
+from rinhac.optimizer import fold_constants, infer_types
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.index_line_mapper import IndexLineMapper
+from rinhac.utils.pyc_converter import code_to_pyc_bytecode
+
+PROGRAMS = [
+    "fib",
+    "combination",
+    "sum_to_n",
+    "tuple_list",
+    "string_building",
+    "deep_lets",
+]
+
+PHASES = [
+    "json_load",
+    "parse_json_to_object",
+    "fold_constants",
+    "create_symbol_table",
+    "infer_types",
+    "to_bytecode",
+    "to_code",
+    "marshal",
+    "exec",
+]
+
+
+def run_pipeline(json_path: str) -> dict[str, float]:
+    """Run every phase once and return its wall time in seconds."""
+    timings = {}
+
+    def timed(phase, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        timings[phase] = time.perf_counter() - start
+        return result
+
+    def load():
+        with open(json_path) as f:
+            return load_json_ast(f)
+
+    json_ast = timed("json_load", load)
+    ast = timed(
+        "parse_json_to_object",
+        parse_json_to_object,
+        json_ast,
+        IndexLineMapper.for_ast(json_path, json_ast),
+    )
+    timed("fold_constants", fold_constants, ast)
+    symbol_table = timed("create_symbol_table", create_symbol_table, ast)
+    types = timed("infer_types", infer_types, ast)
+    bytecode = timed(
+        "to_bytecode", Compiler(types=types).to_bytecode, ast, Bytecode(), symbol_table
+    )
+    code = timed("to_code", bytecode.to_code)
+    timed("marshal", code_to_pyc_bytecode, code)
+    with contextlib.redirect_stdout(io.StringIO()):
+        timed("exec", exec, code, {"__name__": "__main__"})
+    return timings
+
+
+def benchmark(program: str, repeat: int) -> dict[str, dict[str, float]]:
+    samples = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        for phase, elapsed in run_pipeline(program_path(program)).items():
+            samples[phase].append(elapsed)
+    return {
+        phase: {"min": min(values), "median": statistics.median(values)}
+        for phase, values in samples.items()
+    }
+
+
+def print_results(results: dict):
+    print(f"{'program':<18}" + "".join(f"{phase[:12]:>13}" for phase in PHASES))
+    for program, phases in results["programs"].items():
+        print(
+            f"{program:<18}"
+            + "".join(f"{phases[phase]['min'] * 1e3:>13.3f}" for phase in PHASES)
+        )
+    print("(best of {repeat}, ms)".format(**results))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print phase ratios against ``baseline``; return False on regressions."""
+    ok = True
+    for program, phases in results["programs"].items():
+        baseline_phases = baseline["programs"].get(program)
+        if baseline_phases is None:
+            continue
+        for phase, timing in phases.items():
+            if phase not in baseline_phases:
+                continue
+            ratio = timing["min"] / max(baseline_phases[phase]["min"], 1e-9)
+            if ratio > threshold:
+                ok = False
+                print(f"regression: {program} {phase} {ratio:.2f}x", file=sys.stderr)
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("programs", nargs="*", default=PROGRAMS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Results file of a baseline run.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.10,
+        help="Slowdown ratio against the baseline reported as a regression.",
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "programs": {program: benchmark(program, args.repeat) for program in args.programs},
+    }
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
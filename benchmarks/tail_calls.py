@@ -0,0 +1,60 @@
+"""Frames and wall time of accumulator recursion with and without tail calls.
+
+Usage: python -m benchmarks.tail_calls [n] [repeat]
+"""
+import sys
+import time
+from benchmarks import load_program, program_path
+
+
+def count_frames(function, *args) -> tuple[int, int]:
+    """Return (frames created, max depth) for the Python frames of ``function``."""
+    name = function.__code__.co_name
+    frames = depth = max_depth = 0
+
+    def profile(frame, event, arg):
+        nonlocal frames, depth, max_depth
+        if frame.f_code.co_name != name:
+            return
+        if event == "call":
+            frames += 1
+            depth += 1
+            max_depth = max(max_depth, depth)
+        elif event == "return":
+            depth -= 1
+
+    sys.setprofile(profile)
+    try:
+        function(*args)
+    finally:
+        sys.setprofile(None)
+    return frames, max_depth
+
+
+def best_time(function, *args, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n: int = 900, repeat: int = 200):
+    path = program_path("sum")
+    print(f"sum({n}, 0), best of {repeat}")
+    print(f"{'mode':<12}{'frames':>10}{'max depth':>12}{'time (us)':>12}")
+    for label, tail_calls in (("call", False), ("tail call", True)):
+        rinha_sum = load_program(path, tail_calls=tail_calls).sum
+        frames, max_depth = count_frames(rinha_sum, n, 0)
+        elapsed = best_time(rinha_sum, n, 0, repeat=repeat)
+        print(f"{label:<12}{frames:>10}{max_depth:>12}{elapsed * 1e6:>12.1f}")
+
+    deep = 1_000_000
+    rinha_sum = load_program(path, tail_calls=True).sum
+    elapsed = best_time(rinha_sum, deep, 0, repeat=1)
+    print(f"tail call sum({deep}, 0) = {rinha_sum(deep, 0)} in {elapsed * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
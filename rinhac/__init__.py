@@ -1,4 +1,19 @@
-from .symbol_table import SymbolTable
-from .compiler import Compiler
+import importlib
 
-__all__ = ["SymbolTable", "Compiler"]
+__version__ = "0.1.0"
+
+_exports = {
+    "SymbolTable": ".symbol_table",
+    "Compiler": ".compiler",
+    "SourceCompiler": ".source_compiler",
+}
+
+__all__ = ["SymbolTable", "Compiler", "SourceCompiler"]
+
+
+def __getattr__(name):
+    # The compiler needs the bytecode library and every AST class; importing
+    # it on first use keeps cached runs from paying for them.
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_exports[name], __name__), name)
@@ -1,37 +1,70 @@
 #!/usr/bin/env python3
-import argparse
-import json
+# Only what a cached ``run`` needs is imported here. The parser, optimizer,
+# compiler and the bytecode library are imported by the functions that use
+# them, so a compile cache hit never loads them.
 import os
-from rinhac.ast.ast_objects import File
-from rinhac.ast.json_parser import parse_json_to_object
-from rinhac.compiler import Compiler
-from rinhac.symbol_table import SymbolTable, create_symbol_table, print_symbol_table
-from rinhac.utils.index_line_mapper import IndexLineMapper
-from rinhac.utils.print_ast import print_tree
-from rinhac.utils.pyc_converter import code_to_pyc_bytecode
-from bytecode import Bytecode
+import sys
+from types import CodeType, ModuleType
+from rinhac.runtime import close_output
+from rinhac.utils.build_profile import BuildProfile, count_instructions, count_nodes
+from rinhac.utils.compile_cache import CompileCache, line_source_data, write_atomic
+from rinhac.utils.pyc_converter import code_to_pyc_bytecode, pyc_bytecode_to_code
 
 
-def _get_ast(ast_file_path) -> File:
+def _read_ast_data(ast_file_path) -> bytes:
     try:
-        with open(ast_file_path, "r") as f:
-            json_ast = json.load(f)
-            index_line_mapper = IndexLineMapper(ast_file_path)
-            ast = parse_json_to_object(json_ast, index_line_mapper)
-            return ast
+        with open(ast_file_path, "rb") as f:
+            return f.read()
     except FileNotFoundError:
         print("File not found:", ast_file_path)
         exit(1)
+
+
+_NO_PROFILE = BuildProfile()
+
+
+def _get_ast(ast_file_path, ast_data=None, profile=_NO_PROFILE):
+    import io
+    import json
+    from rinhac.ast.json_parser import load_ast
+
+    if ast_data is None:
+        ast_data = _read_ast_data(ast_file_path)
+    try:
+        with profile.phase("ast decode"):
+            ast = load_ast(io.BytesIO(ast_data), ast_file_path)
     except json.JSONDecodeError:
         print("File is not a valid JSON:", ast_file_path)
         exit(1)
+    return ast
 
 
-def _get_symbol_table(ast: File) -> SymbolTable:
-    return create_symbol_table(ast)
+def _get_symbol_table(ast, entry_function=False):
+    from rinhac.symbol_table import create_symbol_table
+
+    return create_symbol_table(ast, entry_function=entry_function)
+
+
+def _print_stats(name: str, stats: dict, action: str = "folded"):
+    details = ", ".join(f"{key} {count}" for key, count in sorted(stats.items()))
+    total = sum(stats.values())
+    print(f"{name}: {total} {action}" + (f" ({details})" if details else ""), file=sys.stderr)
+
+
+def _print_specialization_stats(compiler):
+    stats = compiler.add_stats
+    total = sum(stats.values())
+    specialized = compiler.specialized_add_count
+    share = f" ({specialized / total:.1%})" if total else ""
+    details = ", ".join(f"{key} {count}" for key, count in sorted(stats.items()))
+    print(
+        f"type specialization: {specialized}/{total} additions specialized{share}"
+        + (f" ({details})" if details else ""),
+        file=sys.stderr,
+    )
 
 
-def build(ast_file, output):
+def _output_path(ast_file, output):
     if output is None:
         output = os.path.splitext(ast_file)[0] + ".pyc"
 
@@ -39,32 +72,573 @@ def build(ast_file, output):
     has_no_extension = output_parts[1] == ""
     if has_no_extension:
         output = output_parts[0] + ".pyc"
+    return output
 
-    ast = _get_ast(ast_file)
-    symbol_table = _get_symbol_table(ast)
-    compiler = Compiler()
-    ast_bytecode = compiler.to_bytecode(ast, Bytecode(), symbol_table)
-    ast_code = ast_bytecode.to_code()
-    pyc_data = code_to_pyc_bytecode(ast_code)
 
-    with open(output, "wb") as f:
-        f.write(pyc_data)
+def _lookup_cache(ast_file: str, ast_data: bytes, show_stats: bool, **options):
+    compile_cache = CompileCache()
+    # Line numbers come from the Rinha source, when it is next to the AST.
+    cache_key = compile_cache.key(ast_data, line_source_data(ast_file, ast_data), **options)
+    pyc_data = compile_cache.get(cache_key)
+    if show_stats:
+        print(f"compile cache: {'hit' if pyc_data else 'miss'}", file=sys.stderr)
+    return compile_cache, cache_key, pyc_data
+
+
+def _function_cache():
+    from rinhac.utils.function_cache import FunctionCache
+
+    return FunctionCache()
+
+
+def _compile(
+    ast_file,
+    ast_data,
+    memoize,
+    memoize_cache_size,
+    constant_folding,
+    show_stats,
+    profile=_NO_PROFILE,
+    entry_function=False,
+    peephole=True,
+    disabled_rewrites=(),
+    function_cache=None,
+    deep_recursion=None,
+    codegen="bytecode",
+) -> CodeType:
+    from bytecode import Bytecode, Instr
+    from rinhac.compiler import Compiler, DEFAULT_MEMOIZE_CACHE_SIZE
+    from rinhac.optimizer import find_pure_functions, fold_constants, infer_types
+    from rinhac.optimizer.peephole import REWRITES, PeepholeOptimizer
+
+    ast = _get_ast(ast_file, ast_data, profile)
+    if profile.enabled:
+        profile.count("ast nodes", count_nodes(ast))
+    if constant_folding:
+        with profile.phase("constant folding"):
+            folder = fold_constants(ast)
+        if show_stats:
+            _print_stats("constant folding", folder.stats)
+        if profile.enabled:
+            profile.count("folded ast nodes", count_nodes(ast))
+    with profile.phase("symbol table"):
+        # The thread running a program with deep recursion calls its entry
+        # function.
+        symbol_table = _get_symbol_table(ast, entry_function or deep_recursion is not None)
+    memoized_functions = ()
+    if memoize:
+        with profile.phase("purity analysis"):
+            memoized_functions = find_pure_functions(ast)
+    with profile.phase("type inference"):
+        types = infer_types(ast)
+    if codegen == "source":
+        return _compile_source(
+            ast,
+            symbol_table,
+            memoized_functions,
+            memoize_cache_size,
+            types,
+            deep_recursion,
+            show_stats,
+            profile,
+        )
+    optimizer = None
+    if peephole:
+        optimizer = PeepholeOptimizer(
+            [rewrite for rewrite in REWRITES if rewrite not in disabled_rewrites]
+        )
+    compiler = Compiler(
+        memoized_functions=memoized_functions,
+        memoize_cache_size=memoize_cache_size or DEFAULT_MEMOIZE_CACHE_SIZE,
+        types=types,
+        function_cache=function_cache,
+        optimizer=optimizer,
+        deep_recursion=deep_recursion,
+    )
+    with profile.phase("codegen"):
+        ast_bytecode = compiler.to_bytecode(ast, Bytecode(), symbol_table)
+    if function_cache is not None:
+        function_cache.evict()
+        if show_stats:
+            _print_stats(
+                "function cache",
+                {"hit": function_cache.hits, "miss": function_cache.misses},
+                "functions",
+            )
+    if show_stats:
+        _print_specialization_stats(compiler)
+    if optimizer is not None:
+        # Functions were rewritten as the compiler assembled them.
+        with profile.phase("peephole"):
+            optimizer.optimize(ast_bytecode, nested=False)
+        if show_stats:
+            _print_stats("peephole", optimizer.stats, "rewrites")
+    if profile.enabled:
+        profile.count(
+            "module instructions",
+            sum(isinstance(instr, Instr) for instr in ast_bytecode),
+        )
+    with profile.phase("assembly"):
+        ast_code = ast_bytecode.to_code()
+    if profile.enabled:
+        instructions, code_objects = count_instructions(ast_code)
+        profile.count("instructions", instructions)
+        profile.count("code objects", code_objects)
+    return ast_code
+
+
+def _compile_source(
+    ast,
+    symbol_table,
+    memoized_functions,
+    memoize_cache_size,
+    types,
+    deep_recursion,
+    show_stats,
+    profile,
+) -> CodeType:
+    """Second half of ``_compile`` through Python source and ``compile``."""
+    from rinhac.compiler import DEFAULT_MEMOIZE_CACHE_SIZE
+    from rinhac.source_compiler import SourceCompiler
+
+    compiler = SourceCompiler(
+        memoized_functions=memoized_functions,
+        memoize_cache_size=memoize_cache_size or DEFAULT_MEMOIZE_CACHE_SIZE,
+        types=types,
+        deep_recursion=deep_recursion,
+    )
+    with profile.phase("codegen"):
+        source = compiler.to_source(ast, symbol_table)
+    if show_stats:
+        _print_specialization_stats(compiler)
+    if profile.enabled:
+        profile.count("source lines", source.count("\n"))
+    with profile.phase("assembly"):
+        ast_code = compile(
+            source, ast.locations.filename(ast.location), "exec", dont_inherit=True
+        )
+    if profile.enabled:
+        instructions, code_objects = count_instructions(ast_code)
+        profile.count("instructions", instructions)
+        profile.count("code objects", code_objects)
+    return ast_code
+
+
+def build(
+    ast_file,
+    output,
+    memoize=False,
+    memoize_cache_size=None,
+    constant_folding=True,
+    show_stats=False,
+    cache=True,
+    timings=False,
+    memory=False,
+    report_format="text",
+    entry_function=False,
+    peephole=True,
+    disabled_rewrites=(),
+    deep_recursion=None,
+    codegen="bytecode",
+):
+    profile = BuildProfile(timings, memory)
+    try:
+        _build(
+            ast_file,
+            _output_path(ast_file, output),
+            memoize,
+            memoize_cache_size,
+            constant_folding,
+            show_stats,
+            cache,
+            profile,
+            entry_function,
+            peephole,
+            disabled_rewrites,
+            deep_recursion,
+            codegen,
+        )
+    finally:
+        profile.stop()
+    if profile.enabled:
+        print(profile.format(report_format), file=sys.stderr)
+
+
+def _build(
+    ast_file,
+    output,
+    memoize,
+    memoize_cache_size,
+    constant_folding,
+    show_stats,
+    cache,
+    profile,
+    entry_function,
+    peephole,
+    disabled_rewrites,
+    deep_recursion,
+    codegen="bytecode",
+):
+    with profile.phase("read"):
+        ast_data = _read_ast_data(ast_file)
+    if cache:
+        with profile.phase("cache lookup"):
+            compile_cache, cache_key, pyc_data = _lookup_cache(
+                ast_file,
+                ast_data,
+                show_stats,
+                memoize=memoize,
+                memoize_cache_size=memoize_cache_size if memoize else None,
+                constant_folding=constant_folding,
+                entry_function=entry_function,
+                peephole=peephole,
+                disabled_rewrites=tuple(sorted(disabled_rewrites)),
+                deep_recursion=deep_recursion,
+                codegen=codegen,
+            )
+        if pyc_data:
+            with profile.phase("write"):
+                write_atomic(output, pyc_data)
+            return
+
+    ast_code = _compile(
+        ast_file,
+        ast_data,
+        memoize,
+        memoize_cache_size,
+        constant_folding,
+        show_stats,
+        profile,
+        entry_function,
+        peephole,
+        disabled_rewrites,
+        # The function cache holds code objects of the bytecode compiler.
+        _function_cache() if cache and codegen == "bytecode" else None,
+        deep_recursion,
+        codegen,
+    )
+    with profile.phase("pyc serialization"):
+        pyc_data = code_to_pyc_bytecode(ast_code)
+    if cache:
+        with profile.phase("cache store"):
+            compile_cache.put(cache_key, pyc_data)
+
+    with profile.phase("write"):
+        write_atomic(output, pyc_data)
+
+
+def run(
+    ast_file,
+    output=None,
+    memoize=False,
+    memoize_cache_size=None,
+    constant_folding=True,
+    show_stats=False,
+    cache=True,
+    write_pyc=True,
+    entry_function=False,
+    peephole=True,
+    disabled_rewrites=(),
+    deep_recursion=None,
+    codegen="bytecode",
+):
+    """Compile ``ast_file`` and execute it in this interpreter.
+
+    The program runs in a fresh ``__main__`` module, as it would under
+    ``python source.pyc``. The ``.pyc`` (and the cache entry, on a miss) is
+    written by a background thread while the program runs, so it is still
+    there for a later plain-Python run.
+    """
+    ast_data = _read_ast_data(ast_file)
+    pyc_data = None
+    if cache:
+        compile_cache, cache_key, pyc_data = _lookup_cache(
+            ast_file,
+            ast_data,
+            show_stats,
+            memoize=memoize,
+            memoize_cache_size=memoize_cache_size if memoize else None,
+            constant_folding=constant_folding,
+            entry_function=entry_function,
+            peephole=peephole,
+            disabled_rewrites=tuple(sorted(disabled_rewrites)),
+            deep_recursion=deep_recursion,
+            codegen=codegen,
+        )
+
+    if pyc_data:
+        ast_code = pyc_bytecode_to_code(pyc_data)
+    else:
+        ast_code = _compile(
+            ast_file,
+            ast_data,
+            memoize,
+            memoize_cache_size,
+            constant_folding,
+            show_stats,
+            entry_function=entry_function,
+            peephole=peephole,
+            disabled_rewrites=disabled_rewrites,
+            deep_recursion=deep_recursion,
+            codegen=codegen,
+        )
+
+    def write():
+        data = pyc_data or code_to_pyc_bytecode(ast_code)
+        if cache and not pyc_data:
+            compile_cache.put(cache_key, data)
+        if write_pyc:
+            write_atomic(_output_path(ast_file, output), data)
+
+    import threading
+
+    writer = threading.Thread(target=write, name="rinhac-pyc-writer")
+    writer.start()
+
+    module = ModuleType("__main__")
+    module.__file__ = _output_path(ast_file, output)
+    previous_main = sys.modules.get("__main__")
+    sys.modules["__main__"] = module
+    try:
+        exec(ast_code, module.__dict__)
+    finally:
+        close_output(module.__dict__)
+        sys.modules["__main__"] = previous_main
+        writer.join()
+
+
+WATCH_INTERVAL = 0.25
+
+
+def watch(ast_file, rebuild, interval=WATCH_INTERVAL, sleep=None):
+    """Call ``rebuild`` now and whenever ``ast_file`` changes, until interrupted.
+
+    The file is polled every ``interval`` seconds. Rebuilds only compile the
+    functions that changed, the others come from the function cache. A build
+    that fails, as when the file is read while it is being written, is
+    reported and retried on the next change.
+    """
+    import time
+
+    sleep = sleep or time.sleep
+    built_stamp = None
+    try:
+        while True:
+            try:
+                stat = os.stat(ast_file)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                stamp = None
+            if stamp is not None and stamp != built_stamp:
+                built_stamp = stamp
+                start = time.perf_counter()
+                try:
+                    rebuild()
+                except SystemExit:
+                    print(f"build of {ast_file} failed; waiting for changes", file=sys.stderr)
+                else:
+                    elapsed = (time.perf_counter() - start) * 1e3
+                    print(f"built {ast_file} in {elapsed:.1f} ms", file=sys.stderr)
+            sleep(interval)
+    except KeyboardInterrupt:
+        pass
 
 
 def print_ast(ast_file):
+    from rinhac.utils.print_ast import print_tree
+
     ast = _get_ast(ast_file)
     print_tree(ast)
 
 
 def print_symbol(ast_file):
+    from rinhac.symbol_table import print_symbol_table
+
     ast = _get_ast(ast_file)
     symbol_table = _get_symbol_table(ast)
     print_symbol_table(symbol_table)
 
 
-if __name__ == "__main__":
+def _add_build_arguments(parser):
+    parser.add_argument(
+        "--memoize",
+        action="store_true",
+        help="Cache the results of functions that can never print.",
+    )
+    parser.add_argument(
+        "--memoize-size",
+        type=int,
+        default=None,
+        help="Maximum number of cached results per memoized function (default 4096).",
+    )
+
+    parser.add_argument(
+        "--no-constant-folding",
+        action="store_true",
+        help="Compile literal expressions and dead branches as written.",
+    )
+    parser.add_argument(
+        "--entry-function",
+        action="store_true",
+        help="Run the program inside a function, so top-level bindings are locals.",
+    )
+    parser.add_argument(
+        "--deep-recursion",
+        action="store_true",
+        dest="deep_recursion_flag",
+        help=(
+            "Run the program on a thread with a large stack and recursion limit, "
+            "sized from the available memory unless given below."
+        ),
+    )
+    parser.add_argument(
+        "--stack-size",
+        type=int,
+        default=None,
+        metavar="MIB",
+        help="Stack size of the --deep-recursion thread; implies --deep-recursion.",
+    )
+    parser.add_argument(
+        "--recursion-limit",
+        type=int,
+        default=None,
+        metavar="FRAMES",
+        help="Recursion limit of the --deep-recursion thread; implies --deep-recursion.",
+    )
+    parser.add_argument(
+        "--codegen",
+        choices=("bytecode", "source"),
+        default="bytecode",
+        help=(
+            "Emit bytecode directly (default), or write Python source and "
+            "compile it with the builtin compile()."
+        ),
+    )
+    parser.add_argument(
+        "--no-peephole",
+        action="store_true",
+        help="Emit the generated instructions without peephole rewrites.",
+    )
+    parser.add_argument(
+        "--no-rewrite",
+        action="append",
+        default=[],
+        metavar="REWRITE",
+        help="Leave out one peephole rewrite; may be repeated.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always compile, without reading or writing the compile cache.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print optimization statistics to stderr.",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Summarize the import time of this invocation on stderr.",
+    )
+
+
+def _parse_args(parser, argv):
+    args = parser.parse_args(argv)
+    if args.memoize_size is not None and args.memoize_size < 1:
+        parser.error("--memoize-size must be a positive number")
+    if args.stack_size is not None and args.stack_size < 1:
+        parser.error("--stack-size must be a positive number")
+    if args.recursion_limit is not None and args.recursion_limit < 1:
+        parser.error("--recursion-limit must be a positive number")
+    # Stack size in bytes and recursion limit, 0 to size them at run time.
+    args.deep_recursion = None
+    if args.deep_recursion_flag or args.stack_size or args.recursion_limit:
+        args.deep_recursion = ((args.stack_size or 0) << 20, args.recursion_limit or 0)
+    if args.no_rewrite:
+        from rinhac.optimizer.peephole import REWRITES
+
+        unknown = sorted(set(args.no_rewrite) - set(REWRITES))
+        if unknown:
+            parser.error(
+                f"unknown rewrite {', '.join(unknown)} (choose from {', '.join(REWRITES)})"
+            )
+    return args
+
+
+def run_main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="rinhac run",
+        description="Compile a Rinha AST and run it in the same interpreter.",
+    )
+    parser.add_argument("filename", help="Path to the file containing the AST.")
+    parser.add_argument(
+        "-o", "--output", action="store", help="Output pyc file.", default=None
+    )
+    parser.add_argument(
+        "--no-pyc",
+        action="store_true",
+        help="Do not write the pyc next to the AST.",
+    )
+    _add_build_arguments(parser)
+    args = _parse_args(parser, argv)
+
+    run(
+        args.filename,
+        args.output,
+        args.memoize,
+        args.memoize_size,
+        not args.no_constant_folding,
+        args.stats,
+        not args.no_cache,
+        not args.no_pyc,
+        args.entry_function,
+        not args.no_peephole,
+        args.no_rewrite,
+        args.deep_recursion,
+        args.codegen,
+    )
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if "--startup-profile" in argv:
+        from rinhac.utils.startup_profile import profile_startup
+
+        argv = [arg for arg in argv if arg != "--startup-profile"]
+        sys.exit(profile_startup(argv))
+    if argv[:1] == ["run"]:
+        if len(argv) == 2 and not argv[1].startswith("-"):
+            # ``run FILE`` is what run.sh starts on every execution; argparse
+            # and the help formatter it sets up cost more than the rest of a
+            # cached run.
+            return run(argv[1])
+        return run_main(argv[1:])
+    if argv[:1] == ["build-many"]:
+        from rinhac.batch import build_many_main
+
+        return build_many_main(argv[1:])
+    if argv[:1] == ["serve"]:
+        from rinhac.server import serve_main
+
+        return serve_main(argv[1:])
+    if argv[:1] == ["client"]:
+        from rinhac.client import client_main
+
+        return client_main(argv[1:])
+
+    import argparse
+
     parser = argparse.ArgumentParser(
-        description="Rinhac compiler. Compiles Rinhac AST to Python bytecode."
+        description="Rinhac compiler. Compiles Rinhac AST to Python bytecode.",
+        epilog=(
+            "Use 'rinhac run FILE' to compile and run a program in one process, "
+            "'rinhac build-many PATH...' to compile many programs in parallel and "
+            "'rinhac serve' with 'rinhac client FILE' to run programs on a warm daemon."
+        ),
     )
     parser.add_argument("filename", help="Path to the file containing the AST.")
 
@@ -80,13 +654,59 @@ if __name__ == "__main__":
         "-o", "--output", action="store", help="Output file.", default=None
     )
 
-    args = parser.parse_args()
+    _add_build_arguments(parser)
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Report wall and CPU time of each build phase on stderr.",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Also report the tracemalloc peak of each build phase.",
+    )
+    parser.add_argument(
+        "--report-format",
+        choices=("text", "json"),
+        default="text",
+        help="Format of the --timings/--memory report.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Build again whenever the AST file changes, until interrupted.",
+    )
+    args = _parse_args(parser, argv)
 
-    if args.build:
-        build(args.filename, args.output)
-    elif args.print_ast:
+    if args.print_ast:
         print_ast(args.filename)
     elif args.print_symbol:
         print_symbol(args.filename)
     else:
-        build(args.filename, args.output)
+        def build_file():
+            build(
+                args.filename,
+                args.output,
+                args.memoize,
+                args.memoize_size,
+                not args.no_constant_folding,
+                args.stats,
+                not args.no_cache,
+                args.timings,
+                args.memory,
+                args.report_format,
+                args.entry_function,
+                not args.no_peephole,
+                args.no_rewrite,
+                args.deep_recursion,
+                args.codegen,
+            )
+
+        if args.watch:
+            watch(args.filename, build_file)
+        else:
+            build_file()
+
+
+if __name__ == "__main__":
+    main()
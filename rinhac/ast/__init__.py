@@ -17,6 +17,7 @@ from .ast_objects import (
     Print,
     File,
     Location,
+    LocationTable,
 )
 
 __all__ = [
@@ -38,4 +39,5 @@ __all__ = [
     "Print",
     "File",
     "Location",
+    "LocationTable",
 ]
\ No newline at end of file
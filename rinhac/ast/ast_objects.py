@@ -1,5 +1,6 @@
+from array import array
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from abc import ABC
 
 
@@ -15,37 +16,99 @@ class Location:
     filename: str
 
 
+class LocationTable:
+    """The source locations of one AST, stored column-wise.
+
+    Nodes hold the integer id of their location. Starts, ends and line
+    numbers live in one ``array('l')`` each, and filenames are interned, so
+    a location takes a few machine words instead of an object with its own
+    copy of the filename. ``table[id]`` rebuilds a ``Location`` for the
+    rare callers that want all of it.
+    """
+
+    __slots__ = ("starts", "ends", "lines", "file_ids", "filenames", "_filename_ids")
+
+    def __init__(self):
+        self.starts = array("l")
+        self.ends = array("l")
+        self.lines = array("l")
+        self.file_ids = array("l")
+        self.filenames: list[str] = []
+        self._filename_ids: dict[str, int] = {}
+
+    def add(self, start: int, end: int, filename: str, line_number: int = 0) -> int:
+        file_id = self._filename_ids.get(filename)
+        if file_id is None:
+            file_id = self._filename_ids[filename] = len(self.filenames)
+            self.filenames.append(filename)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line_number)
+        self.file_ids.append(file_id)
+        return len(self.starts) - 1
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def clear(self):
+        """Forget every location, for an AST that is decoded again."""
+        for column in (self.starts, self.ends, self.lines, self.file_ids, self.filenames):
+            del column[:]
+        self._filename_ids.clear()
+
+    def __getitem__(self, location: int) -> Location:
+        return Location(
+            line_number=self.lines[location],
+            start=self.starts[location],
+            end=self.ends[location],
+            filename=self.filename(location),
+        )
+
+    def line_number(self, location: int) -> int:
+        return self.lines[location]
+
+    def filename(self, location: int) -> str:
+        return self.filenames[self.file_ids[location]]
+
+    def resolve_line_numbers(self, index_line_mapper):
+        """Fill in every line number from the start offsets."""
+        get_line_number = index_line_mapper.get_line_number
+        self.lines = array("l", map(get_line_number, self.starts))
+
+
 @dataclass(slots=True)
 class File:
     name: str
     expression: Term
-    location: Location
+    # The id of a location in ``locations``, like every node's ``location``.
+    location: int
+    locations: LocationTable = field(default_factory=LocationTable, repr=False, compare=False)
 
 
 @dataclass(slots=True)
 class Parameter:
     text: str
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Var(Term):
     text: str
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Function(Term):
     parameters: list[Parameter]
     value: Term
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Call(Term):
     callee: Term
     arguments: list[Term]
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
@@ -53,19 +116,19 @@ class Let(Term):
     name: Parameter
     value: Term
     next_term: Term
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Str(Term):
     value: str
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Int(Term):
     value: int
-    location: Location
+    location: int
 
 
 class BinaryOp(Enum):
@@ -89,13 +152,13 @@ class Binary(Term):
     lhs: Term
     op: BinaryOp
     rhs: Term
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Bool(Term):
     value: bool
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
@@ -103,29 +166,29 @@ class If(Term):
     condition: Term
     then: Term
     otherwise: Term
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Tuple(Term):
     first: Term
     second: Term
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class First(Term):
     value: Term
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Second(Term):
     value: Term
-    location: Location
+    location: int
 
 
 @dataclass(slots=True)
 class Print(Term):
     value: Term
-    location: Location
+    location: int
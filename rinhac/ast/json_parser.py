@@ -1,6 +1,13 @@
-from typing import Any, Dict
+import json
+import re
+import sys
+import threading
+from json.decoder import JSONDecodeError, scanstring
+from json.scanner import NUMBER_RE
+from typing import Any, Callable, Dict, List, Optional
 from rinhac.ast.ast_objects import (
     BinaryOp,
+    Term,
     Parameter,
     Var,
     Function,
@@ -16,67 +23,99 @@ from rinhac.ast.ast_objects import (
     Second,
     Print,
     File,
-    Location,
+    LocationTable,
 )
 from rinhac.utils.index_line_mapper import IndexLineMapper
 
+JSON_DECODER_STACK_SIZE = 512 * 1024 * 1024
+JSON_DECODER_RECURSION_LIMIT = 2_000_000
 
-def parse_parameter(json_parameter: Dict[str, Any], index_line_mapper: IndexLineMapper) -> Parameter:
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_CONSTANTS = {
+    "null": None,
+    "true": True,
+    "false": False,
+    "NaN": float("nan"),
+    "Infinity": float("inf"),
+    "-Infinity": float("-inf"),
+}
+# What ``_decode_value`` returns for a ``{`` or ``[``, which a string can't be.
+_OBJECT_START = object()
+_ARRAY_START = object()
+
+
+def parse_parameter(json_parameter: Dict[str, Any], locations: LocationTable) -> Parameter:
     return Parameter(
         text=json_parameter["text"],
-        location=parse_location(json_parameter["location"], index_line_mapper),
+        location=parse_location(json_parameter["location"], locations),
     )
 
 
-def parse_location(
-    json_location: Dict[str, Any], index_line_mapper: IndexLineMapper
-) -> Location:
-    start = json_location["start"]
-    end = json_location["end"]
-    filename = json_location["filename"]
-    line_number = index_line_mapper.get_line_number(start)
-    return Location(start=start, end=end, filename=filename, line_number=line_number)
+def parse_location(json_location: Dict[str, Any], locations: LocationTable) -> int:
+    """Add ``json_location`` to ``locations``; line numbers are resolved later."""
+    return locations.add(
+        json_location["start"], json_location["end"], json_location["filename"]
+    )
 
 
-def parse_json_to_object(
-    json_data: Dict[str, Any], index_line_mapper: IndexLineMapper
-) -> File:
+def _child_terms(json_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if "expression" in json_data:
+        return [json_data["expression"]]
+    kind = json_data["kind"]
+    if kind == "Call":
+        return [json_data["callee"], *json_data["arguments"]]
+    return [json_data[key] for key in _child_keys.get(kind, ())]
+
+
+_child_keys = {
+    "Function": ("value",),
+    "Let": ("value", "next"),
+    "Binary": ("lhs", "rhs"),
+    "If": ("condition", "then", "otherwise"),
+    "Tuple": ("first", "second"),
+    "First": ("value",),
+    "Second": ("value",),
+    "Print": ("value",),
+}
+
+
+def _build_term(
+    json_data: Dict[str, Any], children: List[Term], locations: LocationTable
+):
     has_expression = "expression" in json_data
     if has_expression:
         return File(
             name=json_data["name"],
-            expression=parse_json_to_object(json_data["expression"], index_line_mapper),
-            location=parse_location(json_data["location"], index_line_mapper),
+            expression=children[0],
+            location=parse_location(json_data["location"], locations),
+            locations=locations,
         )
     is_a_term = "kind" in json_data
     if is_a_term:
         kind = json_data["kind"]
-        location = parse_location(json_data["location"], index_line_mapper)
+        location = parse_location(json_data["location"], locations)
 
         if kind == "Var":
             return Var(text=json_data["text"], location=location)
         elif kind == "Function":
             return Function(
                 parameters=[
-                    parse_parameter(parameter, index_line_mapper) for parameter in json_data["parameters"]
+                    parse_parameter(parameter, locations) for parameter in json_data["parameters"]
                 ],
-                value=parse_json_to_object(json_data["value"], index_line_mapper),
+                value=children[0],
                 location=location,
             )
         elif kind == "Call":
             return Call(
-                callee=parse_json_to_object(json_data["callee"], index_line_mapper),
-                arguments=[
-                    parse_json_to_object(argument, index_line_mapper)
-                    for argument in json_data["arguments"]
-                ],
+                callee=children[0],
+                arguments=children[1:],
                 location=location,
             )
         elif kind == "Let":
             return Let(
-                name=parse_parameter(json_data["name"], index_line_mapper),
-                value=parse_json_to_object(json_data["value"], index_line_mapper),
-                next_term=parse_json_to_object(json_data["next"], index_line_mapper),
+                name=parse_parameter(json_data["name"], locations),
+                value=children[0],
+                next_term=children[1],
                 location=location,
             )
         elif kind == "Str":
@@ -91,9 +130,9 @@ def parse_json_to_object(
             )
         elif kind == "Binary":
             return Binary(
-                lhs=parse_json_to_object(json_data["lhs"], index_line_mapper),
+                lhs=children[0],
                 op=BinaryOp(json_data["op"]),
-                rhs=parse_json_to_object(json_data["rhs"], index_line_mapper),
+                rhs=children[1],
                 location=location,
             )
         elif kind == "Bool":
@@ -103,29 +142,257 @@ def parse_json_to_object(
             )
         elif kind == "If":
             return If(
-                condition=parse_json_to_object(json_data["condition"], index_line_mapper),
-                then=parse_json_to_object(json_data["then"], index_line_mapper),
-                otherwise=parse_json_to_object(json_data["otherwise"], index_line_mapper),
+                condition=children[0],
+                then=children[1],
+                otherwise=children[2],
                 location=location,
             )
         elif kind == "Tuple":
             return Tuple(
-                first=parse_json_to_object(json_data["first"], index_line_mapper),
-                second=parse_json_to_object(json_data["second"], index_line_mapper),
+                first=children[0],
+                second=children[1],
                 location=location,
             )
         elif kind == "First":
             return First(
-                value=parse_json_to_object(json_data["value"], index_line_mapper),
+                value=children[0],
                 location=location,
             )
         elif kind == "Second":
             return Second(
-                value=parse_json_to_object(json_data["value"], index_line_mapper),
+                value=children[0],
                 location=location,
             )
         elif kind == "Print":
             return Print(
-                value=parse_json_to_object(json_data["value"], index_line_mapper),
+                value=children[0],
                 location=location,
             )
+
+
+def parse_json_to_object(
+    json_data: Dict[str, Any], index_line_mapper: IndexLineMapper
+) -> File:
+    """Build the AST objects bottom-up with an explicit stack.
+
+    A Rinha program is one long chain of nested terms, so recursing once per
+    level would hit the interpreter recursion limit on real programs.
+    """
+    locations = LocationTable()
+    built: List[Any] = []
+    pending = [(json_data, False)]
+    while pending:
+        json_term, children_built = pending.pop()
+        children = _child_terms(json_term)
+        if not children_built:
+            pending.append((json_term, True))
+            pending.extend((child, False) for child in reversed(children))
+            continue
+        arguments = built[len(built) - len(children):]
+        del built[len(built) - len(children):]
+        built.append(_build_term(json_term, arguments, locations))
+    locations.resolve_line_numbers(index_line_mapper)
+    return built[0]
+
+
+def _decode_value(text: str, position: int):
+    """The scalar JSON value at ``position``, or a ``{`` or ``[`` opening one."""
+    char = text[position:position + 1]
+    if char == "{":
+        return _OBJECT_START, position + 1
+    if char == "[":
+        return _ARRAY_START, position + 1
+    if char == '"':
+        return scanstring(text, position + 1)
+    for constant, value in _CONSTANTS.items():
+        if text.startswith(constant, position):
+            return value, position + len(constant)
+    number = NUMBER_RE.match(text, position)
+    if number is None:
+        raise JSONDecodeError("Expecting value", text, position)
+    integer, fraction, exponent = number.groups()
+    if fraction or exponent:
+        return float(integer + (fraction or "") + (exponent or "")), number.end()
+    return int(integer), number.end()
+
+
+def _decode_key(text: str, position: int):
+    """The member name at ``position`` and where its value starts."""
+    position = _WHITESPACE.match(text, position).end()
+    if text[position:position + 1] != '"':
+        raise JSONDecodeError("Expecting property name enclosed in double quotes", text, position)
+    key, position = scanstring(text, position + 1)
+    position = _WHITESPACE.match(text, position).end()
+    if text[position:position + 1] != ":":
+        raise JSONDecodeError("Expecting ':' delimiter", text, position)
+    return key, position + 1
+
+
+def _decode_iterative(text: str, object_hook: Optional[Callable] = None):
+    """``json.loads`` with an explicit stack of the open objects and arrays.
+
+    Much slower than the C decoder, so it only decodes documents nesting
+    deeper than that one can go.
+    """
+    # Each open container with the member name its next value is stored under.
+    open_containers: List[list] = []
+    position = 0
+    while True:
+        position = _WHITESPACE.match(text, position).end()
+        value, position = _decode_value(text, position)
+        if value is _OBJECT_START:
+            position = _WHITESPACE.match(text, position).end()
+            if text[position:position + 1] != "}":
+                key, position = _decode_key(text, position)
+                open_containers.append([{}, key])
+                continue
+            position += 1
+            value = {} if object_hook is None else object_hook({})
+        elif value is _ARRAY_START:
+            position = _WHITESPACE.match(text, position).end()
+            if text[position:position + 1] != "]":
+                open_containers.append([[], None])
+                continue
+            position += 1
+            value = []
+
+        # Store the value, and every container it completes, in its parent.
+        while True:
+            position = _WHITESPACE.match(text, position).end()
+            if not open_containers:
+                if position != len(text):
+                    raise JSONDecodeError("Extra data", text, position)
+                return value
+            container, key = open_containers[-1]
+            if key is None:
+                container.append(value)
+            else:
+                container[key] = value
+            char = text[position:position + 1]
+            if char == ",":
+                if key is not None:
+                    open_containers[-1][1], position = _decode_key(text, position + 1)
+                else:
+                    position += 1
+                break
+            if char != ("]" if key is None else "}"):
+                raise JSONDecodeError("Expecting ',' delimiter", text, position)
+            position += 1
+            open_containers.pop()
+            value = container
+            if key is not None and object_hook is not None:
+                value = object_hook(container)
+
+
+def _decode_deep(file, restart: Optional[Callable] = None, **options):
+    """``json.load`` for arbitrarily deep ASTs.
+
+    The C decoder recurses once per nesting level and is bounded by both the
+    recursion limit and the C stack, so decoding runs on a helper thread with
+    a large stack and a raised recursion limit. From 3.12 the decoder caps
+    its own depth whatever those are; a document too deep for it is decoded
+    again with ``_decode_iterative``, after calling ``restart`` to drop what
+    the object hook had built.
+    """
+    text = file.read()
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode(json.detect_encoding(text), "surrogatepass")
+    result = {}
+
+    def decode():
+        try:
+            result["value"] = json.loads(text, **options)
+        except BaseException as error:
+            result["error"] = error
+
+    previous_limit = sys.getrecursionlimit()
+    previous_stack_size = threading.stack_size(JSON_DECODER_STACK_SIZE)
+    sys.setrecursionlimit(max(previous_limit, JSON_DECODER_RECURSION_LIMIT))
+    try:
+        decoder = threading.Thread(target=decode)
+        decoder.start()
+        decoder.join()
+    finally:
+        threading.stack_size(previous_stack_size)
+        sys.setrecursionlimit(previous_limit)
+
+    if isinstance(result.get("error"), RecursionError):
+        del result["error"]
+        if restart is not None:
+            restart()
+        return _decode_iterative(text, **options)
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def load_json_ast(file) -> Dict[str, Any]:
+    """The JSON AST in ``file`` as plain dicts, however deep it nests."""
+    return _decode_deep(file)
+
+
+_TERM_BUILDERS = {
+    "Var": lambda obj: Var(text=obj["text"], location=obj["location"]),
+    "Function": lambda obj: Function(
+        parameters=obj["parameters"], value=obj["value"], location=obj["location"]
+    ),
+    "Call": lambda obj: Call(
+        callee=obj["callee"], arguments=obj["arguments"], location=obj["location"]
+    ),
+    "Let": lambda obj: Let(
+        name=obj["name"], value=obj["value"], next_term=obj["next"], location=obj["location"]
+    ),
+    "Str": lambda obj: Str(value=obj["value"], location=obj["location"]),
+    "Int": lambda obj: Int(value=obj["value"], location=obj["location"]),
+    "Binary": lambda obj: Binary(
+        lhs=obj["lhs"], op=BinaryOp(obj["op"]), rhs=obj["rhs"], location=obj["location"]
+    ),
+    "Bool": lambda obj: Bool(value=obj["value"], location=obj["location"]),
+    "If": lambda obj: If(
+        condition=obj["condition"],
+        then=obj["then"],
+        otherwise=obj["otherwise"],
+        location=obj["location"],
+    ),
+    "Tuple": lambda obj: Tuple(first=obj["first"], second=obj["second"], location=obj["location"]),
+    "First": lambda obj: First(value=obj["value"], location=obj["location"]),
+    "Second": lambda obj: Second(value=obj["value"], location=obj["location"]),
+    "Print": lambda obj: Print(value=obj["value"], location=obj["location"]),
+}
+
+
+def load_ast(file, ast_file_path: str) -> File:
+    """Decode the JSON AST in ``file`` straight into AST objects.
+
+    The decoder calls the hook for each JSON object once its members are
+    decoded, innermost first, so every object becomes its AST node right
+    away and the dict tree ``load_json_ast`` returns never exists as a
+    whole. Line numbers are filled in afterwards, once the AST ``name``
+    says which source file to index.
+    """
+    locations = LocationTable()
+    add_location = locations.add
+
+    def hook(obj: Dict[str, Any]):
+        kind = obj.get("kind")
+        if kind is not None:
+            build = _TERM_BUILDERS.get(kind)
+            if build is None:
+                raise ValueError(f"unknown term kind {kind!r}")
+            return build(obj)
+        if "filename" in obj:
+            return add_location(obj["start"], obj["end"], obj["filename"])
+        if "expression" in obj:
+            return File(
+                name=obj["name"],
+                expression=obj["expression"],
+                location=obj["location"],
+                locations=locations,
+            )
+        return Parameter(text=obj["text"], location=obj["location"])
+
+    ast = _decode_deep(file, locations.clear, object_hook=hook)
+    if not isinstance(ast, File):
+        raise ValueError("the JSON document is not a Rinha AST file")
+    locations.resolve_line_numbers(IndexLineMapper.for_ast(ast_file_path, {"name": ast.name}))
+    return ast
@@ -0,0 +1,120 @@
+import dataclasses
+import glob
+import io
+import json
+import os
+import unittest
+from rinhac.ast import File, Let, Location
+from rinhac.ast.json_parser import (
+    _decode_iterative,
+    load_ast,
+    load_json_ast,
+    parse_json_to_object,
+)
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+TEST_DATA = os.path.join(_current_dir, "..", "test_data")
+
+
+def _resolve_locations(term, locations):
+    """``term`` as nested tuples, with location ids replaced by ``Location``s.
+
+    The two parsers number locations in different orders, so ids alone
+    cannot be compared.
+    """
+    if isinstance(term, list):
+        return [_resolve_locations(item, locations) for item in term]
+    if not dataclasses.is_dataclass(term):
+        return term
+    fields = []
+    for field in dataclasses.fields(term):
+        if not field.compare:
+            continue
+        value = getattr(term, field.name)
+        if field.name == "location":
+            value = locations[value]
+        fields.append((field.name, _resolve_locations(value, locations)))
+    return type(term).__name__, tuple(fields)
+
+
+class TestLoadAst(unittest.TestCase):
+    def test_matches_two_pass_parse(self):
+        json_paths = sorted(glob.glob(os.path.join(TEST_DATA, "*", "*.json")))
+        self.assertGreater(len(json_paths), 10)
+        for json_path in json_paths:
+            with self.subTest(os.path.relpath(json_path, TEST_DATA)):
+                with open(json_path, "rb") as f:
+                    ast = load_ast(f, json_path)
+                with open(json_path, "rb") as f:
+                    json_ast = load_json_ast(f)
+                expected = parse_json_to_object(
+                    json_ast, IndexLineMapper.for_ast(json_path, json_ast)
+                )
+
+                self.assertIsInstance(ast, File)
+                self.assertEqual(
+                    _resolve_locations(ast, ast.locations),
+                    _resolve_locations(expected, expected.locations),
+                )
+
+    def test_line_numbers(self):
+        json_path = os.path.join(TEST_DATA, "compiler", "if_else_test.json")
+        with open(json_path, "rb") as f:
+            ast = load_ast(f, json_path)
+
+        self.assertIsInstance(ast.expression, Let)
+        locations = ast.locations
+        self.assertEqual(locations.line_number(ast.expression.location), 1)
+        self.assertGreater(locations.line_number(ast.expression.next_term.location), 1)
+
+    def test_interns_filenames(self):
+        json_path = os.path.join(TEST_DATA, "compiler", "if_else_test.json")
+        with open(json_path, "rb") as f:
+            ast = load_ast(f, json_path)
+
+        locations = ast.locations
+        self.assertGreater(len(locations), 1)
+        self.assertEqual(len(locations.filenames), 1)
+        location = locations[ast.expression.location]
+        self.assertIsInstance(location, Location)
+        self.assertEqual(location.filename, locations.filenames[0])
+        self.assertEqual(location.line_number, 1)
+
+    def test_rejects_other_documents(self):
+        with self.assertRaises(ValueError):
+            load_ast(io.BytesIO(b'{"kind": "Loop", "location": null}'), "loop.json")
+        with self.assertRaises(ValueError):
+            load_ast(io.BytesIO(json.dumps([1, 2]).encode()), "list.json")
+
+
+class TestIterativeDecoder(unittest.TestCase):
+    def test_matches_json_module(self):
+        documents = [
+            '{"a": [1, -2.5, 3e2, "x\\u00e9\\"{", true, false, null, {"b": {}}], "c": []}',
+            " [ [ ] , { } ] ",
+            '"["',
+            "[NaN, -Infinity]",
+        ]
+        for json_path in sorted(glob.glob(os.path.join(TEST_DATA, "*", "*.json"))):
+            with open(json_path) as f:
+                documents.append(f.read())
+        for document in documents:
+            with self.subTest(document[:40]):
+                self.assertEqual(
+                    repr(_decode_iterative(document, object_hook=sorted)),
+                    repr(json.loads(document, object_hook=sorted)),
+                )
+
+    def test_rejects_malformed_documents(self):
+        for document in ["", "[1,]", '{"a" 1}', "[1 2]", '{"a": 1,}', "[1] 2", "{1: 2}", "["]:
+            with self.subTest(document):
+                with self.assertRaises(json.JSONDecodeError):
+                    _decode_iterative(document)
+
+    def test_deep_document(self):
+        depth = 100_000
+        value = _decode_iterative('{"a": ' * depth + "[]" + "}" * depth)
+        for _ in range(depth):
+            value = value["a"]
+        self.assertEqual(value, [])
@@ -0,0 +1,215 @@
+import sys
+from typing import Optional
+from bytecode import UNSET, Bytecode, CellVar, Compare, Instr, Label
+from bytecode import BinaryOp as NumberOp
+from rinhac.ast import BinaryOp
+
+
+class Backend:
+    """The opcodes ``Compiler`` emits for CPython 3.10.
+
+    Every instruction whose name, argument or surrounding sequence changed
+    between interpreter versions is built here; subclasses override what
+    3.11 and 3.12 changed. The ``bytecode`` library only accepts opcodes of
+    the running interpreter, so ``backend_for`` picks the backend from it.
+    """
+
+    version = (3, 10)
+    # Whether a conditional jump may go to an earlier instruction.
+    backward_conditional_jumps = True
+    # Whether calls made from C, as through ``lru_cache``, count against a
+    # fixed limit that ``sys.setrecursionlimit`` does not raise.
+    fixed_c_recursion_limit = False
+
+    _binary_names = {
+        BinaryOp.Add: "BINARY_ADD",
+        BinaryOp.Sub: "BINARY_SUBTRACT",
+        BinaryOp.Mul: "BINARY_MULTIPLY",
+        BinaryOp.Div: "BINARY_FLOOR_DIVIDE",
+        BinaryOp.Rem: "BINARY_MODULO",
+    }
+    _comparisons = {
+        BinaryOp.Eq: Compare.EQ,
+        BinaryOp.Neq: Compare.NE,
+        BinaryOp.Lt: Compare.LT,
+        BinaryOp.Gt: Compare.GT,
+        BinaryOp.Lte: Compare.LE,
+        BinaryOp.Gte: Compare.GE,
+    }
+
+    def prologue(self, bytecode: Bytecode) -> list[Instr]:
+        """Instructions every code object starts with."""
+        return []
+
+    def binary(self, op: BinaryOp, lineno=UNSET) -> Instr:
+        if op in self._comparisons:
+            return Instr("COMPARE_OP", self._comparisons[op], lineno=lineno)
+        return Instr(self._binary_names[op], lineno=lineno)
+
+    def load_fast(self, name: str, lineno: int, bound: bool = True) -> Instr:
+        """Load a local; ``bound`` is False when it may not be assigned yet."""
+        return Instr("LOAD_FAST", name, lineno=lineno)
+
+    def load_global(self, name: str, lineno: int, callee: bool = False) -> Instr:
+        """Load a global; ``callee`` when it is the function of a ``call``."""
+        return Instr("LOAD_GLOBAL", name, lineno=lineno)
+
+    def load_attr(self, name: str, lineno: int) -> Instr:
+        return Instr("LOAD_ATTR", name, lineno=lineno)
+
+    def push_null(self, lineno: int) -> list[Instr]:
+        """What goes before a callee not loaded by ``load_global``."""
+        return []
+
+    def call(self, argc: int, lineno: int) -> list[Instr]:
+        return [Instr("CALL_FUNCTION", argc, lineno=lineno)]
+
+    def call_kw(self, argc: int, names: tuple, lineno: int) -> list[Instr]:
+        """Call with the last ``len(names)`` of ``argc`` arguments by keyword."""
+        return [
+            Instr("LOAD_CONST", names, lineno=lineno),
+            Instr("CALL_FUNCTION_KW", argc, lineno=lineno),
+        ]
+
+    def make_function(self, flags: int, name: str, lineno: int) -> list[Instr]:
+        """Build a function from the code object on the stack."""
+        return [
+            Instr("LOAD_CONST", name, lineno=lineno),
+            Instr("MAKE_FUNCTION", flags, lineno=lineno),
+        ]
+
+    def jump(self, target: Label, lineno: int, backward: bool = False) -> Instr:
+        return Instr("JUMP_ABSOLUTE" if backward else "JUMP_FORWARD", target, lineno=lineno)
+
+    def pop_jump_if(self, jump_if: bool, target: Label, lineno: int) -> Instr:
+        """Pop the top of the stack and jump forward if it is ``jump_if``."""
+        return Instr("POP_JUMP_IF_TRUE" if jump_if else "POP_JUMP_IF_FALSE", target, lineno=lineno)
+
+    def jump_if_or_pop(self, jump_if: bool, target: Label, lineno: int) -> list[Instr]:
+        """Jump forward keeping the top of the stack if it is ``jump_if``, else pop it."""
+        name = "JUMP_IF_TRUE_OR_POP" if jump_if else "JUMP_IF_FALSE_OR_POP"
+        return [Instr(name, target, lineno=lineno)]
+
+    def swap(self, lineno: int) -> Instr:
+        """Swap the two values on top of the stack."""
+        return Instr("ROT_TWO", lineno=lineno)
+
+    def store_arguments(self, parameters: list[str], lineno: int, str_add: bool) -> list[Instr]:
+        """Store a tail call's arguments, the last one first.
+
+        ``str_add`` is True when the last argument is a string ``+``, which
+        CPython appends in place when the result is stored right back.
+        """
+        return [Instr("STORE_FAST", name, lineno=lineno) for name in reversed(parameters)]
+
+
+class Python311Backend(Backend):
+    """CPython 3.11: ``RESUME``, ``PRECALL``/``CALL`` and ``BINARY_OP``.
+
+    Calls expect ``NULL`` below the callee, which ``LOAD_GLOBAL`` can push
+    itself. Jumps are relative and their direction is part of the opcode.
+    """
+
+    version = (3, 11)
+    backward_conditional_jumps = False
+
+    _number_ops = {
+        BinaryOp.Add: NumberOp.ADD,
+        BinaryOp.Sub: NumberOp.SUBTRACT,
+        BinaryOp.Mul: NumberOp.MULTIPLY,
+        BinaryOp.Div: NumberOp.FLOOR_DIVIDE,
+        BinaryOp.Rem: NumberOp.REMAINDER,
+    }
+
+    def prologue(self, bytecode: Bytecode) -> list[Instr]:
+        # Cells are created and free variables copied into the frame
+        # before the function starts.
+        prologue = [Instr("MAKE_CELL", CellVar(name)) for name in bytecode.cellvars]
+        if bytecode.freevars:
+            prologue.append(Instr("COPY_FREE_VARS", len(bytecode.freevars)))
+        prologue.append(Instr("RESUME", 0, lineno=bytecode.first_lineno))
+        return prologue
+
+    def binary(self, op: BinaryOp, lineno=UNSET) -> Instr:
+        if op in self._comparisons:
+            return super().binary(op, lineno)
+        return Instr("BINARY_OP", self._number_ops[op], lineno=lineno)
+
+    def load_global(self, name: str, lineno: int, callee: bool = False) -> Instr:
+        return Instr("LOAD_GLOBAL", (callee, name), lineno=lineno)
+
+    def push_null(self, lineno: int) -> list[Instr]:
+        return [Instr("PUSH_NULL", lineno=lineno)]
+
+    def call(self, argc: int, lineno: int) -> list[Instr]:
+        return [Instr("PRECALL", argc, lineno=lineno), Instr("CALL", argc, lineno=lineno)]
+
+    def call_kw(self, argc: int, names: tuple, lineno: int) -> list[Instr]:
+        return [Instr("KW_NAMES", names, lineno=lineno), *self.call(argc, lineno)]
+
+    def make_function(self, flags: int, name: str, lineno: int) -> list[Instr]:
+        # The name comes from the code object's co_qualname.
+        return [Instr("MAKE_FUNCTION", flags, lineno=lineno)]
+
+    def jump(self, target: Label, lineno: int, backward: bool = False) -> Instr:
+        return Instr("JUMP_BACKWARD" if backward else "JUMP_FORWARD", target, lineno=lineno)
+
+    def pop_jump_if(self, jump_if: bool, target: Label, lineno: int) -> Instr:
+        name = "POP_JUMP_FORWARD_IF_TRUE" if jump_if else "POP_JUMP_FORWARD_IF_FALSE"
+        return Instr(name, target, lineno=lineno)
+
+    def swap(self, lineno: int) -> Instr:
+        return Instr("SWAP", 2, lineno=lineno)
+
+    def store_arguments(self, parameters: list[str], lineno: int, str_add: bool) -> list[Instr]:
+        stores = super().store_arguments(parameters, lineno, str_add)
+        if str_add and len(stores) > 1:
+            # Two stores in a row are fused into STORE_FAST__STORE_FAST,
+            # which keeps the add from specializing to the in-place append.
+            stores.insert(1, Instr("NOP", lineno=lineno))
+        return stores
+
+
+class Python312Backend(Python311Backend):
+    """CPython 3.12: no ``PRECALL`` nor ``JUMP_IF_*_OR_POP``.
+
+    ``LOAD_FAST`` no longer checks that the local is bound, so locals that
+    might not be use ``LOAD_FAST_CHECK``.
+    """
+
+    version = (3, 12)
+    fixed_c_recursion_limit = True
+
+    def load_fast(self, name: str, lineno: int, bound: bool = True) -> Instr:
+        return Instr("LOAD_FAST" if bound else "LOAD_FAST_CHECK", name, lineno=lineno)
+
+    def load_attr(self, name: str, lineno: int) -> Instr:
+        return Instr("LOAD_ATTR", (False, name), lineno=lineno)
+
+    def call(self, argc: int, lineno: int) -> list[Instr]:
+        return [Instr("CALL", argc, lineno=lineno)]
+
+    def pop_jump_if(self, jump_if: bool, target: Label, lineno: int) -> Instr:
+        return Instr("POP_JUMP_IF_TRUE" if jump_if else "POP_JUMP_IF_FALSE", target, lineno=lineno)
+
+    def jump_if_or_pop(self, jump_if: bool, target: Label, lineno: int) -> list[Instr]:
+        return [
+            Instr("COPY", 1, lineno=lineno),
+            self.pop_jump_if(jump_if, target, lineno),
+            Instr("POP_TOP", lineno=lineno),
+        ]
+
+
+BACKENDS = {backend.version: backend for backend in (Backend, Python311Backend, Python312Backend)}
+
+
+def backend_for(version: Optional[tuple] = None) -> Backend:
+    """The backend for ``version``, by default the running interpreter's."""
+    version = tuple(version or sys.version_info[:2])
+    if version not in BACKENDS:
+        supported = ", ".join(".".join(map(str, key)) for key in BACKENDS)
+        raise RuntimeError(
+            f"rinhac generates bytecode for Python {supported}, "
+            f"not {'.'.join(map(str, version))}"
+        )
+    return BACKENDS[version]()
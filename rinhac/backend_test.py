@@ -0,0 +1,75 @@
+import sys
+import unittest
+from types import FunctionType
+from bytecode import Bytecode, Instr, Label
+from rinhac.ast import BinaryOp
+from rinhac.backend import BACKENDS, backend_for
+
+
+def _accumulate(str_add: bool) -> FunctionType:
+    """``(n, acc) => if n == 0 { acc } else { loop(n - 1, acc + step) }``."""
+    backend = backend_for()
+    start, done = Label(), Label()
+    bytecode = Bytecode()
+    bytecode.argcount = 3
+    bytecode.argnames = ["n", "acc", "step"]
+    bytecode.extend(
+        [
+            start,
+            backend.load_fast("n", 1),
+            Instr("LOAD_CONST", 0, lineno=1),
+            backend.binary(BinaryOp.Eq, 1),
+            backend.pop_jump_if(True, done, 1),
+            backend.load_fast("n", 2),
+            Instr("LOAD_CONST", 1, lineno=2),
+            backend.binary(BinaryOp.Sub, 2),
+            backend.load_fast("acc", 2),
+            backend.load_fast("step", 2),
+            backend.binary(BinaryOp.Add, 2),
+            backend.load_fast("step", 2),
+            *backend.store_arguments(["n", "acc", "step"], 2, str_add),
+            backend.jump(start, 2, backward=True),
+            done,
+            backend.load_fast("acc", 3),
+            Instr("RETURN_VALUE", lineno=3),
+        ]
+    )
+    bytecode[0:0] = backend.prologue(bytecode)
+    return FunctionType(bytecode.to_code(), {})
+
+
+class TestBackend(unittest.TestCase):
+    def test_running_interpreter(self):
+        backend = backend_for()
+
+        self.assertEqual(backend.version, sys.version_info[:2])
+        self.assertIsInstance(backend, BACKENDS[sys.version_info[:2]])
+
+    def test_unsupported_version(self):
+        with self.assertRaises(RuntimeError):
+            backend_for((3, 9))
+
+    def test_loop(self):
+        self.assertEqual(_accumulate(str_add=False)(100, 0, 2), 200)
+        self.assertEqual(_accumulate(str_add=True)(3, "", "ab"), "ababab")
+
+    def test_short_circuit_value(self):
+        backend = backend_for()
+        end = Label()
+        bytecode = Bytecode()
+        bytecode.argcount = 2
+        bytecode.argnames = ["a", "b"]
+        bytecode.extend(
+            [
+                backend.load_fast("a", 1),
+                *backend.jump_if_or_pop(False, end, 1),
+                backend.load_fast("b", 1),
+                end,
+                Instr("RETURN_VALUE", lineno=1),
+            ]
+        )
+        bytecode[0:0] = backend.prologue(bytecode)
+        and_value = FunctionType(bytecode.to_code(), {})
+
+        self.assertIs(and_value(False, True), False)
+        self.assertEqual(and_value(True, "b"), "b")
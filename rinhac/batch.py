@@ -0,0 +1,229 @@
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class BuildResult:
+    ast_file: str
+    output: str
+    seconds: float
+    error: str | None = None
+    # What the build printed, e.g. ``--stats`` lines.
+    messages: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def available_cores() -> int:
+    """Cores this process may run on, which can be fewer than the machine has."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _glob_base(pattern: str) -> str:
+    """Leading directories of ``pattern`` that contain no glob characters."""
+    parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or os.curdir
+
+
+def collect_ast_files(sources: list[str]) -> list[tuple[str, str]]:
+    """``(ast_file, base directory)`` for every AST a source names.
+
+    A directory contributes every ``*.json`` below it; anything else is a
+    file name or glob pattern. Outputs keep the path relative to the base.
+    """
+    ast_files = []
+    seen = set()
+    for source in sources:
+        if os.path.isdir(source):
+            base = source
+            matches = glob.glob(os.path.join(glob.escape(source), "**", "*.json"), recursive=True)
+        else:
+            base = _glob_base(source)
+            matches = glob.glob(source, recursive=True) if glob.has_magic(source) else [source]
+        for ast_file in sorted(matches):
+            if ast_file not in seen:
+                seen.add(ast_file)
+                ast_files.append((ast_file, base))
+    return ast_files
+
+
+def _output_for(ast_file: str, base: str, output_dir: str | None) -> str:
+    relative = os.path.splitext(os.path.relpath(ast_file, base))[0] + ".pyc"
+    if output_dir is None:
+        return os.path.splitext(ast_file)[0] + ".pyc"
+    return os.path.join(output_dir, relative)
+
+
+def _warm_up():
+    # Workers are forked from the parent, so importing the compiler once
+    # here keeps it out of every file's timing.
+    import bytecode  # noqa: F401
+    import rinhac.compiler  # noqa: F401
+    import rinhac.optimizer.peephole  # noqa: F401
+    from rinhac.ast import json_parser  # noqa: F401
+
+
+def build_file(task: tuple) -> BuildResult:
+    """Build one AST, turning any failure into the result's ``error``."""
+    from rinhac.__main__ import _NO_PROFILE, _build
+
+    ast_file, output, options = task
+    messages = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(messages), contextlib.redirect_stderr(messages):
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            _build(ast_file, output, profile=_NO_PROFILE, **options)
+    except (Exception, SystemExit) as exception:
+        # ``_build`` reports unreadable input on stdout and exits.
+        lines = messages.getvalue().strip().splitlines()
+        if isinstance(exception, SystemExit) and lines:
+            error = lines.pop()
+        else:
+            error = f"{type(exception).__name__}: {exception}"
+        messages = io.StringIO("\n".join(lines))
+    seconds = time.perf_counter() - start
+    return BuildResult(ast_file, output, seconds, error, messages.getvalue().strip())
+
+
+def build_many(
+    sources: list[str],
+    output_dir: str | None = None,
+    jobs: int | None = None,
+    memoize=False,
+    memoize_cache_size=None,
+    constant_folding=True,
+    show_stats=False,
+    cache=True,
+    entry_function=False,
+    peephole=True,
+    disabled_rewrites=(),
+    deep_recursion=None,
+    codegen="bytecode",
+) -> list[BuildResult]:
+    """Build every AST named by ``sources`` with a pool of ``jobs`` processes.
+
+    The options are those of ``rinhac -b``. Each output is written
+    atomically and a failing file does not stop the others; the results
+    come back in input order.
+    """
+    options = dict(
+        memoize=memoize,
+        memoize_cache_size=memoize_cache_size,
+        constant_folding=constant_folding,
+        show_stats=show_stats,
+        cache=cache,
+        entry_function=entry_function,
+        peephole=peephole,
+        disabled_rewrites=tuple(disabled_rewrites),
+        deep_recursion=deep_recursion,
+        codegen=codegen,
+    )
+    tasks = [
+        (ast_file, _output_for(ast_file, base, output_dir), options)
+        for ast_file, base in collect_ast_files(sources)
+    ]
+    jobs = min(jobs or available_cores(), len(tasks)) or 1
+    _warm_up()
+    if jobs == 1:
+        return [build_file(task) for task in tasks]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # A few chunks per worker amortize the pickling round trips while still
+    # balancing files of different sizes.
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(build_file, tasks, chunksize=chunksize))
+
+
+def format_summary(results: list[BuildResult], seconds: float, jobs: int) -> str:
+    lines = []
+    for result in results:
+        if result.ok:
+            lines.append(f"{result.seconds * 1e3:9.1f} ms  {result.ast_file} -> {result.output}")
+        else:
+            lines.append(f"{'FAILED':>12}  {result.ast_file}: {result.error}")
+        if result.messages:
+            lines.extend("    " + line for line in result.messages.splitlines())
+
+    built = sum(result.ok for result in results)
+    failed = len(results) - built
+    throughput = len(results) / seconds if seconds > 0 else float("inf")
+    lines.append(
+        f"built {built}/{len(results)} files in {seconds:.2f} s "
+        f"({throughput:.1f} files/s, {jobs} jobs"
+        + (f", {failed} failed)" if failed else ")")
+    )
+    return "\n".join(lines)
+
+
+def build_many_main(argv):
+    import argparse
+    from rinhac.__main__ import _add_build_arguments, _parse_args
+
+    parser = argparse.ArgumentParser(
+        prog="rinhac build-many",
+        description="Compile many Rinha ASTs in parallel.",
+    )
+    parser.add_argument(
+        "sources",
+        nargs="+",
+        help="AST files, directories (every *.json below them) or glob patterns.",
+    )
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        default=None,
+        help="Write the pyc files here, keeping the relative paths (default: next to each AST).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: available cores).",
+    )
+    _add_build_arguments(parser)
+    args = _parse_args(parser, argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be a positive number")
+
+    jobs = args.jobs or available_cores()
+    start = time.perf_counter()
+    results = build_many(
+        args.sources,
+        args.output_dir,
+        jobs,
+        memoize=args.memoize,
+        memoize_cache_size=args.memoize_size,
+        constant_folding=not args.no_constant_folding,
+        show_stats=args.stats,
+        cache=not args.no_cache,
+        entry_function=args.entry_function,
+        peephole=not args.no_peephole,
+        disabled_rewrites=args.no_rewrite,
+        deep_recursion=args.deep_recursion,
+        codegen=args.codegen,
+    )
+    seconds = time.perf_counter() - start
+    if not results:
+        parser.error("no AST files found")
+    print(format_summary(results, seconds, min(jobs, len(results))))
+    if not all(result.ok for result in results):
+        sys.exit(1)
@@ -0,0 +1,89 @@
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import rinhac.__main__ as rinhac_main
+from rinhac.batch import build_many, collect_ast_files
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+COMPILER_TEST_DATA = os.path.join(_current_dir, "test_data", "compiler")
+
+
+class TestBuildMany(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        environ = mock.patch.dict(
+            os.environ, {"RINHAC_CACHE_DIR": os.path.join(self.directory, "cache")}
+        )
+        environ.start()
+        self.addCleanup(environ.stop)
+
+        self.sources = os.path.join(self.directory, "sources")
+        os.makedirs(os.path.join(self.sources, "nested"))
+        for name, target in (
+            ("if_else_test", "if_else_test.json"),
+            ("tuples_test", os.path.join("nested", "tuples_test.json")),
+        ):
+            for extension in (".json", ".rinha"):
+                shutil.copy(
+                    os.path.join(COMPILER_TEST_DATA, name + extension),
+                    os.path.join(self.sources, os.path.splitext(target)[0] + extension),
+                )
+        with open(os.path.join(self.sources, "broken.json"), "w") as f:
+            f.write("{")
+        self.output_dir = os.path.join(self.directory, "out")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_collect_ast_files(self):
+        directory_files = [path for path, _ in collect_ast_files([self.sources])]
+        glob_files = collect_ast_files([os.path.join(self.sources, "**", "*_test.json")])
+
+        self.assertEqual(
+            [os.path.relpath(path, self.sources) for path in directory_files],
+            ["broken.json", "if_else_test.json", os.path.join("nested", "tuples_test.json")],
+        )
+        self.assertEqual(len(glob_files), 2)
+        self.assertEqual({base for _, base in glob_files}, {self.sources})
+
+    def test_build_many(self):
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                results = build_many([self.sources], self.output_dir, jobs, cache=False)
+
+                self.assertEqual([result.ok for result in results], [False, True, True])
+                self.assertIn("File is not a valid JSON", results[0].error)
+                outputs = [result.output for result in results[1:]]
+                self.assertEqual(
+                    outputs,
+                    [
+                        os.path.join(self.output_dir, "if_else_test.pyc"),
+                        os.path.join(self.output_dir, "nested", "tuples_test.pyc"),
+                    ],
+                )
+                output = subprocess.run(
+                    [sys.executable, outputs[0]], capture_output=True, text=True, check=True
+                ).stdout
+                self.assertEqual(output, "if_else_fn.rinha\n")
+                self.assertFalse(os.path.exists(os.path.join(self.output_dir, "broken.pyc")))
+                # Only complete outputs, no temporary files, are left behind.
+                self.assertEqual(
+                    sorted(os.listdir(self.output_dir)), ["if_else_test.pyc", "nested"]
+                )
+
+    def test_cli(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), self.assertRaises(SystemExit) as exit:
+            rinhac_main.main(["build-many", self.sources, "-d", self.output_dir, "-j", "2"])
+
+        self.assertEqual(exit.exception.code, 1)
+        summary = output.getvalue().splitlines()
+        self.assertIn("FAILED", summary[0])
+        self.assertRegex(summary[-1], r"^built 2/3 files in .* files/s, 2 jobs, 1 failed\)$")
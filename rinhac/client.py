@@ -0,0 +1,154 @@
+"""Client of ``rinhac serve``, and the framing both sides speak.
+
+Every message is a frame: a one byte kind and a big-endian 32-bit length,
+then the payload. The client sends either a ``PATH`` frame with the AST
+file name, or a ``NAME`` frame followed by an ``AST`` frame with the file's
+bytes. It gets ``STDOUT`` and ``STDERR`` chunks as the program writes them,
+then an ``EXIT`` frame with the exit status in decimal.
+
+Frames carry plain bytes rather than JSON, so the client does not import
+``json`` (and ``re`` with it) and starts about as fast as the interpreter.
+"""
+import os
+import struct
+import sys
+
+# ``socket`` wraps this module with enums and ``selectors``, which would
+# cost the client more than the rest of its imports together.
+import _socket
+
+DEFAULT_SOCKET = "/tmp/rinhac.sock"
+
+PATH = b"P"
+NAME = b"N"
+AST = b"A"
+STDOUT = b"O"
+STDERR = b"E"
+EXIT = b"X"
+
+_HEADER = struct.Struct(">cI")
+
+
+def socket_path() -> str:
+    return os.environ.get("RINHAC_SOCKET") or DEFAULT_SOCKET
+
+
+def send_frame(connection: _socket.socket, kind: bytes, payload: bytes = b""):
+    connection.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exactly(connection: _socket.socket, size: int) -> bytes | None:
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = connection.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return bytes(data)
+
+
+def recv_frame(connection: _socket.socket) -> tuple[bytes, bytes] | None:
+    """The next ``(kind, payload)``, or None once the peer has closed."""
+    header = _recv_exactly(connection, _HEADER.size)
+    if header is None:
+        return None
+    kind, size = _HEADER.unpack(header)
+    payload = _recv_exactly(connection, size) if size else b""
+    if payload is None:
+        return None
+    return kind, payload
+
+
+def request(
+    ast_file: str,
+    path: str | None = None,
+    payload: bool = False,
+    stdout=None,
+    stderr=None,
+) -> int:
+    """Run ``ast_file`` on the server at ``path`` and return its exit status.
+
+    The program output is written to the binary streams ``stdout`` and
+    ``stderr`` as it arrives. With ``payload`` the AST itself is sent
+    instead of its path, for servers that cannot read the client's files.
+    Raises ``OSError`` when no server is listening.
+    """
+    path_bytes = os.fsencode(os.path.abspath(ast_file))
+    if payload:
+        with open(ast_file, "rb") as f:
+            frames = [(NAME, path_bytes), (AST, f.read())]
+    else:
+        frames = [(PATH, path_bytes)]
+    connection = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        connection.connect(path or socket_path())
+        if stdout is None:
+            stdout = sys.stdout.buffer
+        if stderr is None:
+            stderr = sys.stderr.buffer
+        for kind, data in frames:
+            send_frame(connection, kind, data)
+        while True:
+            frame = recv_frame(connection)
+            if frame is None:
+                stderr.write(b"rinhac client: server closed the connection\n")
+                return 1
+            kind, data = frame
+            if kind == STDOUT:
+                stdout.write(data)
+                stdout.flush()
+            elif kind == STDERR:
+                stderr.write(data)
+                stderr.flush()
+            elif kind == EXIT:
+                return int(data)
+    finally:
+        connection.close()
+
+
+def client_main(argv):
+    """``rinhac client FILE [--socket PATH] [--payload]``.
+
+    Falls back to ``rinhac run`` in this process when no server listens, so
+    ``run.sh`` keeps working while the daemon is down.
+    """
+    if len(argv) == 1 and not argv[0].startswith("-"):
+        ast_file, path, payload = argv[0], None, False
+    else:
+        import argparse
+
+        parser = argparse.ArgumentParser(
+            prog="rinhac client",
+            description="Run a Rinha AST on a 'rinhac serve' daemon.",
+        )
+        parser.add_argument("filename", help="Path to the file containing the AST.")
+        parser.add_argument(
+            "--socket",
+            default=None,
+            help=f"Server socket (default: $RINHAC_SOCKET or {DEFAULT_SOCKET}).",
+        )
+        parser.add_argument(
+            "--payload",
+            action="store_true",
+            help="Send the AST itself instead of its path.",
+        )
+        args = parser.parse_args(argv)
+        ast_file, path, payload = args.filename, args.socket, args.payload
+
+    if not os.path.isfile(ast_file):
+        print("File not found:", ast_file)
+        sys.exit(1)
+    try:
+        status = request(ast_file, path, payload)
+    except (FileNotFoundError, ConnectionRefusedError):
+        from rinhac.__main__ import run
+
+        return run(ast_file)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    # ``python -m rinhac.client`` skips the imports of the full CLI.
+    client_main(sys.argv[1:])
@@ -1,4 +1,9 @@
-from bytecode import Bytecode, Compare, Instr, CellVar, FreeVar, Label
+from collections import Counter
+from dataclasses import dataclass
+from functools import partial
+from types import CodeType, FunctionType
+from typing import Iterable, Optional
+from bytecode import Bytecode, Instr, CellVar, FreeVar, Label
 from rinhac.ast import (
     BinaryOp,
     Var,
@@ -15,220 +20,690 @@ from rinhac.ast import (
     Second,
     Print,
     File,
+    LocationTable,
 )
 from rinhac import SymbolTable
+from rinhac.backend import Backend, backend_for
+from rinhac.optimizer.peephole import PeepholeOptimizer
+from rinhac.optimizer.type_inference import INT, STR, TypeInference
+from rinhac.runtime import (
+    FLUSH_NAME,
+    OUTPUT_NAME,
+    PRINT_HELPER_NAME,
+    rinha_add,
+    rinha_div,
+    rinha_open_output,
+    rinha_print,
+    rinha_rem,
+    rinha_run_deep,
+)
 from rinhac.symbol_table import SymbolTable
+from rinhac.utils.function_cache import FunctionCache, function_keys
+
+
+DEFAULT_MEMOIZE_CACHE_SIZE = 4096
+
+# Global the module prologue binds ``rinhac.runtime.rinha_add`` to.
+ADD_HELPER_NAME = "__rinha_add__"
+# Globals the module prologue binds the helpers of Rinha ``/`` and ``%`` to;
+# they truncate toward zero, which no opcode does.
+DIVISION_HELPER_NAMES = {BinaryOp.Div: "__rinha_div__", BinaryOp.Rem: "__rinha_rem__"}
+_DIVISION_HELPERS = {BinaryOp.Div: rinha_div, BinaryOp.Rem: rinha_rem}
+
+
+def add_kind(types: Optional[TypeInference], term: Binary) -> str:
+    """How the ``+`` of ``term`` can be compiled given the inferred ``types``.
+
+    "int" and "str" add operands of that type, "concat" joins a string and
+    an integer, and "generic" calls the runtime helper.
+    """
+    if types is None:
+        return "generic"
+    lhs, rhs = types.type_of(term.lhs), types.type_of(term.rhs)
+    if lhs == INT and rhs == INT:
+        return "int"
+    if lhs == STR and rhs == STR:
+        return "str"
+    if lhs in (INT, STR) and rhs in (INT, STR):
+        return "concat"
+    return "generic"
+
+
+@dataclass(slots=True)
+class TailCallTarget:
+    """Function whose self-calls in tail position are compiled as jumps."""
+
+    name: str
+    parameters: list[str]
+    entry: Label
+
+
+@dataclass(slots=True)
+class CompileTask:
+    term: object
+    bytecode: Bytecode
+    symbol_table: SymbolTable
+    tail_call: Optional[TailCallTarget] = None
+
+
+@dataclass(slots=True)
+class ConditionTask:
+    """Compile ``term`` as a jump to ``target`` taken when it is ``jump_if``."""
+
+    term: object
+    bytecode: Bytecode
+    symbol_table: SymbolTable
+    target: Label
+    jump_if: bool
+
+
+# ``a && b`` is decided by ``a`` when it is false, ``a || b`` when it is true.
+_SHORT_CIRCUIT_DECIDES_ON = {
+    BinaryOp.And: False,
+    BinaryOp.Or: True,
+}
 
 
 class Compiler:
-    binary_map = {
-        BinaryOp.Add: Instr("BINARY_ADD"),
-        BinaryOp.Sub: Instr("BINARY_SUBTRACT"),
-        BinaryOp.Mul: Instr("BINARY_MULTIPLY"),
-        BinaryOp.Div: Instr("BINARY_FLOOR_DIVIDE"),
-        BinaryOp.Rem: Instr("BINARY_MODULO"),
-        BinaryOp.Eq: Instr("COMPARE_OP", Compare.EQ),
-        BinaryOp.Neq: Instr("COMPARE_OP", Compare.NE),
-        BinaryOp.Lt: Instr("COMPARE_OP", Compare.LT),
-        BinaryOp.Gt: Instr("COMPARE_OP", Compare.GT),
-        BinaryOp.Lte: Instr("COMPARE_OP", Compare.LE),
-        BinaryOp.Gte: Instr("COMPARE_OP", Compare.GE),
-        BinaryOp.And: Instr("BINARY_AND"),
-        BinaryOp.Or: Instr("BINARY_OR"),
-    }
+    def __init__(
+        self,
+        tail_calls: bool = True,
+        memoized_functions: Iterable[Function] = (),
+        memoize_cache_size: int = DEFAULT_MEMOIZE_CACHE_SIZE,
+        types: Optional[TypeInference] = None,
+        backend: Optional[Backend] = None,
+        function_cache: Optional[FunctionCache] = None,
+        optimizer: Optional[PeepholeOptimizer] = None,
+        deep_recursion: Optional[tuple[int, int]] = None,
+    ):
+        # Opcodes differ between interpreter versions; by default they are
+        # the running interpreter's, the only ones ``bytecode`` accepts.
+        self.backend = backend or backend_for()
+        self.tail_calls = tail_calls
+        if deep_recursion is not None and self.backend.fixed_c_recursion_limit:
+            # Recursion through ``lru_cache`` would stop a few hundred calls
+            # deep however large the stack.
+            memoized_functions = ()
+        self.memoized_functions = {id(function) for function in memoized_functions}
+        self.memoize_cache_size = memoize_cache_size
+        self.types = types
+        # Code objects of functions compiled by earlier builds, looked up by
+        # the keys ``function_keys`` gives each ``Function`` of the file.
+        self.function_cache = function_cache
+        self._function_keys: dict[int, str] = {}
+        # Rewrites each function before it is assembled, so neither the
+        # cache nor a later pass has to disassemble it again. The module
+        # code is left to the caller.
+        self.optimizer = optimizer
+        # Stack size in bytes and recursion limit of the thread the entry
+        # function runs on, 0 sizing them when the program starts; ``None``
+        # calls it on the main thread.
+        self.deep_recursion = deep_recursion
+        # Locations of the ``File`` being compiled; nodes only hold ids.
+        self._locations = LocationTable()
+        self._lines = self._locations.lines
+        # How each ``+`` was compiled: "int", "str" and "concat" are
+        # specialized from the inferred types, "generic" calls the helper.
+        self.add_stats: Counter = Counter()
+        # Number of ``print`` terms compiled, which need the output buffer.
+        self.print_count = 0
+        # Number of ``/`` and ``%`` compiled, by operator name; each calls
+        # its helper.
+        self.division_stats: Counter = Counter()
+
+    @property
+    def specialized_add_count(self) -> int:
+        return sum(self.add_stats.values()) - self.add_stats["generic"]
+
+    def _memoize_decorator(self, line_number: int) -> list[Instr]:
+        """Push ``functools.lru_cache(maxsize=..., typed=True)`` on the stack.
+
+        The decorator is called with the function next, so it is pushed as a
+        callee itself.
+        """
+        backend = self.backend
+        return [
+            *backend.push_null(line_number),
+            *backend.push_null(line_number),
+            Instr("LOAD_CONST", 0, lineno=line_number),
+            Instr("LOAD_CONST", None, lineno=line_number),
+            Instr("IMPORT_NAME", "functools", lineno=line_number),
+            backend.load_attr("lru_cache", line_number),
+            Instr("LOAD_CONST", self.memoize_cache_size, lineno=line_number),
+            Instr("LOAD_CONST", True, lineno=line_number),
+            *backend.call_kw(2, ("maxsize", "typed"), line_number),
+        ]
+
+    def _add_kind(self, term: Binary) -> str:
+        return add_kind(self.types, term)
+
+    def _compile_add(self, term: Binary, bytecode: Bytecode, symbol_table: SymbolTable, pending: list):
+        """Compile Rinha ``+`` with the cheapest sequence its operand types allow."""
+        kind = self._add_kind(term)
+        self.add_stats[kind] += 1
+        line_number = self._lines[term.location]
+        if kind == "int" or kind == "str":
+            pending.append(partial(bytecode.append, self.backend.binary(BinaryOp.Add, line_number)))
+            pending.append(CompileTask(term.rhs, bytecode, symbol_table))
+            pending.append(CompileTask(term.lhs, bytecode, symbol_table))
+        elif kind == "concat":
+            # Only the integer side needs formatting before joining.
+            def format_value(operand):
+                if self.types.type_of(operand) == INT:
+                    bytecode.append(Instr("FORMAT_VALUE", 0, lineno=line_number))
+
+            pending.append(partial(bytecode.append, Instr("BUILD_STRING", 2, lineno=line_number)))
+            pending.append(partial(format_value, term.rhs))
+            pending.append(CompileTask(term.rhs, bytecode, symbol_table))
+            pending.append(partial(format_value, term.lhs))
+            pending.append(CompileTask(term.lhs, bytecode, symbol_table))
+        else:
+            bytecode.append(self.backend.load_global(ADD_HELPER_NAME, line_number, callee=True))
+            pending.append(partial(bytecode.extend, self.backend.call(2, line_number)))
+            pending.append(CompileTask(term.rhs, bytecode, symbol_table))
+            pending.append(CompileTask(term.lhs, bytecode, symbol_table))
+
+    def _make_helper(self, helper: FunctionType, line_number: int) -> list[Instr]:
+        """Define the runtime ``helper``, its defaults the builtins it binds.
+
+        The prologue runs before any Rinha binding, so the names still
+        resolve to the builtins.
+        """
+        defaults = helper.__defaults__ or ()
+        instructions = [
+            Instr("LOAD_NAME", value.__name__, lineno=line_number) for value in defaults
+        ]
+        if defaults:
+            instructions.append(Instr("BUILD_TUPLE", len(defaults), lineno=line_number))
+        return [
+            *instructions,
+            Instr("LOAD_CONST", helper.__code__, lineno=line_number),
+            # MAKE_FUNCTION flag 0x01: positional defaults.
+            *self.backend.make_function(1 if defaults else 0, helper.__name__, line_number),
+        ]
+
+    def _add_helper_prologue(self, line_number: int) -> list[Instr]:
+        return [
+            *self._make_helper(rinha_add, line_number),
+            Instr("STORE_NAME", ADD_HELPER_NAME, lineno=line_number),
+        ]
+
+    def _division_helper_prologue(self, op: BinaryOp, line_number: int) -> list[Instr]:
+        return [
+            *self._make_helper(_DIVISION_HELPERS[op], line_number),
+            Instr("STORE_NAME", DIVISION_HELPER_NAMES[op], lineno=line_number),
+        ]
+
+    def _print_helper_prologue(self, line_number: int) -> list[Instr]:
+        backend = self.backend
+        return [
+            *backend.push_null(line_number),
+            Instr("LOAD_CONST", rinha_open_output.__code__, lineno=line_number),
+            *backend.make_function(0, rinha_open_output.__name__, line_number),
+            *backend.call(0, line_number),
+            Instr("UNPACK_SEQUENCE", 2, lineno=line_number),
+            Instr("STORE_NAME", OUTPUT_NAME, lineno=line_number),
+            Instr("STORE_NAME", FLUSH_NAME, lineno=line_number),
+            *self._make_helper(rinha_print, line_number),
+            Instr("STORE_NAME", PRINT_HELPER_NAME, lineno=line_number),
+        ]
+
+    def _run_deep(self, entry_code: CodeType, line_number: int) -> list[Instr]:
+        """Call the entry function through ``rinha_run_deep``."""
+        backend = self.backend
+        stack_size, recursion_limit = self.deep_recursion
+        return [
+            *backend.push_null(line_number),
+            Instr("LOAD_CONST", rinha_run_deep.__code__, lineno=line_number),
+            *backend.make_function(0, rinha_run_deep.__name__, line_number),
+            Instr("LOAD_CONST", entry_code, lineno=line_number),
+            *backend.make_function(0, SymbolTable.entry_context_name, line_number),
+            Instr("LOAD_CONST", stack_size, lineno=line_number),
+            Instr("LOAD_CONST", recursion_limit, lineno=line_number),
+            *backend.call(3, line_number),
+        ]
+
+    def _flush_output(self, line_number: int) -> list[Instr]:
+        """Write out the output buffer; the stack is left as it was."""
+        return [
+            *self.backend.push_null(line_number),
+            Instr("LOAD_NAME", FLUSH_NAME, lineno=line_number),
+            *self.backend.call(0, line_number),
+            Instr("POP_TOP", lineno=line_number),
+        ]
 
     @staticmethod
-    def _extend_vars(origin: Bytecode, new: Bytecode):
-        origin.cellvars = list(set(origin.cellvars).union(set(new.cellvars)))
-        origin.freevars = list(set(origin.freevars).union(set(new.freevars)))
+    def _can_eliminate_tail_calls(function_symbol_table: SymbolTable) -> bool:
+        # Rebinding a captured variable would change the cell seen by closures
+        # created in previous iterations, so only cell-free functions loop.
+        return not function_symbol_table.cellvars
 
-    def to_bytecode(
-        self, term, bytecode: Bytecode, symbol_table: SymbolTable
-    ) -> Bytecode:
-        if isinstance(term, File):
-            bytecode = self.to_bytecode(term.expression, bytecode, symbol_table)
-            bytecode.extend(
-                [Instr("POP_TOP"), Instr("LOAD_CONST", None), Instr("RETURN_VALUE")]
+    def _load(
+        self, name: str, symbol_table: SymbolTable, bytecode: Bytecode, line_number: int
+    ) -> Instr:
+        load_type = symbol_table.load_type(name)
+        if load_type == "NAME":
+            return Instr("LOAD_NAME", name, lineno=line_number)
+        if load_type == "DEREF":
+            cell = CellVar(name) if symbol_table.is_cellvar(name) else FreeVar(name)
+            return Instr("LOAD_DEREF", cell, lineno=line_number)
+        if load_type == "FAST":
+            # Parameters are always bound; a ``let`` might not have run yet.
+            return self.backend.load_fast(name, line_number, bound=name in bytecode.argnames)
+        return self.backend.load_global(name, line_number)
+
+    @staticmethod
+    def _store(name: str, symbol_table: SymbolTable, line_number: int) -> Instr:
+        load_type = symbol_table.load_type(name)
+        if load_type == "NAME":
+            return Instr("STORE_NAME", name, lineno=line_number)
+        if load_type == "DEREF":
+            return Instr("STORE_DEREF", CellVar(name), lineno=line_number)
+        if load_type == "FAST":
+            return Instr("STORE_FAST", name, lineno=line_number)
+        return Instr("STORE_GLOBAL", name, lineno=line_number)
+
+    @staticmethod
+    def _is_tail_call(
+        term: Call, tail_call: Optional[TailCallTarget], symbol_table: SymbolTable
+    ) -> bool:
+        return (
+            tail_call is not None
+            and isinstance(term.callee, Var)
+            and term.callee.text == tail_call.name
+            and symbol_table.is_recursive_reference(term.callee.text)
+            and len(term.arguments) == len(tail_call.parameters)
+        )
+
+    @staticmethod
+    def _last_lineno(bytecode: Bytecode, default: int) -> int:
+        for instr in reversed(bytecode):
+            if isinstance(instr, Instr):
+                return instr.lineno
+        return default
+
+    def _compile_function(
+        self,
+        function: Function,
+        name: str,
+        location: int,
+        bytecode: Bytecode,
+        symbol_table: SymbolTable,
+        pending: list,
+    ):
+        """Queue ``function``'s body and the code that builds it in ``bytecode``."""
+        line_number = self._lines[function.location]
+        key = self._function_keys.get(id(function))
+        cached = self.function_cache.load(key) if key is not None else None
+        if cached is not None:
+            # Unchanged since it was cached: its body is not compiled again.
+            code, add_stats, rewrite_stats, print_count, division_stats = cached
+            self.add_stats.update(add_stats)
+            self.print_count += print_count
+            self.division_stats.update(division_stats)
+            if self.optimizer is not None:
+                self.optimizer.stats.update(rewrite_stats)
+            pending.append(
+                partial(self._make_function, code, function, name, line_number, bytecode, symbol_table)
             )
-            bytecode.name = "<rinha:module>"
-            bytecode.filename = term.location.filename
-            bytecode.first_lineno = term.location.line_number
-            return bytecode
-        elif isinstance(term, Let) and not isinstance(term.value, Function):
-            variable_name = term.name.text
-            symbol = symbol_table.lookup(variable_name)
-            if symbol.load_type == "NAME":
-                bytecode.extend(self.to_bytecode(term.value, Bytecode(), symbol_table))
-                bytecode.append(
-                    Instr("STORE_NAME", variable_name, lineno=term.location.line_number)
+            return
+
+        function_symbol_table = symbol_table.context_for(function)
+        function_bytecode = Bytecode()
+        function_bytecode.argcount = len(function.parameters)
+        function_bytecode.argnames = [
+            function_symbol_table.variable(param) for param in function.parameters
+        ]
+        function_bytecode.cellvars = function_symbol_table.cellvars
+        function_bytecode.freevars = function_symbol_table.freevars
+        function_bytecode.name = function_bytecode.qualname = name
+        function_bytecode.filename = self._locations.filename(location)
+        function_bytecode.first_lineno = self._lines[location]
+        function_tail_call = None
+        if self.tail_calls and self._can_eliminate_tail_calls(function_symbol_table):
+            function_tail_call = TailCallTarget(name, function_bytecode.argnames, Label())
+            function_bytecode.append(function_tail_call.entry)
+        add_stats_before = self.add_stats.copy()
+        print_count_before = self.print_count
+        division_stats_before = self.division_stats.copy()
+        rewrite_stats_before = self.optimizer.stats.copy() if self.optimizer else Counter()
+
+        def finish_function():
+            code = self._assemble(function_bytecode)
+            if key is not None:
+                rewrite_stats = self.optimizer.stats if self.optimizer else Counter()
+                self.function_cache.store(
+                    key,
+                    code,
+                    self.add_stats - add_stats_before,
+                    rewrite_stats - rewrite_stats_before,
+                    self.print_count - print_count_before,
+                    self.division_stats - division_stats_before,
                 )
-            elif symbol.load_type == "DEREF":
-                bytecode.extend(self.to_bytecode(term.value, Bytecode(), symbol_table))
-                bytecode.cellvars.append(
-                    variable_name
-                ) if variable_name not in bytecode.cellvars else None
-                bytecode.append(
-                    Instr(
-                        "STORE_DEREF",
-                        CellVar(variable_name),
-                        lineno=term.location.line_number,
-                    )
+            self._make_function(code, function, name, line_number, bytecode, symbol_table)
+
+        pending.append(finish_function)
+        pending.append(
+            CompileTask(
+                function.value,
+                function_bytecode,
+                function_symbol_table,
+                function_tail_call,
+            )
+        )
+
+    def _assemble(self, bytecode: Bytecode) -> CodeType:
+        """Close a function's ``bytecode`` and assemble its code object."""
+        # The line is explicit so that rewrites removing the instructions
+        # before the return do not change it.
+        line_number = self._last_lineno(bytecode, bytecode.first_lineno)
+        bytecode.append(Instr("RETURN_VALUE", lineno=line_number))
+        bytecode[0:0] = self.backend.prologue(bytecode)
+        if self.optimizer is not None:
+            self.optimizer.optimize(bytecode, nested=False)
+        return bytecode.to_code()
+
+    def _make_function(
+        self,
+        code: CodeType,
+        function: Function,
+        name: str,
+        line_number: int,
+        bytecode: Bytecode,
+        symbol_table: SymbolTable,
+    ):
+        """Build the function of ``code`` in ``bytecode``, with its closure."""
+        memoized = id(function) in self.memoized_functions
+        if memoized:
+            bytecode.extend(self._memoize_decorator(line_number))
+        function_flag = 0
+        if code.co_freevars:
+            for freevar in code.co_freevars:
+                cell = CellVar(freevar) if symbol_table.is_cellvar(freevar) else FreeVar(freevar)
+                bytecode.append(Instr("LOAD_CLOSURE", cell, lineno=line_number))
+            bytecode.append(Instr("BUILD_TUPLE", len(code.co_freevars), lineno=line_number))
+            function_flag = 8
+        bytecode.append(Instr("LOAD_CONST", code, lineno=line_number))
+        bytecode.extend(self.backend.make_function(function_flag, name, line_number))
+        if memoized:
+            bytecode.extend(self.backend.call(1, line_number))
+
+    def to_bytecode(
+        self,
+        term,
+        bytecode: Bytecode,
+        symbol_table: SymbolTable,
+        tail_call: Optional[TailCallTarget] = None,
+    ) -> Bytecode:
+        """Compile ``term`` into ``bytecode`` without recursing per AST level.
+
+        Terms waiting to be compiled and the steps that emit the instructions
+        following their children share one LIFO stack. A term emits what
+        comes before its children, then pushes its closing step and its
+        children in reverse, so instructions are appended to the code
+        object's single buffer in program order and never copied.
+        """
+        pending: list = [CompileTask(term, bytecode, symbol_table, tail_call)]
+        while pending:
+            task = pending.pop()
+            if isinstance(task, CompileTask):
+                self._compile(task, pending)
+            elif isinstance(task, ConditionTask):
+                self._compile_condition(task, pending)
+            else:
+                task()
+        return bytecode
+
+    def _compile_condition(self, task: ConditionTask, pending: list):
+        """Compile a branch condition straight into jumps.
+
+        ``&&`` and ``||`` never build a boolean here: each operand jumps to
+        the branch it decides, and the right-hand side only runs when the
+        left-hand side did not decide already.
+        """
+        term, bytecode, symbol_table, target, jump_if = (
+            task.term,
+            task.bytecode,
+            task.symbol_table,
+            task.target,
+            task.jump_if,
+        )
+        if isinstance(term, Binary) and term.op in _SHORT_CIRCUIT_DECIDES_ON:
+            # ``a && b`` is false as soon as ``a`` is, ``a || b`` is true as
+            # soon as ``a`` is; otherwise the result is decided by ``b``.
+            decides_on = _SHORT_CIRCUIT_DECIDES_ON[term.op]
+            if decides_on == jump_if:
+                pending.append(ConditionTask(term.rhs, bytecode, symbol_table, target, jump_if))
+                pending.append(ConditionTask(term.lhs, bytecode, symbol_table, target, jump_if))
+            else:
+                # ``a`` deciding the other way falls through past ``b``.
+                skip_label = Label()
+                pending.append(partial(bytecode.append, skip_label))
+                pending.append(ConditionTask(term.rhs, bytecode, symbol_table, target, jump_if))
+                pending.append(
+                    ConditionTask(term.lhs, bytecode, symbol_table, skip_label, decides_on)
                 )
-            elif symbol.load_type == "FAST":
-                bytecode.extend(self.to_bytecode(term.value, Bytecode(), symbol_table))
-                bytecode.append(
-                    Instr("STORE_FAST", variable_name, lineno=term.location.line_number)
+            return
+
+        jump = self.backend.pop_jump_if(jump_if, target, self._lines[term.location])
+        pending.append(partial(bytecode.append, jump))
+        pending.append(CompileTask(term, bytecode, symbol_table))
+
+    def _compile(self, task: "CompileTask", pending: list):
+        term, bytecode, symbol_table, tail_call = (
+            task.term,
+            task.bytecode,
+            task.symbol_table,
+            task.tail_call,
+        )
+
+        if isinstance(term, File):
+            self._locations = term.locations
+            self._lines = term.locations.lines
+            generic_adds = self.add_stats["generic"]
+            print_count = self.print_count
+            division_stats = self.division_stats.copy()
+
+            # Programs resolved with an entry function run inside it; the
+            # module code only creates and calls it.
+            entry_symbol_table = symbol_table.entry_context()
+            if self.deep_recursion is not None and entry_symbol_table is None:
+                raise ValueError("deep recursion needs a symbol table with an entry function")
+            body_bytecode, body_symbol_table = bytecode, symbol_table
+            if entry_symbol_table is not None:
+                body_bytecode, body_symbol_table = Bytecode(), entry_symbol_table
+                body_bytecode.cellvars = entry_symbol_table.cellvars
+                body_bytecode.name = body_bytecode.qualname = SymbolTable.entry_context_name
+                body_bytecode.filename = self._locations.filename(term.location)
+                body_bytecode.first_lineno = self._lines[term.location]
+            if self.function_cache is not None:
+                self._function_keys = function_keys(
+                    term, body_symbol_table, self, self.function_cache
                 )
-            elif symbol.load_type == "GLOBAL":
-                bytecode.extend(self.to_bytecode(term.value, Bytecode(), symbol_table))
-                bytecode.append(
-                    Instr(
-                        "STORE_GLOBAL", variable_name, lineno=term.location.line_number
-                    )
+
+            def finish_module():
+                backend = self.backend
+                line_number = self._lines[term.location]
+                if entry_symbol_table is not None:
+                    entry_code = self._assemble(body_bytecode)
+                    if self.deep_recursion is None:
+                        bytecode.extend(
+                            [
+                                *backend.push_null(line_number),
+                                Instr("LOAD_CONST", entry_code, lineno=line_number),
+                                *backend.make_function(0, SymbolTable.entry_context_name, line_number),
+                                *backend.call(0, line_number),
+                            ]
+                        )
+                    else:
+                        bytecode.extend(self._run_deep(entry_code, line_number))
+                prints = self.print_count > print_count
+                if prints:
+                    bytecode.extend(self._flush_output(line_number))
+                bytecode.extend(
+                    [Instr("POP_TOP"), Instr("LOAD_CONST", None), Instr("RETURN_VALUE")]
                 )
+                if self.add_stats["generic"] > generic_adds:
+                    bytecode[0:0] = self._add_helper_prologue(line_number)
+                for op in DIVISION_HELPER_NAMES:
+                    if self.division_stats[op.value] > division_stats[op.value]:
+                        bytecode[0:0] = self._division_helper_prologue(op, line_number)
+                if prints:
+                    bytecode[0:0] = self._print_helper_prologue(line_number)
+                bytecode.name = bytecode.qualname = "<rinha:module>"
+                bytecode.filename = self._locations.filename(term.location)
+                bytecode.first_lineno = line_number
+                bytecode[0:0] = backend.prologue(bytecode)
 
-            return self.to_bytecode(term.next_term, bytecode, symbol_table)
+            pending.append(finish_module)
+            pending.append(CompileTask(term.expression, body_bytecode, body_symbol_table))
+
+        elif isinstance(term, Let) and not isinstance(term.value, Function):
+            pending.append(CompileTask(term.next_term, bytecode, symbol_table, tail_call))
+            pending.append(
+                partial(
+                    bytecode.append,
+                    self._store(
+                        symbol_table.variable(term), symbol_table, self._lines[term.location]
+                    ),
+                )
+            )
+            pending.append(CompileTask(term.value, bytecode, symbol_table))
 
         elif isinstance(term, Let) and isinstance(term.value, Function):
             function_name = term.name.text
-            function_symbol_table = symbol_table.get_context(function_name)
-            function_terms = term.value.value
-            function_bytecode = Bytecode()
-            function_bytecode.argcount = len(term.value.parameters)
-            function_bytecode.argnames = [param.text for param in term.value.parameters]
-            compiled_function_bytecode = self.to_bytecode(
-                function_terms, Bytecode(), function_symbol_table
+            pending.append(CompileTask(term.next_term, bytecode, symbol_table, tail_call))
+            pending.append(
+                partial(
+                    bytecode.append,
+                    self._store(
+                        symbol_table.variable(term), symbol_table, self._lines[term.value.location]
+                    ),
+                )
+            )
+            self._compile_function(
+                term.value, function_name, term.location, bytecode, symbol_table, pending
             )
-            function_bytecode.cellvars = compiled_function_bytecode.cellvars
-            function_bytecode.freevars = compiled_function_bytecode.freevars
-            function_bytecode.extend(compiled_function_bytecode)
-            function_bytecode.append(Instr("RETURN_VALUE"))
 
-            function_bytecode.name = function_name
-            function_bytecode.filename = term.location.filename
-            function_bytecode.first_lineno = term.location.start + 1
+        elif isinstance(term, Function):
+            self._compile_function(
+                term,
+                SymbolTable.anonymous_context_name,
+                term.location,
+                bytecode,
+                symbol_table,
+                pending,
+            )
 
+        elif isinstance(term, Var):
             bytecode.append(
-                Instr(
-                    "LOAD_CONST",
-                    function_bytecode.to_code(),
-                    lineno=term.value.location.line_number,
+                self._load(
+                    symbol_table.variable(term), symbol_table, bytecode, self._lines[term.location]
                 )
             )
-            bytecode.append(
-                Instr(
-                    "LOAD_CONST", function_name, lineno=term.value.location.line_number
+
+        elif isinstance(term, Call) and self._is_tail_call(term, tail_call, symbol_table):
+            def finish_tail_call():
+                line_number = self._lines[term.location]
+                last_argument = term.arguments[-1] if term.arguments else None
+                str_add = (
+                    isinstance(last_argument, Binary)
+                    and last_argument.op == BinaryOp.Add
+                    and self._add_kind(last_argument) == "str"
                 )
-            )
-            function_flag = 0
-            if function_bytecode.freevars:
-                for freevar in function_bytecode.freevars:
-                    bytecode.cellvars.append(
-                        freevar
-                    ) if freevar not in bytecode.cellvars else None
-                    bytecode.append(Instr("LOAD_CLOSURE", CellVar(freevar), lineno=term.value.location.line_number))
-                bytecode.append(Instr("BUILD_TUPLE", len(function_bytecode.freevars), lineno=term.value.location.line_number))
-                function_flag = 8
-            bytecode.append(Instr("MAKE_FUNCTION", function_flag, lineno=term.value.location.line_number))
-            symbol = symbol_table.lookup(function_name)
-
-            if symbol.load_type == "NAME":
-                bytecode.append(Instr("STORE_NAME", function_name, lineno=term.value.location.line_number))
-            elif symbol.load_type == "DEREF":
-                bytecode.cellvars.append(
-                    function_name
-                ) if function_name not in bytecode.cellvars else None
-                bytecode.append(Instr("STORE_DEREF", CellVar(function_name), lineno=term.value.location.line_number))
-            elif symbol.load_type == "FAST":
-                bytecode.append(Instr("STORE_FAST", function_name, lineno=term.value.location.line_number))
-            elif symbol.load_type == "GLOBAL":
-                bytecode.append(Instr("STORE_GLOBAL", function_name, lineno=term.value.location.line_number))
-
-            return self.to_bytecode(term.next_term, bytecode, symbol_table)
+                bytecode.extend(
+                    self.backend.store_arguments(tail_call.parameters, line_number, str_add)
+                )
+                bytecode.append(self.backend.jump(tail_call.entry, line_number, backward=True))
 
-        elif isinstance(term, Var):
-            symbol = symbol_table.lookup(term.text)
-            if symbol.load_type == "NAME":
-                bytecode.append(Instr("LOAD_NAME", term.text, lineno=term.location.line_number))
-            elif symbol.load_type == "DEREF":
-                bytecode.freevars.append(
-                    term.text
-                ) if term.text not in bytecode.freevars else None
-                bytecode.append(Instr("LOAD_DEREF", FreeVar(term.text), lineno=term.location.line_number))
-            elif symbol.load_type == "FAST":
-                bytecode.append(Instr("LOAD_FAST", term.text, lineno=term.location.line_number))
-            elif symbol.load_type == "GLOBAL":
-                bytecode.append(Instr("LOAD_GLOBAL", term.text, lineno=term.location.line_number))
+            pending.append(finish_tail_call)
+            for arg in reversed(term.arguments):
+                pending.append(CompileTask(arg, bytecode, symbol_table))
 
         elif isinstance(term, Call):
-            callee_bytecode = self.to_bytecode(term.callee, Bytecode(), symbol_table)
-            arguments_bytecode = Bytecode()
-            for arg in term.arguments:
-                arguments_bytecode.extend(
-                    self.to_bytecode(arg, Bytecode(), symbol_table)
-                )
-            bytecode.extend(callee_bytecode)
-            bytecode.extend(arguments_bytecode)
-            bytecode.append(Instr("CALL_FUNCTION", len(term.arguments), lineno=term.location.line_number))
+            line_number = self._lines[term.location]
+            pending.append(
+                partial(bytecode.extend, self.backend.call(len(term.arguments), line_number))
+            )
+            for arg in reversed(term.arguments):
+                pending.append(CompileTask(arg, bytecode, symbol_table))
+            callee = term.callee
+            variable = symbol_table.variable(callee) if isinstance(callee, Var) else None
+            if variable is not None and symbol_table.load_type(variable) == "GLOBAL":
+                # Pushes the callee with what a call expects below it.
+                line_number = self._lines[callee.location]
+                bytecode.append(self.backend.load_global(variable, line_number, callee=True))
+            else:
+                bytecode.extend(self.backend.push_null(line_number))
+                pending.append(CompileTask(callee, bytecode, symbol_table))
 
         elif isinstance(term, Str) or isinstance(term, Int) or isinstance(term, Bool):
-            bytecode.extend([Instr("LOAD_CONST", term.value, lineno=term.location.line_number)])
+            bytecode.append(Instr("LOAD_CONST", term.value, lineno=self._lines[term.location]))
+
+        elif isinstance(term, Binary) and term.op == BinaryOp.Add:
+            self._compile_add(term, bytecode, symbol_table, pending)
+
+        elif isinstance(term, Binary) and term.op in _SHORT_CIRCUIT_DECIDES_ON:
+            end_label = Label()
+            jump = self.backend.jump_if_or_pop(
+                _SHORT_CIRCUIT_DECIDES_ON[term.op], end_label, self._lines[term.location]
+            )
+            pending.append(partial(bytecode.append, end_label))
+            pending.append(CompileTask(term.rhs, bytecode, symbol_table))
+            pending.append(partial(bytecode.extend, jump))
+            pending.append(CompileTask(term.lhs, bytecode, symbol_table))
+
+        elif isinstance(term, Binary) and term.op in DIVISION_HELPER_NAMES:
+            line_number = self._lines[term.location]
+            self.division_stats[term.op.value] += 1
+            bytecode.append(
+                self.backend.load_global(DIVISION_HELPER_NAMES[term.op], line_number, callee=True)
+            )
+            pending.append(partial(bytecode.extend, self.backend.call(2, line_number)))
+            pending.append(CompileTask(term.rhs, bytecode, symbol_table))
+            pending.append(CompileTask(term.lhs, bytecode, symbol_table))
 
         elif isinstance(term, Binary):
-            opcode = self.binary_map[term.op]
-            left_code = self.to_bytecode(term.lhs, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, left_code)
-            right_code = self.to_bytecode(term.rhs, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, right_code)
-            bytecode.extend(left_code)
-            bytecode.extend(right_code)
-            bytecode.append(opcode)
+            pending.append(partial(bytecode.append, self.backend.binary(term.op)))
+            pending.append(CompileTask(term.rhs, bytecode, symbol_table))
+            pending.append(CompileTask(term.lhs, bytecode, symbol_table))
 
         elif isinstance(term, Print):
-            bytecode.append(Instr("LOAD_GLOBAL", "print", lineno=term.location.line_number))
-            value_bytecode = self.to_bytecode(term.value, Bytecode(), symbol_table)
-            bytecode.extend(value_bytecode)
-            bytecode.append(Instr("CALL_FUNCTION", 1, lineno=term.location.line_number))
+            line_number = self._lines[term.location]
+            self.print_count += 1
+            bytecode.append(self.backend.load_global(PRINT_HELPER_NAME, line_number, callee=True))
+            pending.append(partial(bytecode.extend, self.backend.call(1, line_number)))
+            pending.append(CompileTask(term.value, bytecode, symbol_table))
 
         elif isinstance(term, If):
-            condition_bytecode = self.to_bytecode(
-                term.condition, Bytecode(), symbol_table
-            )
-            true_bytecode = self.to_bytecode(term.then, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, true_bytecode)
-            false_bytecode = self.to_bytecode(term.otherwise, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, false_bytecode)
-            bytecode.extend(condition_bytecode)
             else_label = Label()
             end_if_label = Label()
-            bytecode.append(Instr("POP_JUMP_IF_FALSE", else_label, lineno=term.location.line_number))
-            bytecode.extend(true_bytecode)
-            bytecode.append(Instr("JUMP_FORWARD", end_if_label, lineno=true_bytecode[-1].lineno))
-            bytecode.append(else_label)
-            bytecode.extend(false_bytecode)
-            bytecode.append(end_if_label)
+
+            def jump_to_end():
+                lineno = self._last_lineno(bytecode, self._lines[term.location])
+                bytecode.append(self.backend.jump(end_if_label, lineno))
+                bytecode.append(else_label)
+
+            pending.append(partial(bytecode.append, end_if_label))
+            pending.append(CompileTask(term.otherwise, bytecode, symbol_table, tail_call))
+            pending.append(jump_to_end)
+            pending.append(CompileTask(term.then, bytecode, symbol_table, tail_call))
+            pending.append(ConditionTask(term.condition, bytecode, symbol_table, else_label, False))
 
         elif isinstance(term, Tuple):
-            first_bytecode = self.to_bytecode(term.first, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, first_bytecode)
-            second_bytecode = self.to_bytecode(term.second, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, second_bytecode)
-            bytecode.extend(first_bytecode)
-            bytecode.extend(second_bytecode)
-            bytecode.append(Instr("BUILD_TUPLE", 2, lineno=term.location.line_number))
-
-        elif isinstance(term, First):
-            value_bytecode = self.to_bytecode(term.value, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, value_bytecode)
-            bytecode.extend(value_bytecode)
-            bytecode.append(Instr("LOAD_CONST", 0, lineno=term.location.line_number))
-            bytecode.append(Instr("BINARY_SUBSCR", lineno=term.location.line_number))
-
-        elif isinstance(term, Second):
-            value_bytecode = self.to_bytecode(term.value, Bytecode(), symbol_table)
-            self._extend_vars(bytecode, value_bytecode)
-            bytecode.extend(value_bytecode)
-            bytecode.append(Instr("LOAD_CONST", 1, lineno=term.location.line_number))
-            bytecode.append(Instr("BINARY_SUBSCR", lineno=term.location.line_number))
+            def finish_tuple():
+                bytecode.append(Instr("BUILD_TUPLE", 2, lineno=self._lines[term.location]))
 
-        return bytecode
+            pending.append(finish_tuple)
+            pending.append(CompileTask(term.second, bytecode, symbol_table))
+            pending.append(CompileTask(term.first, bytecode, symbol_table))
+
+        elif isinstance(term, First) or isinstance(term, Second):
+            index = 0 if isinstance(term, First) else 1
+
+            def finish_subscript():
+                bytecode.append(Instr("LOAD_CONST", index, lineno=self._lines[term.location]))
+                bytecode.append(Instr("BINARY_SUBSCR", lineno=self._lines[term.location]))
+
+            pending.append(finish_subscript)
+            pending.append(CompileTask(term.value, bytecode, symbol_table))
@@ -1,12 +1,18 @@
+import contextlib
+import dis
+import io
 import json
 import os
 from types import CodeType, FunctionType, ModuleType
 import unittest
 import sys
-from bytecode import Bytecode
+from bytecode import Bytecode, Label
 from rinhac.ast.json_parser import parse_json_to_object
 from rinhac.symbol_table import create_symbol_table
 from rinhac import Compiler
+from rinhac.backend import backend_for
+from rinhac.optimizer import find_pure_functions, infer_types
+from rinhac.runtime import close_output
 from rinhac.utils.index_line_mapper import IndexLineMapper
 
 _current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,11 +29,32 @@ TUPLES_TEST_JSON = os.path.join(
 VARIABLES_TEST_JSON = os.path.join(
     _current_dir, "test_data", "compiler", "variables_test.json"
 )
+TAIL_CALL_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "tail_call_test.json"
+)
+MEMOIZE_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "memoize_test.json"
+)
+CLOSURES_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "closures_test.json"
+)
+ENTRY_FUNCTION_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "entry_function_test.json"
+)
+SHORT_CIRCUIT_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "short_circuit_test.json"
+)
+SHADOWING_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "shadowing_test.json"
+)
+DEEP_RECURSION_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "runtime", "deep_recursion_test.json"
+)
 
 
 class TestCompiler(unittest.TestCase):    
-    def _import_rinha_module(self, json_ast_file_path: str) -> ModuleType:
-        code = self._build(json_ast_file_path)
+    def _import_rinha_module(self, json_ast_file_path: str, **options) -> ModuleType:
+        code = self._build(json_ast_file_path, **options)
         module_name = os.path.splitext(os.path.basename(code.co_filename))[0]
         module = ModuleType(module_name)
         module.__file__ = code.co_filename
@@ -35,13 +62,16 @@ class TestCompiler(unittest.TestCase):
         exec(code, module.__dict__)
         return module
 
-    def _build(self, json_path) -> CodeType:
+    def _build(self, json_path, memoize=False, entry_function=False, **options) -> CodeType:
         with open(json_path) as f:
             json_ast = json.load(f)
         index_line_mapper = IndexLineMapper(json_path)
         ast = parse_json_to_object(json_ast, index_line_mapper)
-        symbol_table = create_symbol_table(ast)
-        compiler = Compiler()
+        symbol_table = create_symbol_table(ast, entry_function=entry_function)
+        if memoize:
+            options["memoized_functions"] = find_pure_functions(ast)
+        options.setdefault("types", infer_types(ast))
+        compiler = Compiler(**options)
         return compiler.to_bytecode(ast, Bytecode(), symbol_table).to_code()
     
 
@@ -55,6 +85,8 @@ class TestCompiler(unittest.TestCase):
         operators_test = self._import_rinha_module(OPERATORS_TEST_JSON)
 
         self.assertEqual(operators_test.add_fn(10, 20), 30)
+        self.assertEqual(operators_test.add_fn("a", 1), "a1")
+        self.assertEqual(operators_test.add_fn(1, "a"), "1a")
         self.assertEqual(operators_test.sub_fn(10, 20), -10)
         self.assertEqual(operators_test.mul_fn(10, 20), 200)
         self.assertEqual(operators_test.div_fn(5, 2), 2)
@@ -79,5 +111,193 @@ class TestCompiler(unittest.TestCase):
 
         self.assertEqual(variables_test.module_var, "module_var")
         self.assertEqual(variables_test.module_fn("local_var"), "local_varmodule_var")
-        # self.assertEqual(variables_test.inner_outer_fn(), "fn_var_outerfn_var_inner")
+        self.assertEqual(variables_test.inner_outer_fn(), "fn_var_outerfn_var_inner")
         self.assertEqual(variables_test.shadowing_fn(), "outerinner")
+
+    def test_closures(self):
+        closures_test = self._import_rinha_module(CLOSURES_TEST_JSON)
+
+        self.assertEqual(closures_test.captured_in_if(10), "below")
+        self.assertEqual(closures_test.captured_in_if(1), "above")
+        self.assertEqual(closures_test.captured_in_tuple(1), (1, 2))
+        self.assertEqual(closures_test.captured_in_let_value(21), 42)
+        self.assertEqual(closures_test.pass_through("a"), "a")
+        self.assertEqual(closures_test.nested_recursion(10), 5)
+        self.assertEqual(closures_test.make_adder(1)(2), 3)
+        self.assertEqual(closures_test.make_adder(1).__name__, "<rinha:fn>")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            # ``print`` returns its argument; the line stays buffered until
+            # the output is flushed.
+            self.assertEqual(closures_test.captured_in_print("hey"), "hey")
+            self.assertEqual(output.getvalue(), "")
+            close_output(closures_test.__dict__)
+        self.assertEqual(output.getvalue(), "hey\n")
+
+        pass_through_b = next(
+            const
+            for const in closures_test.pass_through.__code__.co_consts
+            if isinstance(const, CodeType)
+        )
+        self.assertEqual(pass_through_b.co_freevars, ("a",))
+        self.assertEqual(closures_test.pass_through.__code__.co_cellvars, ("a",))
+
+    def _exec_output(self, code: CodeType) -> tuple[str, dict]:
+        namespace = {"__name__": "__main__"}
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exec(code, namespace)
+        return output.getvalue(), namespace
+
+    def test_entry_function(self):
+        module_output, _ = self._exec_output(self._build(ENTRY_FUNCTION_TEST_JSON))
+        for memoize in (False, True):
+            code = self._build(ENTRY_FUNCTION_TEST_JSON, memoize=memoize, entry_function=True)
+            output, namespace = self._exec_output(code)
+
+            self.assertEqual(output, "5000050620\n13\n")
+            self.assertEqual(output, module_output)
+            self.assertNotIn("fib", namespace)
+            self.assertNotIn("offset", namespace)
+
+        module_code = self._build(ENTRY_FUNCTION_TEST_JSON, entry_function=True)
+        entry_code = next(
+            const
+            for const in module_code.co_consts
+            if isinstance(const, CodeType) and const.co_name == "<rinha:main>"
+        )
+        self.assertEqual(set(entry_code.co_cellvars), {"fib", "sum", "offset"})
+        self.assertIn("total", entry_code.co_varnames)
+        codes = {
+            const.co_name: const for const in entry_code.co_consts if isinstance(const, CodeType)
+        }
+        fib_opnames = {(instr.opname, instr.argval) for instr in dis.get_instructions(codes["fib"])}
+        self.assertIn(("LOAD_DEREF", "fib"), fib_opnames)
+        self.assertNotIn(("LOAD_GLOBAL", "fib"), fib_opnames)
+        sum_opnames = [instr.opname for instr in dis.get_instructions(codes["sum"])]
+        self.assertIn(backend_for().jump(Label(), None, backward=True).name, sum_opnames)
+
+    def test_shadowing(self):
+        # Closures created before a shadowing ``let`` keep the earlier value.
+        for entry_function in (False, True):
+            with self.subTest(entry_function=entry_function):
+                code = self._build(SHADOWING_TEST_JSON, entry_function=entry_function)
+                output, _ = self._exec_output(code)
+
+                self.assertEqual(output, "1\n2\n2\n30\n2a\n")
+
+    def test_deep_recursion(self):
+        code = self._build(DEEP_RECURSION_TEST_JSON, entry_function=True)
+        with self.assertRaises(RecursionError):
+            self._exec_output(code)
+
+        recursion_limit = sys.getrecursionlimit()
+        for memoize in (False, True):
+            code = self._build(
+                DEEP_RECURSION_TEST_JSON,
+                memoize=memoize,
+                entry_function=True,
+                deep_recursion=(0, 0),
+            )
+            output, _ = self._exec_output(code)
+
+            self.assertEqual(output, "100000\n100000\n")
+            self.assertEqual(sys.getrecursionlimit(), recursion_limit)
+
+        # Too small a limit still raises, in the thread that ran the module.
+        code = self._build(
+            DEEP_RECURSION_TEST_JSON, entry_function=True, deep_recursion=(64 << 20, 50000)
+        )
+        with self.assertRaises(RecursionError):
+            self._exec_output(code)
+
+        with self.assertRaises(ValueError):
+            self._build(DEEP_RECURSION_TEST_JSON, deep_recursion=(0, 0))
+
+    def test_short_circuit(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            short_circuit_test = self._import_rinha_module(SHORT_CIRCUIT_TEST_JSON)
+            self.assertIs(short_circuit_test.and_value(False), False)
+            self.assertIs(short_circuit_test.or_value(True), True)
+            self.assertEqual(short_circuit_test.in_range(5), "inside")
+            self.assertEqual(short_circuit_test.in_range(-1), "outside")
+            self.assertEqual(short_circuit_test.in_range(10), "outside")
+            self.assertEqual(short_circuit_test.check(True, True), "taken")
+            self.assertEqual(short_circuit_test.check(False, False), "skipped")
+            self.assertEqual(short_circuit_test.nested(False, False, False), 0)
+            self.assertEqual(short_circuit_test.nested(True, False, True), 1)
+        # Only the start message: every ``print`` above sits on a skipped side.
+        self.assertEqual(output.getvalue(), "short_circuit_test.rinha\n")
+        self.assertIs(short_circuit_test.skipped_and, False)
+        self.assertIs(short_circuit_test.skipped_or, True)
+
+        # ``print`` returns its argument, here a non-empty string.
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(short_circuit_test.check(False, True), "taken")
+            self.assertEqual(short_circuit_test.nested(True, False, False), 1)
+            self.assertEqual(short_circuit_test.and_value(True), "and_value")
+            close_output(short_circuit_test.__dict__)
+        self.assertEqual(
+            output.getvalue(), "short_circuit_test.rinha\ncheck\nnested\nand_value\n"
+        )
+
+        def opnames(function):
+            return [instr.opname for instr in dis.get_instructions(function)]
+
+        backend = backend_for()
+        value_jumps = {
+            jump_if: backend.jump_if_or_pop(jump_if, Label(), None)[0].name
+            for jump_if in (False, True)
+        }
+        self.assertIn(value_jumps[False], opnames(short_circuit_test.and_value))
+        self.assertIn(value_jumps[True], opnames(short_circuit_test.or_value))
+        for function in (short_circuit_test.in_range, short_circuit_test.check, short_circuit_test.nested):
+            names = opnames(function)
+            self.assertNotIn("BINARY_AND", names)
+            self.assertNotIn("BINARY_OR", names)
+            self.assertNotIn(value_jumps[False], names)
+            self.assertNotIn(value_jumps[True], names)
+
+    def test_tail_calls(self):
+        tail_call_test = self._import_rinha_module(TAIL_CALL_TEST_JSON)
+
+        self.assertEqual(tail_call_test.sum(100000, 0), 5000050000)
+        self.assertEqual(tail_call_test.count_down(100000), "done")
+        self.assertEqual(tail_call_test.fib(10), 55)
+        sum_instructions = list(dis.get_instructions(tail_call_test.sum))
+        self.assertNotIn("sum", [instr.argval for instr in sum_instructions])
+        backward_jump = backend_for().jump(Label(), None, backward=True)
+        self.assertIn(backward_jump.name, [instr.opname for instr in sum_instructions])
+
+    def test_tail_calls_disabled(self):
+        tail_call_test = self._import_rinha_module(TAIL_CALL_TEST_JSON, tail_calls=False)
+
+        self.assertEqual(tail_call_test.sum(100, 0), 5050)
+        with self.assertRaises(RecursionError):
+            tail_call_test.sum(100000, 0)
+
+    def test_memoize(self):
+        memoize_test = self._import_rinha_module(MEMOIZE_TEST_JSON, memoize=True)
+
+        self.assertEqual(memoize_test.fib(80), 23416728348467685)
+        self.assertEqual(memoize_test.combination(40, 20), 137846528820)
+        self.assertGreater(memoize_test.fib.cache_info().hits, 0)
+        for impure_fn in (memoize_test.log, memoize_test.log_fib, memoize_test.apply):
+            self.assertFalse(hasattr(impure_fn, "cache_info"))
+
+        add_twice = memoize_test.make_adder(1)
+        self.assertEqual(add_twice(2), 4)
+        self.assertEqual(add_twice(2), 4)
+        self.assertEqual(add_twice.cache_info().hits, 1)
+        add = add_twice.__wrapped__.__closure__[0].cell_contents
+        self.assertEqual(add.cache_info().currsize, 2)
+
+    def test_memoize_cache_size(self):
+        memoize_test = self._import_rinha_module(
+            MEMOIZE_TEST_JSON, memoize=True, memoize_cache_size=2
+        )
+
+        self.assertEqual(memoize_test.fib(20), 6765)
+        self.assertEqual(memoize_test.fib.cache_info().maxsize, 2)
+        self.assertEqual(memoize_test.fib.cache_info().currsize, 2)
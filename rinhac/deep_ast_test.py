@@ -0,0 +1,66 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from types import ModuleType
+from bytecode import Bytecode
+from benchmarks import let_chain_json, nested_binary_json
+from rinhac import Compiler
+from rinhac.ast.json_parser import load_ast
+from rinhac.optimizer import find_pure_functions, fold_constants, infer_types
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.print_ast import print_tree
+
+DEPTH = 100_000
+
+
+class TestDeepAst(unittest.TestCase):
+    def _compile(self, json_text: str):
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "deep.json")
+            with open(json_path, "w") as f:
+                f.write(json_text)
+            with open(json_path, "rb") as f:
+                ast = load_ast(f, json_path)
+
+        fold_constants(ast)
+        find_pure_functions(ast)
+        types = infer_types(ast)
+        symbol_table = create_symbol_table(ast)
+        return ast, Compiler(types=types).to_bytecode(ast, Bytecode(), symbol_table)
+
+    def _run(self, bytecode: Bytecode) -> ModuleType:
+        module = ModuleType("deep")
+        exec(bytecode.to_code(), module.__dict__)
+        return module
+
+    def test_deep_let_chain(self):
+        ast, bytecode = self._compile(let_chain_json(DEPTH))
+
+        store_names = [instr for instr in bytecode if instr.name == "STORE_NAME"]
+        self.assertEqual(len(store_names), DEPTH)
+        self.assertEqual(store_names[-1].arg, f"v{DEPTH - 1}")
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_tree(ast)
+        self.assertEqual(output.getvalue().count("\n"), 4 * DEPTH)
+
+    def test_run_deep_let_chain(self):
+        # Assembling with the bytecode library is quadratic in the number of
+        # distinct names, so execution is checked on a smaller chain that
+        # still nests far past the interpreter recursion limit.
+        depth = 2_000
+        _, bytecode = self._compile(let_chain_json(depth))
+        self.assertEqual(self._run(bytecode).__dict__[f"v{depth - 1}"], depth - 1)
+
+    def test_run_deep_binary(self):
+        _, bytecode = self._compile(nested_binary_json(DEPTH))
+        self.assertEqual(self._run(bytecode).result, DEPTH + 1)
+
+    def test_json_is_valid(self):
+        self.assertEqual(json.loads(let_chain_json(3))["expression"]["kind"], "Let")
+        self.assertEqual(json.loads(nested_binary_json(3))["expression"]["kind"], "Let")
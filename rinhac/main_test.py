@@ -0,0 +1,198 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import rinhac.__main__ as rinhac_main
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+IF_ELSE_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "if_else_test.json"
+)
+DEEP_RECURSION_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "runtime", "deep_recursion_test.json"
+)
+SHADOWED_BUILTINS_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "runtime", "shadowed_builtins_test.json"
+)
+
+
+class TestRun(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        environ = mock.patch.dict(os.environ, {"RINHAC_CACHE_DIR": self.directory})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _run(self, *args, **options) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            rinhac_main.run(*args, **options)
+        return output.getvalue()
+
+    def test_run_matches_pyc(self):
+        built_pyc = os.path.join(self.directory, "built.pyc")
+        run_pyc = os.path.join(self.directory, "run.pyc")
+        rinhac_main.build(IF_ELSE_TEST_JSON, built_pyc, cache=False)
+        expected = subprocess.run(
+            [sys.executable, built_pyc], capture_output=True, text=True, check=True
+        ).stdout
+
+        self.assertEqual(self._run(IF_ELSE_TEST_JSON, run_pyc), expected)
+        with open(built_pyc, "rb") as built, open(run_pyc, "rb") as written:
+            self.assertEqual(built.read(), written.read())
+
+        # The second run loads the code object from the compile cache.
+        with mock.patch.object(rinhac_main, "_get_ast", side_effect=AssertionError):
+            self.assertEqual(self._run(IF_ELSE_TEST_JSON, run_pyc), expected)
+
+    def test_run_in_fresh_main_module(self):
+        main_module = sys.modules["__main__"]
+        self._run(IF_ELSE_TEST_JSON, write_pyc=False, cache=False)
+
+        self.assertIs(sys.modules["__main__"], main_module)
+        self.assertFalse(hasattr(main_module, "if_else_fn"))
+
+    def test_entry_function(self):
+        output = self._run(IF_ELSE_TEST_JSON, write_pyc=False, entry_function=True)
+
+        self.assertEqual(output, "if_else_fn.rinha\n")
+
+    def test_shadowed_builtins(self):
+        # The runtime helpers bind the builtins they use before the program
+        # binds the same names.
+        for codegen in ("bytecode", "source"):
+            for deep_recursion in (None, (0, 0)):
+                with self.subTest(codegen=codegen, deep_recursion=deep_recursion):
+                    output = self._run(
+                        SHADOWED_BUILTINS_TEST_JSON,
+                        write_pyc=False,
+                        cache=False,
+                        codegen=codegen,
+                        deep_recursion=deep_recursion,
+                    )
+
+                    self.assertEqual(output, "1\n(1, 2)\n((1, true), x)\n3\nx1\n")
+
+    def test_deep_recursion(self):
+        output = self._run(DEEP_RECURSION_TEST_JSON, write_pyc=False, deep_recursion=(0, 0))
+
+        self.assertEqual(output, "100000\n100000\n")
+
+    def test_deep_recursion_pyc(self):
+        pyc = os.path.join(self.directory, "deep.pyc")
+        rinhac_main.main(
+            ["-o", pyc, DEEP_RECURSION_TEST_JSON, "--stack-size", "256"]
+            + ["--recursion-limit", "200000"]
+        )
+        result = subprocess.run([sys.executable, pyc], capture_output=True, text=True, check=True)
+
+        self.assertEqual(result.stdout, "100000\n100000\n")
+
+    def test_source_codegen(self):
+        output = self._run(IF_ELSE_TEST_JSON, write_pyc=False, codegen="source")
+
+        self.assertEqual(output, "if_else_fn.rinha\n")
+
+    def test_cli(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            rinhac_main.main(["run", IF_ELSE_TEST_JSON, "--no-pyc"])
+        self.assertEqual(output.getvalue(), "if_else_fn.rinha\n")
+
+
+class TestBuildProfile(unittest.TestCase):
+    def _build(self, *args, **options) -> dict:
+        report = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stderr(report):
+            output = os.path.join(directory, "out.pyc")
+            rinhac_main.build(IF_ELSE_TEST_JSON, output, *args, **options)
+        return report.getvalue()
+
+    def test_timings(self):
+        report = json.loads(
+            self._build(cache=False, timings=True, memory=True, report_format="json")
+        )
+
+        self.assertEqual(
+            [record["phase"] for record in report["phases"]],
+            [
+                "read",
+                "ast decode",
+                "constant folding",
+                "symbol table",
+                "type inference",
+                "codegen",
+                "peephole",
+                "assembly",
+                "pyc serialization",
+                "write",
+            ],
+        )
+        for record in report["phases"]:
+            self.assertGreaterEqual(record["wall_ms"], 0)
+            self.assertIn("peak_kib", record)
+        self.assertEqual(report["counts"]["ast nodes"], 13)
+        # The module, its function and the output helpers it prints with.
+        self.assertEqual(report["counts"]["code objects"], 5)
+
+    def test_specialization_stats(self):
+        report = self._build(cache=False, show_stats=True)
+
+        self.assertIn("type specialization: ", report)
+
+    def test_no_report_by_default(self):
+        self.assertEqual(self._build(cache=False), "")
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        environ = mock.patch.dict(os.environ, {"RINHAC_CACHE_DIR": self.directory})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_rebuilds_on_change(self):
+        ast_file = os.path.join(self.directory, "program.json")
+        output = os.path.join(self.directory, "program.pyc")
+        with open(IF_ELSE_TEST_JSON) as f:
+            ast_data = f.read()
+        edits = [ast_data + " ", "{", ast_data]
+
+        def edit(interval):
+            if not edits:
+                raise KeyboardInterrupt
+            with open(ast_file, "w") as f:
+                f.write(edits.pop(0))
+            # Later writes may land in the same mtime tick.
+            os.utime(ast_file, ns=(len(edits), len(edits)))
+
+        edit(0)
+        report = io.StringIO()
+        with contextlib.redirect_stderr(report), contextlib.redirect_stdout(io.StringIO()):
+            rinhac_main.watch(
+                ast_file,
+                lambda: rinhac_main.build(ast_file, output, show_stats=True),
+                sleep=edit,
+            )
+        report = report.getvalue()
+
+        self.assertEqual(report.count(f"built {ast_file}"), 2)
+        self.assertIn("failed; waiting for changes", report)
+        # The last version only differs from the first in whitespace: the
+        # compile cache misses, but the function comes from the function cache.
+        self.assertIn("function cache: 1 functions (hit 0, miss 1)", report)
+        self.assertIn("function cache: 1 functions (hit 1, miss 0)", report)
+        self.assertTrue(os.path.exists(output))
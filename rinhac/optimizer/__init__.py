@@ -0,0 +1,14 @@
+from .constant_folding import ConstantFolder, fold_constants
+from .peephole import PeepholeOptimizer, optimize_bytecode
+from .purity import find_pure_functions
+from .type_inference import TypeInference, infer_types
+
+__all__ = [
+    "ConstantFolder",
+    "fold_constants",
+    "find_pure_functions",
+    "PeepholeOptimizer",
+    "optimize_bytecode",
+    "TypeInference",
+    "infer_types",
+]
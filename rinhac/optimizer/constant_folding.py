@@ -0,0 +1,181 @@
+from collections import Counter
+from functools import partial
+from rinhac.ast import (
+    BinaryOp,
+    Var,
+    Function,
+    Call,
+    Let,
+    Str,
+    Int,
+    Binary,
+    Bool,
+    If,
+    Tuple,
+    First,
+    Second,
+    Print,
+    File,
+)
+from rinhac.runtime import rinha_div, rinha_rem
+
+
+_int_operations = {
+    BinaryOp.Add: lambda lhs, rhs: lhs + rhs,
+    BinaryOp.Sub: lambda lhs, rhs: lhs - rhs,
+    BinaryOp.Mul: lambda lhs, rhs: lhs * rhs,
+    BinaryOp.Div: rinha_div,
+    BinaryOp.Rem: rinha_rem,
+    BinaryOp.Lt: lambda lhs, rhs: lhs < rhs,
+    BinaryOp.Gt: lambda lhs, rhs: lhs > rhs,
+    BinaryOp.Lte: lambda lhs, rhs: lhs <= rhs,
+    BinaryOp.Gte: lambda lhs, rhs: lhs >= rhs,
+}
+
+_bool_operations = {
+    BinaryOp.And: lambda lhs, rhs: lhs and rhs,
+    BinaryOp.Or: lambda lhs, rhs: lhs or rhs,
+}
+
+_literal_types = (Int, Str, Bool)
+
+
+_VISIT, _REWRITE, _CHOOSE_BRANCH = range(3)
+
+
+def _is_side_effect_free(term) -> bool:
+    pending = [term]
+    while pending:
+        term = pending.pop()
+        if isinstance(term, Tuple):
+            pending.extend((term.first, term.second))
+        elif not isinstance(term, (Int, Str, Bool, Var, Function)):
+            return False
+    return True
+
+
+def _child_slots(term) -> list:
+    """Children of ``term`` paired with a setter that replaces them."""
+    if isinstance(term, File):
+        return [(term.expression, partial(setattr, term, "expression"))]
+    if isinstance(term, Let):
+        return [
+            (term.value, partial(setattr, term, "value")),
+            (term.next_term, partial(setattr, term, "next_term")),
+        ]
+    if isinstance(term, Call):
+        return [(term.callee, partial(setattr, term, "callee"))] + [
+            (arg, partial(term.arguments.__setitem__, index))
+            for index, arg in enumerate(term.arguments)
+        ]
+    if isinstance(term, Binary):
+        return [
+            (term.lhs, partial(setattr, term, "lhs")),
+            (term.rhs, partial(setattr, term, "rhs")),
+        ]
+    if isinstance(term, Tuple):
+        return [
+            (term.first, partial(setattr, term, "first")),
+            (term.second, partial(setattr, term, "second")),
+        ]
+    if isinstance(term, (Function, First, Second, Print)):
+        return [(term.value, partial(setattr, term, "value"))]
+    return []
+
+
+class ConstantFolder:
+    """Folds literal expressions and drops unreachable branches.
+
+    Arithmetic is that of the compiled code, so folding never changes what a
+    program prints: division and remainder truncate toward zero, with the
+    runtime helpers the compiled code calls, and ``+`` concatenates when either side is a string. Division by zero is
+    left for the runtime to report.
+    """
+
+    def __init__(self):
+        self.stats: Counter = Counter()
+
+    @property
+    def folded_count(self) -> int:
+        return sum(self.stats.values())
+
+    def _fold_binary(self, term: Binary):
+        lhs, rhs, op = term.lhs, term.rhs, term.op
+        if not isinstance(lhs, _literal_types) or not isinstance(rhs, _literal_types):
+            return term
+
+        value = None
+        if isinstance(lhs, Int) and isinstance(rhs, Int) and op in _int_operations:
+            if op in (BinaryOp.Div, BinaryOp.Rem) and rhs.value == 0:
+                return term
+            value = _int_operations[op](lhs.value, rhs.value)
+        elif op == BinaryOp.Add and isinstance(lhs, (Str, Int)) and isinstance(rhs, (Str, Int)):
+            value = str(lhs.value) + str(rhs.value)
+        elif isinstance(lhs, Bool) and isinstance(rhs, Bool) and op in _bool_operations:
+            value = _bool_operations[op](lhs.value, rhs.value)
+        elif type(lhs) is type(rhs) and op in (BinaryOp.Eq, BinaryOp.Neq):
+            value = (lhs.value == rhs.value) == (op == BinaryOp.Eq)
+
+        if value is None:
+            return term
+        self.stats["binary"] += 1
+        if isinstance(value, bool):
+            return Bool(value=value, location=term.location)
+        if isinstance(value, int):
+            return Int(value=value, location=term.location)
+        return Str(value=value, location=term.location)
+
+    def _rewrite(self, term):
+        if isinstance(term, Binary):
+            return self._fold_binary(term)
+        if isinstance(term, First) and isinstance(term.value, Tuple):
+            if _is_side_effect_free(term.value.second):
+                self.stats["first"] += 1
+                return term.value.first
+        if isinstance(term, Second) and isinstance(term.value, Tuple):
+            if _is_side_effect_free(term.value.first):
+                self.stats["second"] += 1
+                return term.value.second
+        return term
+
+    def fold(self, term):
+        """Fold ``term`` bottom-up with an explicit stack and return the result.
+
+        Every pending term carries the setter that stores its folded version
+        back into the parent, so deep Let chains never recurse.
+        """
+        result = [term]
+        pending = [(_VISIT, term, partial(result.__setitem__, 0))]
+        while pending:
+            step, term, store = pending.pop()
+
+            if step == _REWRITE:
+                store(self._rewrite(term))
+
+            elif step == _CHOOSE_BRANCH:
+                if isinstance(term.condition, Bool):
+                    self.stats["if"] += 1
+                    branch = term.then if term.condition.value else term.otherwise
+                    pending.append((_VISIT, branch, store))
+                else:
+                    pending.append((_VISIT, term.otherwise, partial(setattr, term, "otherwise")))
+                    pending.append((_VISIT, term.then, partial(setattr, term, "then")))
+
+            elif isinstance(term, If):
+                pending.append((_CHOOSE_BRANCH, term, store))
+                pending.append((_VISIT, term.condition, partial(setattr, term, "condition")))
+
+            else:
+                pending.append((_REWRITE, term, store))
+                pending.extend(
+                    (_VISIT, child, child_store)
+                    for child, child_store in reversed(_child_slots(term))
+                )
+        return result[0]
+
+
+def fold_constants(ast: File) -> ConstantFolder:
+    """Fold ``ast`` in place and return the folder with its statistics."""
+    folder = ConstantFolder()
+    folder.fold(ast)
+    return folder
@@ -0,0 +1,111 @@
+import contextlib
+import dis
+import glob
+import io
+import json
+import os
+import unittest
+from types import ModuleType
+from bytecode import Bytecode, Label
+from rinhac import Compiler
+from rinhac.ast import BinaryOp, Bool, If, Int, Let, Second, Str
+from rinhac.backend import backend_for
+from rinhac.ast.json_parser import parse_json_to_object
+from rinhac.optimizer import fold_constants
+from rinhac.runtime import close_output
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+TEST_DATA = os.path.join(_current_dir, "..", "test_data")
+CONSTANT_FOLDING_TEST_JSON = os.path.join(TEST_DATA, "optimizer", "constant_folding_test.json")
+
+
+class TestConstantFolding(unittest.TestCase):
+    def _parse(self):
+        with open(CONSTANT_FOLDING_TEST_JSON) as f:
+            json_ast = json.load(f)
+        index_line_mapper = IndexLineMapper(CONSTANT_FOLDING_TEST_JSON)
+        return parse_json_to_object(json_ast, index_line_mapper)
+
+    def _output(self, json_path: str, fold: bool) -> str:
+        with open(json_path) as f:
+            ast = parse_json_to_object(json.load(f), IndexLineMapper(json_path))
+        if fold:
+            fold_constants(ast)
+        code = Compiler().to_bytecode(ast, Bytecode(), create_symbol_table(ast)).to_code()
+        namespace = {"__name__": "__main__"}
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                exec(code, namespace)
+            finally:
+                close_output(namespace)
+        return output.getvalue()
+
+    def _bindings(self, ast) -> dict:
+        bindings = {}
+        term = ast.expression
+        while isinstance(term, Let):
+            bindings[term.name.text] = term.value
+            term = term.next_term
+        return bindings
+
+    def test_fold_constants(self):
+        ast = self._parse()
+        folder = fold_constants(ast)
+        bindings = self._bindings(ast)
+
+        self.assertEqual(bindings["square"], Int(100, bindings["square"].location))
+        self.assertEqual(bindings["quotient"].value, -3)
+        self.assertEqual(bindings["remainder"].value, -1)
+        self.assertIsInstance(bindings["greeting"], Str)
+        self.assertEqual(bindings["greeting"].value, "n = 402")
+        self.assertIsInstance(bindings["flag"], Bool)
+        self.assertEqual(bindings["flag"].value, True)
+        self.assertNotIsInstance(bindings["branch"].value, If)
+        self.assertEqual(bindings["pick"].value, 2)
+        self.assertIsInstance(bindings["keep"], Second)
+        self.assertNotIsInstance(bindings["by_zero"].value, Int)
+
+        self.assertEqual(folder.stats, {"binary": 11, "if": 1, "first": 1})
+        self.assertEqual(folder.folded_count, 13)
+
+    def test_folded_module(self):
+        ast = self._parse()
+        fold_constants(ast)
+        symbol_table = create_symbol_table(ast)
+        compiler = Compiler()
+        code = compiler.to_bytecode(ast, Bytecode(), symbol_table).to_code()
+        module = ModuleType("constant_folding_test")
+        exec(code, module.__dict__)
+
+        self.assertEqual(module.square, 100)
+        self.assertEqual(module.branch(1), 2)
+        self.assertEqual(module.keep, 4)
+        backend = backend_for()
+        instructions = {(instr.opname, instr.arg) for instr in dis.get_instructions(code)}
+        folded = backend.binary(BinaryOp.Mul)
+        arg = folded.arg if folded.require_arg() else None
+        self.assertNotIn((folded.name, arg), instructions)
+        # Only the division by zero, left for the runtime, is compiled.
+        self.assertEqual(compiler.division_stats, {"Div": 1})
+        branch_opnames = {instr.opname for instr in dis.get_instructions(module.branch)}
+        self.assertNotIn(backend.pop_jump_if(False, Label(), None).name, branch_opnames)
+
+    def test_folding_keeps_output(self):
+        json_paths = glob.glob(os.path.join(TEST_DATA, "compiler", "*.json"))
+        json_paths += glob.glob(os.path.join(TEST_DATA, "optimizer", "*.json"))
+        for json_path in sorted(json_paths):
+            with self.subTest(os.path.basename(json_path)):
+                folded = self._output(json_path, fold=True)
+
+                self.assertEqual(folded, self._output(json_path, fold=False))
+
+    def test_truncating_division(self):
+        json_path = os.path.join(TEST_DATA, "optimizer", "folding_output_test.json")
+        for fold in (True, False):
+            with self.subTest(fold=fold):
+                self.assertEqual(
+                    self._output(json_path, fold), "true\n-3\n-1\n-3\n1\n3\n-1\n"
+                )
@@ -0,0 +1,287 @@
+from collections import Counter
+from types import CodeType
+from typing import Iterable, Optional
+from bytecode import Bytecode, Instr, Label
+from rinhac.backend import Backend, backend_for
+
+REWRITES = (
+    "jump_to_return",
+    "jump_threading",
+    "dead_code",
+    "store_load",
+    "tuple_access",
+    "module_epilogue",
+)
+
+_MODULE_NAME = "<rinha:module>"
+_MAX_ROUNDS = 10
+# 3.12 only emits ``LOAD_FAST`` for locals known to be bound.
+_LOAD_FAST_NAMES = ("LOAD_FAST", "LOAD_FAST_CHECK")
+
+
+def _first_instr(items: list, index: int):
+    """Index of the first instruction at or after ``index``, skipping labels."""
+    while index < len(items) and not isinstance(items[index], Instr):
+        index += 1
+    return index
+
+
+def _label_indexes(items: list) -> dict:
+    return {item: index for index, item in enumerate(items) if isinstance(item, Label)}
+
+
+def _is_jump_to_label(item) -> bool:
+    return isinstance(item, Instr) and item.has_jump() and isinstance(item.arg, Label)
+
+
+class PeepholeOptimizer:
+    """Local rewrites of the instructions emitted by ``Compiler``.
+
+    Every rewrite in ``REWRITES`` can be left out through ``rewrites``, and
+    ``stats`` counts how often each one fired:
+
+    - ``jump_to_return``: an unconditional jump to a ``RETURN_VALUE``
+      becomes the return itself.
+    - ``jump_threading``: jumps to another unconditional jump go straight
+      to its target; a jump to the next instruction is dropped.
+    - ``dead_code``: instructions between an unconditional jump or return
+      and the next label are removed.
+    - ``store_load``: ``STORE_FAST x; LOAD_FAST x`` is dropped when that is
+      the only store and load of a local. When ``x`` is called on 3.11+, a
+      ``PUSH_NULL`` sits between them and is swapped below the value.
+    - ``tuple_access``: ``first``/``second``, emitted as ``LOAD_CONST i;
+      BINARY_SUBSCR``, unpack the pair instead.
+    - ``module_epilogue``: the module returns its last value directly
+      instead of ``POP_TOP; LOAD_CONST None``; nothing reads it.
+
+    Instructions it emits come from ``backend``, the same as the compiler's.
+    """
+
+    def __init__(self, rewrites: Iterable[str] = REWRITES, backend: Optional[Backend] = None):
+        self.rewrites = frozenset(rewrites)
+        unknown = self.rewrites - set(REWRITES)
+        if unknown:
+            raise ValueError(f"unknown peephole rewrites: {', '.join(sorted(unknown))}")
+        self.backend = backend or backend_for()
+        self.stats: Counter = Counter()
+
+    @property
+    def rewrite_count(self) -> int:
+        return sum(self.stats.values())
+
+    def optimize(self, bytecode: Bytecode, nested: bool = True) -> Bytecode:
+        """Rewrite ``bytecode`` and the code objects nested in it, in place.
+
+        Nested functions are already assembled into code objects, so each is
+        disassembled, optimized and assembled again, innermost first. Code
+        from other files, like the runtime helpers, is left alone. With
+        ``nested`` False only ``bytecode`` itself is rewritten, for callers
+        that optimize each function before assembling it.
+        """
+        if not nested:
+            self._optimize_code(bytecode)
+            return bytecode
+        order = []
+        pending = [(bytecode, None)]
+        while pending:
+            function_bytecode, owner = pending.pop()
+            order.append((function_bytecode, owner))
+            for instr in function_bytecode:
+                if (
+                    isinstance(instr, Instr)
+                    and instr.name == "LOAD_CONST"
+                    and isinstance(instr.arg, CodeType)
+                    and instr.arg.co_filename == function_bytecode.filename
+                ):
+                    pending.append((Bytecode.from_code(instr.arg), instr))
+
+        for function_bytecode, owner in reversed(order):
+            self._optimize_code(function_bytecode)
+            if owner is not None:
+                owner.arg = function_bytecode.to_code()
+        return bytecode
+
+    def _optimize_code(self, bytecode: Bytecode):
+        items = list(bytecode)
+        passes = [
+            (name, getattr(self, "_" + name))
+            for name in REWRITES
+            if name in self.rewrites
+        ]
+        for _ in range(_MAX_ROUNDS):
+            changed = False
+            for name, rewrite in passes:
+                items, count = rewrite(items, bytecode)
+                if count:
+                    self.stats[name] += count
+                    changed = True
+            if not changed:
+                break
+        bytecode[:] = items
+
+    @staticmethod
+    def _jump_to_return(items: list, bytecode: Bytecode):
+        labels = _label_indexes(items)
+        count = 0
+        for index, item in enumerate(items):
+            if not (_is_jump_to_label(item) and item.is_uncond_jump()):
+                continue
+            target = _first_instr(items, labels[item.arg])
+            if target < len(items) and items[target].name == "RETURN_VALUE":
+                items[index] = Instr("RETURN_VALUE", lineno=item.lineno)
+                count += 1
+        return items, count
+
+    def _jump_threading(self, items: list, bytecode: Bytecode):
+        labels = _label_indexes(items)
+        count = 0
+        result = []
+        for index, item in enumerate(items):
+            if not _is_jump_to_label(item):
+                result.append(item)
+                continue
+
+            label, seen = item.arg, {item.arg}
+            while True:
+                target = _first_instr(items, labels[label])
+                if target == len(items):
+                    break
+                next_jump = items[target]
+                if not (_is_jump_to_label(next_jump) and next_jump.is_uncond_jump()):
+                    break
+                if next_jump.arg in seen:
+                    break
+                label = next_jump.arg
+                seen.add(label)
+
+            if item.is_uncond_jump() and _first_instr(items, index + 1) == _first_instr(
+                items, labels[label]
+            ):
+                count += 1
+                continue
+            if label is not item.arg:
+                backward = labels[label] < index
+                if item.is_uncond_jump():
+                    item = self.backend.jump(label, item.lineno, backward=backward)
+                    count += 1
+                elif not backward or self.backend.backward_conditional_jumps:
+                    item = Instr(item.name, label, lineno=item.lineno)
+                    count += 1
+            result.append(item)
+        return result, count
+
+    @staticmethod
+    def _dead_code(items: list, bytecode: Bytecode):
+        # Labels no jump refers to anymore are dropped, so they do not make
+        # the code after them look reachable.
+        targets = {item.arg for item in items if _is_jump_to_label(item)}
+        result = []
+        reachable = True
+        count = 0
+        for item in items:
+            if isinstance(item, Label):
+                if item not in targets:
+                    continue
+                reachable = True
+            elif isinstance(item, Instr) and not reachable:
+                count += 1
+                continue
+            result.append(item)
+            if isinstance(item, Instr) and item.is_final():
+                reachable = False
+        return result, count
+
+    def _store_load(self, items: list, bytecode: Bytecode):
+        loads, stores = Counter(), Counter()
+        for item in items:
+            if isinstance(item, Instr):
+                if item.name in _LOAD_FAST_NAMES:
+                    loads[item.arg] += 1
+                elif item.name == "STORE_FAST":
+                    stores[item.arg] += 1
+
+        result = []
+        count = 0
+        index = 0
+        while index < len(items):
+            item = items[index]
+            load_index = index + 1
+            push_null = (
+                load_index < len(items)
+                and isinstance(items[load_index], Instr)
+                and items[load_index].name == "PUSH_NULL"
+            )
+            if push_null:
+                load_index += 1
+            following = items[load_index] if load_index < len(items) else None
+            if (
+                isinstance(item, Instr)
+                and item.name == "STORE_FAST"
+                and isinstance(following, Instr)
+                and following.name in _LOAD_FAST_NAMES
+                and following.arg == item.arg
+                and loads[item.arg] == 1
+                and stores[item.arg] == 1
+                and item.arg not in bytecode.argnames
+            ):
+                if push_null:
+                    result.append(items[index + 1])
+                    result.append(self.backend.swap(following.lineno))
+                count += 1
+                index = load_index + 1
+                continue
+            result.append(item)
+            index += 1
+        return result, count
+
+    def _tuple_access(self, items: list, bytecode: Bytecode):
+        result = []
+        count = 0
+        index = 0
+        while index < len(items):
+            item = items[index]
+            following = items[index + 1] if index + 1 < len(items) else None
+            if (
+                isinstance(item, Instr)
+                and item.name == "LOAD_CONST"
+                and type(item.arg) is int
+                and item.arg in (0, 1)
+                and isinstance(following, Instr)
+                and following.name == "BINARY_SUBSCR"
+            ):
+                # UNPACK_SEQUENCE leaves the first element on top.
+                lineno = following.lineno
+                result.append(Instr("UNPACK_SEQUENCE", 2, lineno=lineno))
+                if item.arg == 0:
+                    result.append(self.backend.swap(lineno))
+                result.append(Instr("POP_TOP", lineno=lineno))
+                count += 1
+                index += 2
+                continue
+            result.append(item)
+            index += 1
+        return result, count
+
+    @staticmethod
+    def _module_epilogue(items: list, bytecode: Bytecode):
+        if bytecode.name != _MODULE_NAME or len(items) < 3:
+            return items, 0
+        pop, load, ret = items[-3:]
+        if (
+            isinstance(pop, Instr)
+            and pop.name == "POP_TOP"
+            and isinstance(load, Instr)
+            and load.name == "LOAD_CONST"
+            and load.arg is None
+            and isinstance(ret, Instr)
+            and ret.name == "RETURN_VALUE"
+        ):
+            return items[:-3] + [Instr("RETURN_VALUE", lineno=pop.lineno)], 1
+        return items, 0
+
+
+def optimize_bytecode(bytecode: Bytecode, rewrites: Iterable[str] = REWRITES) -> PeepholeOptimizer:
+    """Optimize ``bytecode`` in place and return the optimizer with its statistics."""
+    optimizer = PeepholeOptimizer(rewrites)
+    optimizer.optimize(bytecode)
+    return optimizer
@@ -0,0 +1,160 @@
+import contextlib
+import dis
+import glob
+import io
+import json
+import os
+import unittest
+from types import CodeType, FunctionType
+from bytecode import Bytecode, Instr, Label
+from rinhac import Compiler
+from rinhac.ast import BinaryOp
+from rinhac.backend import backend_for
+from rinhac.ast.json_parser import parse_json_to_object
+from rinhac.optimizer import PeepholeOptimizer, infer_types, optimize_bytecode
+from rinhac.optimizer.peephole import REWRITES
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+COMPILER_TEST_DATA = os.path.join(_current_dir, "..", "test_data", "compiler")
+CLOSURES_TEST_JSON = os.path.join(COMPILER_TEST_DATA, "closures_test.json")
+BACKEND = backend_for()
+
+
+def _function(instructions: list, argnames=("x",)) -> Bytecode:
+    bytecode = Bytecode(instructions)
+    bytecode.argcount = len(argnames)
+    bytecode.argnames = list(argnames)
+    return bytecode
+
+
+class TestPeephole(unittest.TestCase):
+    def _compile(self, json_path: str) -> Bytecode:
+        with open(json_path) as f:
+            json_ast = json.load(f)
+        ast = parse_json_to_object(json_ast, IndexLineMapper(json_path))
+        compiler = Compiler(types=infer_types(ast))
+        return compiler.to_bytecode(ast, Bytecode(), create_symbol_table(ast))
+
+    def _exec(self, code: CodeType) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exec(code, {"__name__": "__main__"})
+        return output.getvalue()
+
+    def test_jump_to_return_and_dead_code(self):
+        end = Label()
+        bytecode = _function(
+            [
+                Instr("LOAD_FAST", "x"),
+                BACKEND.jump(end, None),
+                Instr("LOAD_CONST", 1),
+                end,
+                Instr("RETURN_VALUE"),
+            ]
+        )
+        optimizer = optimize_bytecode(bytecode)
+
+        self.assertEqual(
+            [instr.name for instr in bytecode],
+            ["LOAD_FAST", "RETURN_VALUE"],
+        )
+        self.assertEqual(optimizer.stats, {"jump_to_return": 1, "dead_code": 2})
+
+    def test_jump_threading(self):
+        start, middle, end = Label(), Label(), Label()
+        bytecode = _function(
+            [
+                start,
+                Instr("LOAD_FAST", "x"),
+                BACKEND.pop_jump_if(False, middle, None),
+                BACKEND.jump(start, None, backward=True),
+                middle,
+                BACKEND.jump(end, None),
+                Instr("NOP"),
+                end,
+                Instr("LOAD_CONST", None),
+                Instr("RETURN_VALUE"),
+            ]
+        )
+        optimizer = optimize_bytecode(bytecode, ["jump_threading"])
+
+        conditional = bytecode[2]
+        self.assertEqual(conditional.name, BACKEND.pop_jump_if(False, end, None).name)
+        self.assertIs(conditional.arg, end)
+        self.assertEqual(optimizer.stats, {"jump_threading": 1})
+
+    def test_store_load(self):
+        bytecode = _function(
+            [
+                Instr("LOAD_FAST", "x"),
+                Instr("STORE_FAST", "single"),
+                Instr("LOAD_FAST", "single"),
+                Instr("STORE_FAST", "twice"),
+                Instr("LOAD_FAST", "twice"),
+                Instr("LOAD_FAST", "twice"),
+                BACKEND.binary(BinaryOp.Add),
+                Instr("RETURN_VALUE"),
+            ]
+        )
+        optimizer = optimize_bytecode(bytecode, ["store_load"])
+
+        self.assertEqual(
+            [(instr.name, instr.arg) for instr in bytecode][:3],
+            [("LOAD_FAST", "x"), ("STORE_FAST", "twice"), ("LOAD_FAST", "twice")],
+        )
+        self.assertEqual(optimizer.stats, {"store_load": 1})
+
+    def test_tuple_access(self):
+        for index, expected in ((0, "a"), (1, "b")):
+            bytecode = _function(
+                [
+                    Instr("LOAD_FAST", "x"),
+                    Instr("LOAD_CONST", index),
+                    Instr("BINARY_SUBSCR"),
+                    Instr("RETURN_VALUE"),
+                ]
+            )
+            optimize_bytecode(bytecode, ["tuple_access"])
+            function = FunctionType(bytecode.to_code(), {})
+
+            self.assertEqual(function(("a", "b")), expected)
+            self.assertNotIn("BINARY_SUBSCR", [instr.name for instr in bytecode])
+
+    def test_unknown_rewrite(self):
+        with self.assertRaises(ValueError):
+            PeepholeOptimizer(["jump_to_return", "loop_unrolling"])
+
+    def test_compiled_programs(self):
+        for json_path in sorted(glob.glob(os.path.join(COMPILER_TEST_DATA, "*.json"))):
+            with self.subTest(os.path.basename(json_path)):
+                expected = self._exec(self._compile(json_path).to_code())
+                bytecode = self._compile(json_path)
+                optimizer = optimize_bytecode(bytecode)
+
+                self.assertEqual(self._exec(bytecode.to_code()), expected)
+                self.assertEqual(optimizer.stats["module_epilogue"], 1)
+
+    def test_nested_code(self):
+        bytecode = self._compile(CLOSURES_TEST_JSON)
+        optimizer = optimize_bytecode(bytecode, ["store_load"])
+        code = bytecode.to_code()
+
+        self.assertEqual(optimizer.stats, {"store_load": 7})
+        captured_in_let_value = next(
+            const for const in code.co_consts
+            if isinstance(const, CodeType) and const.co_name == "captured_in_let_value"
+        )
+        doubled = next(
+            const for const in captured_in_let_value.co_consts if isinstance(const, CodeType)
+        )
+        self.assertNotIn("STORE_FAST", [instr.opname for instr in dis.get_instructions(doubled)])
+
+    def test_disabled_rewrites(self):
+        bytecode = self._compile(CLOSURES_TEST_JSON)
+        rewrites = [rewrite for rewrite in REWRITES if rewrite != "store_load"]
+        optimizer = optimize_bytecode(bytecode, rewrites)
+
+        self.assertNotIn("store_load", optimizer.stats)
+        self.assertGreater(optimizer.rewrite_count, 0)
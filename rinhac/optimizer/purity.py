@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from rinhac.ast import (
+    Var,
+    Function,
+    Call,
+    Let,
+    Binary,
+    If,
+    Tuple,
+    First,
+    Second,
+    Print,
+    File,
+)
+
+
+_WALK, _BIND, _UNBIND = range(3)
+
+
+@dataclass(slots=True)
+class FunctionEffects:
+    function: Function
+    prints: bool = False
+    unknown_calls: bool = False
+    callees: list[Function] = field(default_factory=list)
+
+
+_UNBOUND = object()
+
+
+@dataclass(slots=True)
+class _Binding:
+    name: str
+    value: Optional[Function]
+    previous: object = _UNBOUND
+
+
+def _collect_effects(ast: File, effects: Dict[int, FunctionEffects]):
+    """Record prints and calls of every Let-bound function in ``ast``.
+
+    Walks the tree with an explicit stack. Names live in a single dict: a
+    queued ``bind`` step saves the shadowed value and a matching ``unbind``
+    step, queued below the binding's scope, puts it back.
+    """
+    scope: Dict[str, Optional[Function]] = {}
+    pending: list = [(_WALK, ast, ())]
+    while pending:
+        step, term, enclosing = pending.pop()
+
+        if step == _BIND:
+            term.previous = scope.get(term.name, _UNBOUND)
+            scope[term.name] = term.value
+
+        elif step == _UNBIND:
+            if term.previous is _UNBOUND:
+                del scope[term.name]
+            else:
+                scope[term.name] = term.previous
+
+        elif isinstance(term, File):
+            pending.append((_WALK, term.expression, enclosing))
+
+        elif isinstance(term, Let) and isinstance(term.value, Function):
+            function_effects = FunctionEffects(term.value)
+            effects[id(term.value)] = function_effects
+            binding = _Binding(term.name.text, term.value)
+            pending.append((_UNBIND, binding, enclosing))
+            pending.append((_WALK, term.next_term, enclosing))
+            pending.append((_WALK, term.value, enclosing + (function_effects,)))
+            pending.append((_BIND, binding, enclosing))
+
+        elif isinstance(term, Let):
+            binding = _Binding(term.name.text, None)
+            pending.append((_UNBIND, binding, enclosing))
+            pending.append((_WALK, term.next_term, enclosing))
+            pending.append((_BIND, binding, enclosing))
+            pending.append((_WALK, term.value, enclosing))
+
+        elif isinstance(term, Function):
+            # Anonymous functions are not memoized, but their effects still
+            # count against every function they are nested in.
+            bindings = [_Binding(param.text, None) for param in term.parameters]
+            pending.extend((_UNBIND, binding, enclosing) for binding in bindings)
+            pending.append((_WALK, term.value, enclosing))
+            pending.extend((_BIND, binding, enclosing) for binding in reversed(bindings))
+
+        elif isinstance(term, Call):
+            callee = scope.get(term.callee.text) if isinstance(term.callee, Var) else None
+            for function_effects in enclosing:
+                if callee is None:
+                    function_effects.unknown_calls = True
+                else:
+                    function_effects.callees.append(callee)
+            pending.extend((_WALK, arg, enclosing) for arg in reversed(term.arguments))
+            pending.append((_WALK, term.callee, enclosing))
+
+        elif isinstance(term, Print):
+            for function_effects in enclosing:
+                function_effects.prints = True
+            pending.append((_WALK, term.value, enclosing))
+
+        elif isinstance(term, Binary):
+            pending.append((_WALK, term.rhs, enclosing))
+            pending.append((_WALK, term.lhs, enclosing))
+
+        elif isinstance(term, If):
+            pending.append((_WALK, term.otherwise, enclosing))
+            pending.append((_WALK, term.then, enclosing))
+            pending.append((_WALK, term.condition, enclosing))
+
+        elif isinstance(term, Tuple):
+            pending.append((_WALK, term.second, enclosing))
+            pending.append((_WALK, term.first, enclosing))
+
+        elif isinstance(term, First) or isinstance(term, Second):
+            pending.append((_WALK, term.value, enclosing))
+
+
+def find_pure_functions(ast: File) -> list[Function]:
+    """Return the Let-bound functions whose calls can never print.
+
+    A function is pure when no ``print`` appears anywhere in its body and every
+    call it makes goes to a Let-bound function that is itself pure. Calls to
+    parameters or computed callees are unknown and make the caller impure.
+    Recursive functions start out pure and are discarded until a fixed point
+    is reached, so self-recursion does not block memoization.
+    """
+    effects: Dict[int, FunctionEffects] = {}
+    _collect_effects(ast, effects)
+
+    pure = {
+        key
+        for key, function_effects in effects.items()
+        if not function_effects.prints and not function_effects.unknown_calls
+    }
+    changed = True
+    while changed:
+        changed = False
+        for key in list(pure):
+            if any(id(callee) not in pure for callee in effects[key].callees):
+                pure.discard(key)
+                changed = True
+
+    return [effects[key].function for key in effects if key in pure]
@@ -0,0 +1,293 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Union
+from rinhac.ast import (
+    BinaryOp,
+    Var,
+    Function,
+    Call,
+    Let,
+    Str,
+    Int,
+    Binary,
+    Bool,
+    If,
+    Tuple,
+    First,
+    Second,
+    Print,
+    File,
+)
+
+INT = "Int"
+STR = "Str"
+BOOL = "Bool"
+TUPLE = "Tuple"
+CLOSURE = "Closure"
+
+
+@dataclass(frozen=True, slots=True)
+class TupleType:
+    """A tuple whose element types are known one level deep."""
+
+    first: object
+    second: object
+
+
+# Lattice bottom: no value has reached this term yet, e.g. the result of a
+# recursive call before the base case has been seen. ``None`` is the top.
+_BOTTOM = object()
+
+_VISIT, _EXIT, _BIND, _UNBIND = range(4)
+
+_INT_RESULTS = {BinaryOp.Sub, BinaryOp.Mul, BinaryOp.Div, BinaryOp.Rem}
+
+
+def _shallow(type_):
+    return TUPLE if isinstance(type_, TupleType) else type_
+
+
+def _join(lhs, rhs):
+    if lhs is _BOTTOM:
+        return rhs
+    if rhs is _BOTTOM or lhs == rhs:
+        return lhs
+    if isinstance(lhs, TupleType) and isinstance(rhs, TupleType):
+        return TupleType(
+            _join(lhs.first, rhs.first),
+            _join(lhs.second, rhs.second),
+        )
+    if _shallow(lhs) == TUPLE and _shallow(rhs) == TUPLE:
+        return TUPLE
+    return None
+
+
+def _add_type(lhs, rhs):
+    # ``+`` concatenates as soon as one side is a string, so the result is
+    # a string whatever the other side turns out to be.
+    if lhs == STR or rhs == STR:
+        return STR
+    if lhs is _BOTTOM or rhs is _BOTTOM:
+        return _BOTTOM
+    if lhs == INT and rhs == INT:
+        return INT
+    return None
+
+
+def _binary_type(op: BinaryOp, lhs, rhs):
+    if op == BinaryOp.Add:
+        return _add_type(lhs, rhs)
+    if op in _INT_RESULTS:
+        return INT
+    if op in (BinaryOp.And, BinaryOp.Or):
+        # Short-circuiting evaluates to whichever operand decided.
+        return _join(lhs, rhs)
+    return BOOL
+
+
+@dataclass(slots=True)
+class _Binding:
+    name: str
+    type: object
+    function: Optional[Function] = None
+    # Let value whose type the binding takes once it has been visited.
+    value: object = None
+    previous: object = None
+
+
+@dataclass(slots=True)
+class _FunctionTypes:
+    parameters: list = field(default_factory=list)
+    result: object = _BOTTOM
+
+
+class TypeInference:
+    """Static types of the terms of one program.
+
+    Types are ``INT``, ``STR``, ``BOOL``, ``CLOSURE``, ``TUPLE`` or a
+    ``TupleType`` with known elements; ``None`` means unknown. Parameters of a
+    Let-bound function take the join of the arguments of every direct call,
+    and calls take the join of the function's results, iterated to a fixed
+    point. Functions used as values, and those no ``let`` names, may be
+    called from anywhere, so their parameters stay unknown.
+    """
+
+    def __init__(self):
+        self._types: Dict[int, object] = {}
+        self._functions: Dict[int, _FunctionTypes] = {}
+        self._escaped: set[int] = set()
+        # Functions that are the value of a Let; only they have direct calls.
+        self._let_bound: set[int] = set()
+
+    def type_of(self, term) -> Union[str, TupleType, None]:
+        type_ = self._types.get(id(term), _BOTTOM)
+        return None if type_ is _BOTTOM else type_
+
+    def _function_types(self, function: Function) -> _FunctionTypes:
+        function_types = self._functions.get(id(function))
+        if function_types is None:
+            function_types = _FunctionTypes([_BOTTOM] * len(function.parameters))
+            self._functions[id(function)] = function_types
+        return function_types
+
+    def _snapshot(self) -> tuple:
+        return (
+            len(self._escaped),
+            [(tuple(types.parameters), types.result) for types in self._functions.values()],
+        )
+
+    def infer(self, ast: File):
+        """Run passes over ``ast`` until no parameter or result type changes."""
+        while True:
+            before = self._snapshot()
+            self._infer_pass(ast)
+            if self._snapshot() == before:
+                return
+
+    def _infer_pass(self, ast: File):
+        types = self._types
+        scope: Dict[str, _Binding] = {}
+        pending: list = [(_VISIT, ast)]
+        while pending:
+            step, term = pending.pop()
+
+            if step == _BIND:
+                if term.value is not None:
+                    term.type = types[id(term.value)]
+                term.previous = scope.get(term.name)
+                scope[term.name] = term
+
+            elif step == _UNBIND:
+                if term.previous is None:
+                    del scope[term.name]
+                else:
+                    scope[term.name] = term.previous
+
+            elif step == _EXIT:
+                types[id(term)] = self._exit_type(term, scope)
+
+            elif isinstance(term, (Int, Str, Bool)):
+                types[id(term)] = INT if isinstance(term, Int) else STR if isinstance(term, Str) else BOOL
+
+            elif isinstance(term, Var):
+                binding = scope.get(term.text)
+                if binding is None:
+                    types[id(term)] = None
+                    continue
+                if binding.function is not None:
+                    self._escaped.add(id(binding.function))
+                types[id(term)] = binding.type
+
+            elif isinstance(term, File):
+                pending.append((_EXIT, term))
+                pending.append((_VISIT, term.expression))
+
+            elif isinstance(term, Let):
+                if isinstance(term.value, Function):
+                    self._let_bound.add(id(term.value))
+                    binding = _Binding(term.name.text, CLOSURE, term.value)
+                    pending.append((_EXIT, term))
+                    pending.append((_UNBIND, binding))
+                    pending.append((_VISIT, term.next_term))
+                    pending.append((_VISIT, term.value))
+                    pending.append((_BIND, binding))
+                else:
+                    binding = _Binding(term.name.text, _BOTTOM, value=term.value)
+                    pending.append((_EXIT, term))
+                    pending.append((_UNBIND, binding))
+                    pending.append((_VISIT, term.next_term))
+                    pending.append((_BIND, binding))
+                    pending.append((_VISIT, term.value))
+
+            elif isinstance(term, Function):
+                function_types = self._function_types(term)
+                escaped = id(term) in self._escaped or id(term) not in self._let_bound
+                bindings = [
+                    _Binding(param.text, None if escaped else param_type)
+                    for param, param_type in zip(term.parameters, function_types.parameters)
+                ]
+                pending.append((_EXIT, term))
+                pending.extend((_UNBIND, binding) for binding in bindings)
+                pending.append((_VISIT, term.value))
+                pending.extend((_BIND, binding) for binding in reversed(bindings))
+
+            elif isinstance(term, Call):
+                pending.append((_EXIT, term))
+                pending.extend((_VISIT, arg) for arg in reversed(term.arguments))
+                if self._direct_callee(term, scope) is None:
+                    pending.append((_VISIT, term.callee))
+                else:
+                    types[id(term.callee)] = CLOSURE
+
+            elif isinstance(term, Binary):
+                pending.append((_EXIT, term))
+                pending.append((_VISIT, term.rhs))
+                pending.append((_VISIT, term.lhs))
+
+            elif isinstance(term, If):
+                pending.append((_EXIT, term))
+                pending.append((_VISIT, term.otherwise))
+                pending.append((_VISIT, term.then))
+                pending.append((_VISIT, term.condition))
+
+            elif isinstance(term, Tuple):
+                pending.append((_EXIT, term))
+                pending.append((_VISIT, term.second))
+                pending.append((_VISIT, term.first))
+
+            elif isinstance(term, (First, Second, Print)):
+                pending.append((_EXIT, term))
+                pending.append((_VISIT, term.value))
+
+    @staticmethod
+    def _direct_callee(term: Call, scope: Dict[str, _Binding]) -> Optional[Function]:
+        if not isinstance(term.callee, Var):
+            return None
+        binding = scope.get(term.callee.text)
+        if binding is None or binding.function is None:
+            return None
+        if len(binding.function.parameters) != len(term.arguments):
+            return None
+        return binding.function
+
+    def _exit_type(self, term, scope: Dict[str, _Binding]):
+        types = self._types
+        if isinstance(term, File):
+            return types[id(term.expression)]
+        if isinstance(term, Let):
+            return types[id(term.next_term)]
+        if isinstance(term, Function):
+            function_types = self._function_types(term)
+            function_types.result = _join(function_types.result, types[id(term.value)])
+            return CLOSURE
+        if isinstance(term, Call):
+            function = self._direct_callee(term, scope)
+            if function is None:
+                return None
+            function_types = self._function_types(function)
+            function_types.parameters = [
+                _join(param_type, types[id(arg)])
+                for param_type, arg in zip(function_types.parameters, term.arguments)
+            ]
+            return function_types.result
+        if isinstance(term, Binary):
+            return _binary_type(term.op, types[id(term.lhs)], types[id(term.rhs)])
+        if isinstance(term, If):
+            return _join(types[id(term.then)], types[id(term.otherwise)])
+        if isinstance(term, Tuple):
+            return TupleType(_shallow(types[id(term.first)]), _shallow(types[id(term.second)]))
+        if isinstance(term, (First, Second)):
+            value_type = types[id(term.value)]
+            if value_type is _BOTTOM:
+                return _BOTTOM
+            if isinstance(value_type, TupleType):
+                return value_type.first if isinstance(term, First) else value_type.second
+            return None
+        # ``print`` evaluates to its argument.
+        return types[id(term.value)]
+
+
+def infer_types(ast: File) -> TypeInference:
+    """Infer the static types of ``ast``'s terms."""
+    inference = TypeInference()
+    inference.infer(ast)
+    return inference
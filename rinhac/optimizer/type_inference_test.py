@@ -0,0 +1,104 @@
+import contextlib
+import dis
+import io
+import json
+import os
+import unittest
+from bytecode import Bytecode
+from rinhac import Compiler
+from rinhac.ast import BinaryOp, Let
+from rinhac.backend import backend_for
+from rinhac.ast.json_parser import parse_json_to_object
+from rinhac.compiler import ADD_HELPER_NAME
+from rinhac.optimizer import infer_types
+from rinhac.optimizer.type_inference import CLOSURE, INT, STR, TupleType
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.index_line_mapper import IndexLineMapper
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+TYPE_INFERENCE_TEST_JSON = os.path.join(
+    _current_dir, "..", "test_data", "optimizer", "type_inference_test.json"
+)
+ESCAPED_FUNCTION_TEST_JSON = os.path.join(
+    _current_dir, "..", "test_data", "optimizer", "escaped_function_test.json"
+)
+
+
+class TestTypeInference(unittest.TestCase):
+    def _parse(self, json_path=TYPE_INFERENCE_TEST_JSON):
+        with open(json_path) as f:
+            json_ast = json.load(f)
+        index_line_mapper = IndexLineMapper(json_path)
+        return parse_json_to_object(json_ast, index_line_mapper)
+
+    def _bindings(self, ast) -> dict:
+        bindings = {}
+        term = ast.expression
+        while isinstance(term, Let):
+            bindings[term.name.text] = term.value
+            term = term.next_term
+        return bindings
+
+    def test_infer_types(self):
+        ast = self._parse()
+        types = infer_types(ast)
+        bindings = self._bindings(ast)
+
+        fib_body = bindings["fib"].value
+        self.assertEqual(types.type_of(fib_body), INT)
+        self.assertEqual(types.type_of(fib_body.otherwise.lhs), INT)
+        self.assertEqual(types.type_of(bindings["label"]), CLOSURE)
+        self.assertEqual(types.type_of(bindings["label"].value), STR)
+        self.assertEqual(types.type_of(bindings["pair"]), TupleType(INT, STR))
+        self.assertEqual(types.type_of(bindings["title"]), STR)
+        # ``twice`` is passed as a value, so its parameter is unknown.
+        self.assertIsNone(types.type_of(bindings["twice"].value))
+        self.assertIsNone(types.type_of(bindings["applied"]))
+        # ``print`` evaluates to its argument.
+        self.assertEqual(types.type_of(bindings["_"]), STR)
+
+    def test_specialized_codegen(self):
+        ast = self._parse()
+        compiler = Compiler(types=infer_types(ast))
+        code = compiler.to_bytecode(ast, Bytecode(), create_symbol_table(ast)).to_code()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            namespace = {}
+            exec(code, namespace)
+
+        self.assertEqual(output.getvalue(), "fib: 6765\nfib55\n")
+        self.assertEqual(namespace["applied"], 42)
+        self.assertEqual(namespace["twice"]("a"), "aa")
+        with self.assertRaises(TypeError):
+            namespace["twice"](True)
+
+        self.assertEqual(compiler.add_stats, {"int": 1, "str": 1, "concat": 2, "generic": 1})
+        self.assertEqual(compiler.specialized_add_count, 4)
+        fib_instructions = list(dis.get_instructions(namespace["fib"]))
+        binary_add = backend_for().binary(BinaryOp.Add)
+        self.assertIn(binary_add.name, [instr.opname for instr in fib_instructions])
+        self.assertNotIn(ADD_HELPER_NAME, [instr.argval for instr in fib_instructions])
+        label_opnames = [instr.opname for instr in dis.get_instructions(namespace["label"])]
+        self.assertEqual(label_opnames.count("FORMAT_VALUE"), 1)
+        self.assertIn("BUILD_STRING", label_opnames)
+
+    def test_without_types(self):
+        ast = self._parse()
+        compiler = Compiler()
+        code = compiler.to_bytecode(ast, Bytecode(), create_symbol_table(ast)).to_code()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            exec(code, {})
+
+        self.assertEqual(output.getvalue(), "fib: 6765\nfib55\n")
+        self.assertEqual(compiler.add_stats, {"generic": 5})
+
+    def test_anonymous_function_escapes(self):
+        # The function ``g`` is given is called with a string, although
+        # nothing calls it directly.
+        ast = self._parse(ESCAPED_FUNCTION_TEST_JSON)
+        compiler = Compiler(types=infer_types(ast))
+        code = compiler.to_bytecode(ast, Bytecode(), create_symbol_table(ast)).to_code()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            exec(code, {})
+
+        self.assertEqual(output.getvalue(), "a1\n")
@@ -0,0 +1,191 @@
+"""Helpers for operations whose operand types are only known at run time.
+
+The compiler copies the code objects of the helpers a program needs into
+its module prologue, so compiled programs never import this module. The
+helpers must therefore only use builtins and the standard library;
+``close_output`` is for hosts that run compiled programs in-process.
+
+The helpers run with the program's globals, where a Rinha binding such as
+``let str = ...`` would shadow a builtin, so the builtins they use are
+bound when they are defined: as defaults, read by the compiler, or by
+importing them from ``builtins``.
+"""
+
+
+def rinha_add(lhs, rhs, _type=type, _int=int, _str=str, _TypeError=TypeError):
+    """Rinha ``+``: integer addition, or concatenation if a side is a string."""
+    lhs_type, rhs_type = _type(lhs), _type(rhs)
+    if lhs_type is _int and rhs_type is _int:
+        return lhs + rhs
+    if (lhs_type is _str or lhs_type is _int) and (rhs_type is _str or rhs_type is _int):
+        return f"{lhs}{rhs}"
+    raise _TypeError(
+        f"invalid operands for +: {lhs_type.__name__} and {rhs_type.__name__}"
+    )
+
+
+def rinha_div(lhs, rhs, _abs=abs):
+    """Rinha ``/``: integer division truncating toward zero."""
+    quotient = _abs(lhs) // _abs(rhs)
+    return quotient if (lhs < 0) == (rhs < 0) else -quotient
+
+
+def rinha_rem(lhs, rhs, _abs=abs):
+    """Rinha ``%``: what ``rinha_div`` leaves, so it has the sign of ``lhs``."""
+    quotient = _abs(lhs) // _abs(rhs)
+    if (lhs < 0) != (rhs < 0):
+        quotient = -quotient
+    return lhs - rhs * quotient
+
+
+# Globals the module prologue binds for programs that print.
+PRINT_HELPER_NAME = "__rinha_print__"
+OUTPUT_NAME = "__rinha_output__"
+FLUSH_NAME = "__rinha_flush__"
+
+
+def rinha_open_output():
+    """The buffer ``rinha_print`` appends lines to, and the function emptying it.
+
+    The buffer is written to ``sys.stdout`` when it fills up, when the
+    module code ends and, through ``atexit``, when the interpreter exits
+    after an error.
+    """
+    import atexit
+    import sys
+
+    output = []
+
+    def flush():
+        if output:
+            output.append("")
+            sys.stdout.write("\n".join(output))
+            output.clear()
+        sys.stdout.flush()
+
+    atexit.register(flush)
+    return output, flush
+
+
+def rinha_print(value, _type=type, _int=int, _str=str, _tuple=tuple, _bool=bool, _len=len):
+    """Rinha ``print``: write ``value`` and a newline, and return ``value``.
+
+    Booleans are written as ``true``/``false``, tuples as ``(a, b)`` and
+    functions as ``<#closure>``. Nested tuples are formatted with an
+    explicit stack, so deep lists do not hit the recursion limit.
+    """
+    value_type = _type(value)
+    if value_type is _str:
+        text = value
+    elif value_type is _int:
+        text = _str(value)
+    elif (
+        value_type is _tuple
+        and _type(value[0]) in (_int, _str)
+        and _type(value[1]) in (_int, _str)
+    ):
+        text = f"({value[0]}, {value[1]})"
+    else:
+        parts = []
+        # Separators are pushed as strings, which are written as they are.
+        pending = [value]
+        while pending:
+            item = pending.pop()
+            item_type = _type(item)
+            if item_type is _str:
+                parts.append(item)
+            elif item_type is _int:
+                parts.append(_str(item))
+            elif item_type is _bool:
+                parts.append("true" if item else "false")
+            elif item_type is _tuple:
+                pending.extend((")", item[1], ", ", item[0], "("))
+            else:
+                parts.append("<#closure>")
+        text = "".join(parts)
+
+    output = __rinha_output__  # noqa: F821
+    output.append(text)
+    # Lines buffered before they are written out.
+    if _len(output) >= 4096:
+        __rinha_flush__()  # noqa: F821
+    return value
+
+
+def close_output(namespace: dict):
+    """Write out what the program run in ``namespace`` still buffers.
+
+    For hosts that run programs without exiting the interpreter; the exit
+    hook of the program is removed.
+    """
+    flush = namespace.get(FLUSH_NAME)
+    if flush is not None:
+        import atexit
+
+        atexit.unregister(flush)
+        flush()
+
+
+def rinha_run_deep(main, stack_size, recursion_limit):
+    """Call ``main`` on a thread with a large stack and recursion limit.
+
+    ``stack_size`` is in bytes; 0 sizes it from the memory available to the
+    process, between 64 MiB and 1 GiB. A ``recursion_limit`` of 0 allows as
+    many frames as the stack holds. Both settings are restored afterwards,
+    and what ``main`` raises is raised again in the calling thread.
+    """
+    import os
+    import sys
+    import threading
+    from builtins import (
+        AttributeError,
+        BaseException,
+        ImportError,
+        OSError,
+        ValueError,
+        max,
+        min,
+    )
+
+    if not stack_size:
+        try:
+            available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (AttributeError, ValueError, OSError):
+            available = 1 << 30
+        try:
+            import resource
+
+            # Thread stacks count against the address space limit.
+            limit = resource.getrlimit(resource.RLIMIT_AS)[0]
+            if limit != resource.RLIM_INFINITY:
+                available = min(available, limit)
+        except ImportError:
+            pass
+        stack_size = max(64 << 20, min(1 << 30, available // 2))
+    if not recursion_limit:
+        # A Rinha call takes under 600 bytes of C stack on 3.10, where the
+        # interpreter recurses in C, and through ``lru_cache`` on any version.
+        recursion_limit = stack_size // 1024
+
+    result = []
+
+    def run():
+        try:
+            result.append((True, main()))
+        except BaseException as error:
+            result.append((False, error))
+
+    previous_limit = sys.getrecursionlimit()
+    previous_size = threading.stack_size(stack_size)
+    try:
+        sys.setrecursionlimit(max(previous_limit, recursion_limit))
+        thread = threading.Thread(target=run, name="rinha-main")
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(previous_size)
+        sys.setrecursionlimit(previous_limit)
+    returned, value = result[0]
+    if not returned:
+        raise value
+    return value
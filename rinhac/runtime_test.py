@@ -0,0 +1,107 @@
+import contextlib
+import io
+import sys
+import threading
+import unittest
+from types import FunctionType
+from rinhac.runtime import (
+    FLUSH_NAME,
+    OUTPUT_NAME,
+    close_output,
+    rinha_div,
+    rinha_open_output,
+    rinha_print,
+    rinha_rem,
+    rinha_run_deep,
+)
+
+
+class TestRinhaPrint(unittest.TestCase):
+    def setUp(self):
+        # The globals a compiled program's prologue binds.
+        self.namespace = {}
+        self.namespace[OUTPUT_NAME], self.namespace[FLUSH_NAME] = rinha_open_output()
+        self.addCleanup(close_output, self.namespace)
+        self.print = FunctionType(
+            rinha_print.__code__, self.namespace, None, rinha_print.__defaults__
+        )
+
+    def _output(self, *values) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for value in values:
+                self.assertIs(self.print(value), value)
+            close_output(self.namespace)
+        return output.getvalue()
+
+    def test_format(self):
+        self.assertEqual(
+            self._output(42, "text", True, False, (1, ("a", False)), self.print, ((1, 2), 3)),
+            "42\ntext\ntrue\nfalse\n(1, (a, false))\n<#closure>\n((1, 2), 3)\n",
+        )
+
+    def test_deep_tuple(self):
+        depth = 100_000
+        value = 0
+        for index in range(depth):
+            value = (index, value)
+
+        output = self._output(value)
+
+        self.assertTrue(output.startswith(f"({depth - 1}, ({depth - 2}, "))
+        self.assertTrue(output.endswith("(0, 0)" + ")" * (depth - 1) + "\n"))
+
+    def test_flushes_when_full(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for index in range(4095):
+                self.print(index)
+            self.assertEqual(output.getvalue(), "")
+            self.print(4095)
+            self.print(4096)
+            # The full buffer was written in one piece.
+            self.assertEqual(output.getvalue(), "".join(f"{index}\n" for index in range(4096)))
+            close_output(self.namespace)
+        self.assertEqual(output.getvalue(), "".join(f"{index}\n" for index in range(4097)))
+
+
+def _depth(n):
+    return 0 if n == 0 else 1 + _depth(n - 1)
+
+
+class TestRinhaDivision(unittest.TestCase):
+    def test_truncates(self):
+        for lhs, rhs, quotient, remainder in [
+            (7, 2, 3, 1),
+            (-7, 2, -3, -1),
+            (7, -2, -3, 1),
+            (-7, -2, 3, -1),
+            (6, -3, -2, 0),
+            (0, -5, 0, 0),
+            (-(10**30) - 1, 10**15, -(10**15), -1),
+        ]:
+            with self.subTest(lhs=lhs, rhs=rhs):
+                self.assertEqual(rinha_div(lhs, rhs), quotient)
+                self.assertEqual(rinha_rem(lhs, rhs), remainder)
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            rinha_div(1, 0)
+        with self.assertRaises(ZeroDivisionError):
+            rinha_rem(1, 0)
+
+
+class TestRinhaRunDeep(unittest.TestCase):
+    def test_deep_recursion(self):
+        recursion_limit = sys.getrecursionlimit()
+        stack_size = threading.stack_size()
+
+        self.assertEqual(rinha_run_deep(lambda: _depth(100_000), 0, 0), 100_000)
+        self.assertEqual(sys.getrecursionlimit(), recursion_limit)
+        self.assertEqual(threading.stack_size(), stack_size)
+
+    def test_raises_in_caller(self):
+        with self.assertRaises(RecursionError):
+            rinha_run_deep(lambda: _depth(100_000), 64 << 20, 50_000)
+        with self.assertRaises(ZeroDivisionError):
+            rinha_run_deep(lambda: 1 // 0, 0, 0)
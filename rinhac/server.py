@@ -0,0 +1,434 @@
+"""``rinhac serve``: compile and run programs for clients on a Unix socket.
+
+The server imports the compiler once and forks ``workers`` processes that
+share the listening socket. Each worker answers one connection at a time:
+it compiles the AST, reusing code objects from an in-memory cache that
+survives across requests, and forks again to run the program. That keeps
+one program's globals, recursion limit and memory away from the next. The
+child runs under the request limits and its stdout and stderr are streamed
+back in frames as they are written (see ``rinhac.client``).
+"""
+import contextlib
+import io
+import os
+import resource
+import select
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+from collections import OrderedDict
+from types import CodeType, ModuleType
+from rinhac.client import (
+    AST,
+    EXIT,
+    NAME,
+    PATH,
+    STDERR,
+    STDOUT,
+    recv_frame,
+    send_frame,
+    socket_path,
+)
+from rinhac.runtime import close_output
+from rinhac.utils.compile_cache import CompileCache, line_source_data
+from rinhac.utils.pyc_converter import code_to_pyc_bytecode, pyc_bytecode_to_code
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MEMORY_LIMIT = 1024
+# Exit status of a request that ran out of time, as with timeout(1).
+TIMEOUT_STATUS = 124
+
+_MEMORY_CACHE_SIZE = 128
+_READ_SIZE = 64 * 1024
+
+
+class _CodeCache:
+    """Code objects of recently requested ASTs, keyed like the disk cache.
+
+    A miss falls back to the disk cache (when enabled) before compiling.
+    """
+
+    def __init__(self, options: dict, cache: bool, size: int = _MEMORY_CACHE_SIZE):
+        self.options = options
+        self.disk_cache = CompileCache() if cache else None
+        self.size = size
+        self._codes: OrderedDict[str, CodeType] = OrderedDict()
+        # The key includes a digest of the compiler sources; computing it
+        # once before forking saves every worker from walking them again.
+        self._key_cache = CompileCache()
+        self._key_cache.key(b"")
+
+    def _key(self, ast_file: str, ast_data: bytes) -> str:
+        options = self.options
+        return self._key_cache.key(
+            ast_data,
+            line_source_data(ast_file, ast_data),
+            memoize=options["memoize"],
+            memoize_cache_size=options["memoize_cache_size"] if options["memoize"] else None,
+            constant_folding=options["constant_folding"],
+            entry_function=options["entry_function"],
+            peephole=options["peephole"],
+            disabled_rewrites=tuple(sorted(options["disabled_rewrites"])),
+            deep_recursion=options["deep_recursion"],
+            codegen=options["codegen"],
+        )
+
+    def get(self, ast_file: str, ast_data: bytes) -> CodeType:
+        from rinhac.__main__ import _compile
+
+        key = self._key(ast_file, ast_data)
+        code = self._codes.get(key)
+        if code is not None:
+            self._codes.move_to_end(key)
+            return code
+
+        pyc_data = self.disk_cache.get(key) if self.disk_cache else None
+        if pyc_data:
+            code = pyc_bytecode_to_code(pyc_data)
+        else:
+            code = _compile(ast_file, ast_data, **self.options)
+            if self.disk_cache:
+                self.disk_cache.put(key, code_to_pyc_bytecode(code))
+        self._codes[key] = code
+        if len(self._codes) > self.size:
+            self._codes.popitem(last=False)
+        return code
+
+
+def _read_request(connection: socket.socket, directory: str) -> tuple[str, bytes, bool] | None:
+    """The AST file name and bytes of the request on ``connection``.
+
+    The last item tells whether the file was written for this request, for
+    the caller to remove once it is answered.
+    """
+    frame = recv_frame(connection)
+    if frame is None:
+        return None
+    kind, data = frame
+    if kind == PATH:
+        ast_file = os.fsdecode(data)
+        with open(ast_file, "rb") as f:
+            return ast_file, f.read(), False
+    if kind != NAME:
+        raise ValueError(f"unexpected frame {kind!r}")
+    ast_file = os.fsdecode(data) or "source.rinha.json"
+    frame = recv_frame(connection)
+    if frame is None:
+        return None
+    kind, ast_data = frame
+    if kind != AST:
+        raise ValueError(f"unexpected frame {kind!r}")
+
+    if not os.path.isfile(ast_file):
+        # Locations are mapped against a file, so payloads from elsewhere are
+        # written to the server's directory first, under a name of their own:
+        # workers handle requests with the same name at the same time.
+        fd, ast_file = tempfile.mkstemp(suffix="-" + os.path.basename(ast_file), dir=directory)
+        with open(fd, "wb") as f:
+            f.write(ast_data)
+        return ast_file, ast_data, True
+    return ast_file, ast_data, False
+
+
+def _run_program(code: CodeType, ast_file: str, timeout: float, memory_limit: int) -> int:
+    """Body of the child forked for one request; returns its exit status."""
+    if memory_limit:
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if timeout:
+        # A backstop for the wall clock deadline the worker enforces.
+        cpu_seconds = int(timeout) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+
+    module = ModuleType("__main__")
+    module.__file__ = os.path.splitext(ast_file)[0] + ".pyc"
+    sys.modules["__main__"] = module
+    status = 0
+    try:
+        exec(code, module.__dict__)
+    except SystemExit as exit:
+        status = exit.code if isinstance(exit.code, int) else int(exit.code is not None)
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    finally:
+        try:
+            # The child ends with os._exit, which skips the program's exit hook.
+            close_output(module.__dict__)
+            sys.stdout.flush()
+        except Exception:
+            status = status or 1
+        sys.stderr.flush()
+    return status
+
+
+class _Worker:
+    def __init__(
+        self,
+        listener: socket.socket,
+        code_cache: _CodeCache,
+        timeout: float,
+        memory_limit: int,
+        directory: str,
+    ):
+        self.listener = listener
+        self.code_cache = code_cache
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.directory = directory
+
+    def serve_forever(self):
+        while True:
+            connection, _ = self.listener.accept()
+            with connection:
+                try:
+                    self._handle(connection)
+                except (OSError, ValueError) as error:
+                    # A client that went away or sent garbage only loses
+                    # its own request.
+                    print(f"rinhac serve: {error}", file=sys.stderr)
+
+    def _handle(self, connection: socket.socket):
+        messages = io.StringIO()
+        code = None
+        written = False
+        try:
+            request = _read_request(connection, self.directory)
+            if request is None:
+                return
+            ast_file, ast_data, written = request
+            with contextlib.redirect_stdout(messages), contextlib.redirect_stderr(messages):
+                code = self.code_cache.get(ast_file, ast_data)
+        except FileNotFoundError as error:
+            print("File not found:", error.filename, file=messages)
+        except SystemExit:
+            # The parser reports invalid input and exits.
+            pass
+        except Exception:
+            messages.write(traceback.format_exc())
+        try:
+            if messages.getvalue():
+                send_frame(connection, STDERR, messages.getvalue().encode())
+            status = 1 if code is None else self._execute(code, ast_file, connection)
+        finally:
+            if written:
+                os.unlink(ast_file)
+        send_frame(connection, EXIT, str(status).encode())
+
+    def _execute(self, code: CodeType, ast_file: str, connection: socket.socket) -> int:
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                os.dup2(stdout_write, 1)
+                os.dup2(stderr_write, 2)
+                for fd in (stdout_read, stdout_write, stderr_read, stderr_write):
+                    os.close(fd)
+                connection.close()
+                self.listener.close()
+                status = _run_program(code, ast_file, self.timeout, self.memory_limit)
+            finally:
+                os._exit(status)
+
+        os.close(stdout_write)
+        os.close(stderr_write)
+        streams = {stdout_read: STDOUT, stderr_read: STDERR}
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        timed_out = False
+        try:
+            while streams:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    timed_out = True
+                    break
+                ready, _, _ = select.select(list(streams), [], [], remaining)
+                for fd in ready:
+                    data = os.read(fd, _READ_SIZE)
+                    if data:
+                        send_frame(connection, streams[fd], data)
+                    else:
+                        del streams[fd]
+                        os.close(fd)
+        finally:
+            if streams:
+                # Out of time, or the client went away while it ran.
+                os.kill(pid, signal.SIGKILL)
+            for fd in streams:
+                os.close(fd)
+            _, wait_status = os.waitpid(pid, 0)
+
+        if timed_out:
+            message = f"rinhac serve: timed out after {self.timeout:g} s\n"
+            send_frame(connection, STDERR, message.encode())
+            return TIMEOUT_STATUS
+        status = os.waitstatus_to_exitcode(wait_status)
+        if status < 0:
+            name = signal.Signals(-status).name
+            send_frame(connection, STDERR, f"rinhac serve: killed by {name}\n".encode())
+            return 128 - status
+        return status
+
+
+def _warm_up():
+    import bytecode  # noqa: F401
+    import rinhac.__main__  # noqa: F401
+    import rinhac.compiler  # noqa: F401
+    import rinhac.optimizer.peephole  # noqa: F401
+    from rinhac.ast import json_parser  # noqa: F401
+
+
+def _start_worker(worker: _Worker) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 1
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        worker.serve_forever()
+    finally:
+        os._exit(status)
+
+
+def serve(
+    path: str | None = None,
+    workers: int | None = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    memory_limit: int = DEFAULT_MEMORY_LIMIT,
+    memoize=False,
+    memoize_cache_size=None,
+    constant_folding=True,
+    show_stats=False,
+    cache=True,
+    entry_function=False,
+    peephole=True,
+    disabled_rewrites=(),
+    deep_recursion=None,
+    codegen="bytecode",
+    ready=None,
+):
+    """Listen on ``path`` until SIGTERM or SIGINT.
+
+    ``timeout`` is the wall time in seconds and ``memory_limit`` the address
+    space in MiB each program may use; 0 disables either. Workers that die
+    are replaced. ``ready`` is called once the workers are accepting.
+    """
+    from rinhac.batch import available_cores
+
+    path = path or socket_path()
+    workers = workers or available_cores()
+    options = dict(
+        memoize=memoize,
+        memoize_cache_size=memoize_cache_size,
+        constant_folding=constant_folding,
+        show_stats=show_stats,
+        entry_function=entry_function,
+        peephole=peephole,
+        disabled_rewrites=tuple(disabled_rewrites),
+        deep_recursion=deep_recursion,
+        codegen=codegen,
+    )
+    _warm_up()
+
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    pids = set()
+    previous_handler = signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        with tempfile.TemporaryDirectory(prefix="rinhac-serve-") as directory:
+            listener.bind(path)
+            listener.listen(128)
+            worker = _Worker(
+                listener, _CodeCache(options, cache), timeout, memory_limit, directory
+            )
+            for _ in range(workers):
+                pids.add(_start_worker(worker))
+            print(f"rinhac serve: listening on {path} ({workers} workers)", file=sys.stderr)
+            if ready is not None:
+                ready()
+            while True:
+                pid, _ = os.wait()
+                pids.discard(pid)
+                pids.add(_start_worker(worker))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        for pid in pids:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+        for pid in pids:
+            with contextlib.suppress(ChildProcessError):
+                os.waitpid(pid, 0)
+        listener.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+
+def serve_main(argv):
+    import argparse
+    from rinhac.__main__ import _add_build_arguments, _parse_args
+    from rinhac.client import DEFAULT_SOCKET
+
+    parser = argparse.ArgumentParser(
+        prog="rinhac serve",
+        description="Compile and run Rinha ASTs sent to a Unix socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help=f"Socket to listen on (default: $RINHAC_SOCKET or {DEFAULT_SOCKET}).",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of pre-forked worker processes (default: available cores).",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"Wall time limit of each program in seconds, 0 for none (default {DEFAULT_TIMEOUT:g}).",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=int,
+        default=DEFAULT_MEMORY_LIMIT,
+        help=(
+            "Address space limit of each program in MiB, 0 for none "
+            f"(default {DEFAULT_MEMORY_LIMIT})."
+        ),
+    )
+    _add_build_arguments(parser)
+    args = _parse_args(parser, argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be a positive number")
+    if args.timeout < 0 or args.memory_limit < 0:
+        parser.error("--timeout and --memory-limit must not be negative")
+
+    serve(
+        args.socket,
+        args.workers,
+        args.timeout,
+        args.memory_limit,
+        memoize=args.memoize,
+        memoize_cache_size=args.memoize_size,
+        constant_folding=not args.no_constant_folding,
+        show_stats=args.stats,
+        cache=not args.no_cache,
+        entry_function=args.entry_function,
+        peephole=not args.no_peephole,
+        disabled_rewrites=args.no_rewrite,
+        deep_recursion=args.deep_recursion,
+        codegen=args.codegen,
+    )
@@ -0,0 +1,177 @@
+import contextlib
+import glob
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import socket
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import rinhac.__main__ as rinhac_main
+from rinhac.client import AST, EXIT, NAME, STDOUT, recv_frame, request, send_frame
+from rinhac.server import TIMEOUT_STATUS
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+_repository_dir = os.path.dirname(_current_dir)
+COMPILER_TEST_DATA = os.path.join(_current_dir, "test_data", "compiler")
+SERVER_TEST_DATA = os.path.join(_current_dir, "test_data", "server")
+IF_ELSE_TEST_JSON = os.path.join(COMPILER_TEST_DATA, "if_else_test.json")
+CLOSURES_TEST_JSON = os.path.join(COMPILER_TEST_DATA, "closures_test.json")
+LOOP_TEST_JSON = os.path.join(SERVER_TEST_DATA, "loop_test.json")
+GROW_TEST_JSON = os.path.join(SERVER_TEST_DATA, "grow_test.json")
+
+TIMEOUT = 1.0
+
+
+class TestServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls.directory = cls._directory.name
+        cls.socket = os.path.join(cls.directory, "rinhac.sock")
+        cls.tmpdir = os.path.join(cls.directory, "tmp")
+        os.mkdir(cls.tmpdir)
+        environ = dict(
+            os.environ,
+            RINHAC_CACHE_DIR=os.path.join(cls.directory, "cache"),
+            PYTHONPATH=_repository_dir,
+            TMPDIR=cls.tmpdir,
+        )
+        cls.server = subprocess.Popen(
+            [
+                sys.executable, "-m", "rinhac", "serve",
+                "--socket", cls.socket,
+                "--workers", "2",
+                "--timeout", str(TIMEOUT),
+                "--memory-limit", "512",
+            ],
+            env=environ,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        # The server reports on stderr once the workers accept.
+        cls.server.stderr.readline()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+        cls.server.stderr.close()
+        cls._directory.cleanup()
+
+    def _request(self, ast_file, **options) -> tuple[int, str, str]:
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        status = request(ast_file, self.socket, stdout=stdout, stderr=stderr, **options)
+        return status, stdout.getvalue().decode(), stderr.getvalue().decode()
+
+    def test_run(self):
+        expected = subprocess.run(
+            [sys.executable, "-m", "rinhac", "run", CLOSURES_TEST_JSON, "--no-pyc", "--no-cache"],
+            cwd=_repository_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+        # The second request of each worker comes from its in-memory cache.
+        for _ in range(4):
+            self.assertEqual(self._request(CLOSURES_TEST_JSON), (0, expected, ""))
+
+    def test_payload(self):
+        ast_file = os.path.join(self.directory, "source.rinha.json")
+        shutil.copy(IF_ELSE_TEST_JSON, ast_file)
+
+        self.assertEqual(self._request(ast_file, payload=True), (0, "if_else_fn.rinha\n", ""))
+
+    def _send_payload(self, name: str, ast_data: bytes) -> tuple[int, str]:
+        stdout = []
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(self.socket)
+            send_frame(connection, NAME, name.encode())
+            send_frame(connection, AST, ast_data)
+            while True:
+                kind, data = recv_frame(connection)
+                if kind == EXIT:
+                    return int(data), "".join(stdout)
+                if kind == STDOUT:
+                    stdout.append(data.decode())
+
+    def test_concurrent_payloads(self):
+        # Sources the server cannot find, so locations map against the
+        # payloads themselves, all sent under the same missing name.
+        payloads = {}
+        for json_path in (IF_ELSE_TEST_JSON, CLOSURES_TEST_JSON):
+            with open(json_path, "rb") as f:
+                ast_data = f.read().replace(b"/test_data/", b"/missing/")
+            payloads[ast_data] = self._request(json_path)[1]
+        # Trailing spaces keep every request out of the code caches.
+        requests = [ast_data + b" " * index for index, ast_data in enumerate(list(payloads) * 8)]
+        with ThreadPoolExecutor(len(requests)) as executor:
+            results = list(
+                executor.map(
+                    lambda ast_data: self._send_payload("/missing/source.rinha.json", ast_data),
+                    requests,
+                )
+            )
+
+        self.assertEqual(results, [(0, payloads[ast_data.rstrip()]) for ast_data in requests])
+        # Every request removes the file its payload was written to.
+        self.assertEqual(glob.glob(os.path.join(self.tmpdir, "rinhac-serve-*", "*")), [])
+
+    def test_invalid_ast(self):
+        ast_file = os.path.join(self.directory, "invalid.json")
+        with open(ast_file, "w") as f:
+            f.write("{")
+
+        status, stdout, stderr = self._request(ast_file)
+
+        self.assertEqual((status, stdout), (1, ""))
+        self.assertIn("File is not a valid JSON", stderr)
+
+    def test_timeout(self):
+        start = time.perf_counter()
+        status, _, stderr = self._request(LOOP_TEST_JSON)
+
+        self.assertEqual(status, TIMEOUT_STATUS)
+        self.assertIn("timed out", stderr)
+        self.assertLess(time.perf_counter() - start, TIMEOUT + 1)
+        self.assertEqual(self._request(IF_ELSE_TEST_JSON)[0], 0)
+
+    def test_memory_limit(self):
+        status, _, stderr = self._request(GROW_TEST_JSON)
+
+        self.assertEqual(status, 1)
+        self.assertIn("MemoryError", stderr)
+        self.assertEqual(self._request(IF_ELSE_TEST_JSON)[0], 0)
+
+    def test_client_cli(self):
+        for command in (["rinhac", "client"], ["rinhac.client"]):
+            process = subprocess.run(
+                [sys.executable, "-m", *command, IF_ELSE_TEST_JSON],
+                cwd=_repository_dir,
+                env=dict(os.environ, RINHAC_SOCKET=self.socket),
+                capture_output=True,
+                text=True,
+            )
+
+            self.assertEqual((process.returncode, process.stdout), (0, "if_else_fn.rinha\n"))
+
+
+class TestClientFallback(unittest.TestCase):
+    def test_runs_locally_without_server(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(
+            os.environ, {"RINHAC_CACHE_DIR": directory}
+        ):
+            ast_file = os.path.join(directory, "source.rinha.json")
+            shutil.copy(IF_ELSE_TEST_JSON, ast_file)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                rinhac_main.main(
+                    ["client", ast_file, "--socket", os.path.join(directory, "missing.sock")]
+                )
+
+        self.assertEqual(output.getvalue(), "if_else_fn.rinha\n")
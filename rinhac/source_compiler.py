@@ -0,0 +1,494 @@
+"""Second code generator: Rinha AST to Python source, assembled by CPython.
+
+``SourceCompiler`` writes the program as Python source, ``let`` chains as
+assignments and functions as nested ``def``s, and hands it to the builtin
+``compile``. Its programs behave as those of ``Compiler``: additions are
+specialized from the same inferred types, tail self-calls become loops,
+pure functions can be memoized and the same runtime helpers do ``+`` and
+``print``, copied into the source.
+
+The writers are generators run from an explicit stack, as the passes
+over the AST are, so deep programs do not hit the recursion limit, and
+deeply nested expressions are cut up with temporaries, as CPython's parser
+does not take them whole. Line numbers of the code objects are those of
+the source ``to_source`` returns.
+"""
+import inspect
+import json
+import keyword
+from collections import Counter
+from dataclasses import dataclass
+from functools import cache
+from types import CodeType
+from typing import Iterable, Optional
+from rinhac import runtime
+from rinhac.ast import (
+    BinaryOp,
+    Var,
+    Function,
+    Call,
+    Let,
+    Str,
+    Int,
+    Binary,
+    Bool,
+    If,
+    Tuple,
+    First,
+    Second,
+    Print,
+    File,
+)
+from rinhac.backend import backend_for
+from rinhac.compiler import (
+    ADD_HELPER_NAME,
+    DEFAULT_MEMOIZE_CACHE_SIZE,
+    DIVISION_HELPER_NAMES,
+    Compiler,
+    TailCallTarget,
+    add_kind,
+)
+from rinhac.optimizer.type_inference import TypeInference
+from rinhac.runtime import FLUSH_NAME, OUTPUT_NAME, PRINT_HELPER_NAME
+from rinhac.symbol_table import SymbolTable
+
+_OPERATORS = {
+    BinaryOp.Sub: "-",
+    BinaryOp.Mul: "*",
+    BinaryOp.Eq: "==",
+    BinaryOp.Neq: "!=",
+    BinaryOp.Lt: "<",
+    BinaryOp.Gt: ">",
+    BinaryOp.Lte: "<=",
+    BinaryOp.Gte: ">=",
+    BinaryOp.And: "and",
+    BinaryOp.Or: "or",
+}
+
+# Globals of the generated module besides those of the runtime helpers.
+ENTRY_FUNCTION_NAME = "__rinha_main__"
+LRU_CACHE_NAME = "__rinha_lru_cache__"
+_OPEN_OUTPUT_NAME = "__rinha_open_output__"
+_RUN_DEEP_NAME = "__rinha_run_deep__"
+# ``rinhac.runtime`` helpers of the operators no Python operator matches.
+_DIVISION_HELPERS = {BinaryOp.Div: "rinha_div", BinaryOp.Rem: "rinha_rem"}
+
+# Levels of expression nesting between temporaries. Each adds at most two
+# brackets and the parser takes up to 200.
+_SPILL_DEPTH = 50
+
+
+@cache
+def _helper_source(name: str, global_name: str) -> list[str]:
+    """Lines of the ``rinhac.runtime`` function ``name``, defined as ``global_name``."""
+    lines = inspect.getsource(getattr(runtime, name)).splitlines()
+    lines[0] = lines[0].replace(f"def {name}(", f"def {global_name}(", 1)
+    return lines
+
+
+def _run(task):
+    """Run the writer generator ``task`` and return its value.
+
+    A writer yields the generator of each nested term and is sent back its
+    value, so the nesting lives in ``pending`` instead of the call stack.
+    """
+    pending = [task]
+    value, error = None, None
+    while pending:
+        try:
+            nested = pending[-1].send(value) if error is None else pending[-1].throw(error)
+        except StopIteration as stop:
+            pending.pop()
+            value, error = stop.value, None
+        except Exception as exception:
+            pending.pop()
+            value, error = None, exception
+        else:
+            pending.append(nested)
+            value = None
+    if error is not None:
+        raise error
+    return value
+
+
+def _python_name(name: str) -> str:
+    """Rinha names that are Python keywords get a prefix no Rinha name uses."""
+    return f"__rinha_{name}" if keyword.iskeyword(name) else name
+
+
+def _fstring_literal(text: str) -> str:
+    # JSON escapes are valid in Python strings; braces are doubled for the
+    # f-string.
+    return json.dumps(text, ensure_ascii=False)[1:-1].replace("{", "{{").replace("}", "}}")
+
+
+@dataclass(slots=True)
+class _Scope:
+    """Function, or module, whose body is being written."""
+
+    symbol_table: SymbolTable
+    function: bool
+    # Function whose tail self-calls loop; there is no entry label.
+    tail_call: Optional[TailCallTarget] = None
+    # Whether such a call was written, so the body needs the loop.
+    loops: bool = False
+
+
+class SourceCompiler:
+    def __init__(
+        self,
+        tail_calls: bool = True,
+        memoized_functions: Iterable[Function] = (),
+        memoize_cache_size: int = DEFAULT_MEMOIZE_CACHE_SIZE,
+        types: Optional[TypeInference] = None,
+        deep_recursion: Optional[tuple[int, int]] = None,
+    ):
+        self.tail_calls = tail_calls
+        if deep_recursion is not None and backend_for().fixed_c_recursion_limit:
+            # As in ``Compiler``: ``lru_cache`` would cap the recursion.
+            memoized_functions = ()
+        self.memoized_functions = {id(function) for function in memoized_functions}
+        self.memoize_cache_size = memoize_cache_size
+        self.types = types
+        self.deep_recursion = deep_recursion
+        self.add_stats: Counter = Counter()
+        self.print_count = 0
+        self.division_stats: Counter = Counter()
+        # Lines written so far, as (indentation level, text).
+        self._lines: list[tuple[int, str]] = []
+        self._level = 0
+        self._temporaries = 0
+        # Levels of expressions being written around the current one.
+        self._depth = 0
+        self._uses_memoize = False
+
+    @property
+    def specialized_add_count(self) -> int:
+        return sum(self.add_stats.values()) - self.add_stats["generic"]
+
+    def to_code(self, term: File, symbol_table: SymbolTable) -> CodeType:
+        source = self.to_source(term, symbol_table)
+        return compile(source, term.locations.filename(term.location), "exec", dont_inherit=True)
+
+    def to_source(self, term: File, symbol_table: SymbolTable) -> str:
+        """Python source of the module running ``term``."""
+        self._lines = []
+        self._level = 0
+        self._depth = 0
+        generic_adds = self.add_stats["generic"]
+        print_count = self.print_count
+        division_stats = self.division_stats.copy()
+        self._uses_memoize = False
+
+        entry_symbol_table = symbol_table.entry_context()
+        if self.deep_recursion is not None and entry_symbol_table is None:
+            raise ValueError("deep recursion needs a symbol table with an entry function")
+        if entry_symbol_table is None:
+            _run(self._write_tail(term.expression, _Scope(symbol_table, function=False)))
+        else:
+            self._emit(f"def {ENTRY_FUNCTION_NAME}():")
+            self._level += 1
+            _run(self._write_tail(term.expression, _Scope(entry_symbol_table, function=True)))
+            self._level -= 1
+            if self.deep_recursion is None:
+                self._emit(f"{ENTRY_FUNCTION_NAME}()")
+            else:
+                stack_size, recursion_limit = self.deep_recursion
+                self._emit(f"{_RUN_DEEP_NAME}({ENTRY_FUNCTION_NAME}, {stack_size}, {recursion_limit})")
+                self._emit(f"del {_RUN_DEEP_NAME}")
+
+        prints = self.print_count > print_count
+        if prints:
+            self._emit(f"{FLUSH_NAME}()")
+        prologue = []
+        if self.add_stats["generic"] > generic_adds:
+            prologue.extend(_helper_source("rinha_add", ADD_HELPER_NAME))
+        for op, helper_name in DIVISION_HELPER_NAMES.items():
+            if self.division_stats[op.value] > division_stats[op.value]:
+                prologue.extend(_helper_source(_DIVISION_HELPERS[op], helper_name))
+        if prints:
+            prologue.extend(_helper_source("rinha_open_output", _OPEN_OUTPUT_NAME))
+            prologue.append(f"{OUTPUT_NAME}, {FLUSH_NAME} = {_OPEN_OUTPUT_NAME}()")
+            prologue.append(f"del {_OPEN_OUTPUT_NAME}")
+            prologue.extend(_helper_source("rinha_print", PRINT_HELPER_NAME))
+        if self._uses_memoize:
+            prologue.append(f"from functools import lru_cache as {LRU_CACHE_NAME}")
+        if self.deep_recursion is not None:
+            prologue.extend(_helper_source("rinha_run_deep", _RUN_DEEP_NAME))
+        body = ["    " * level + text for level, text in self._lines]
+        return "\n".join(prologue + body) + "\n"
+
+    def _emit(self, text: str):
+        self._lines.append((self._level, text))
+
+    def _temporary(self) -> str:
+        self._temporaries += 1
+        return f"__rinha_t{self._temporaries}"
+
+    def _capture(self, term, scope: _Scope):
+        """Expression of ``term`` and the lines it needs, which are not written."""
+        lines = self._lines
+        self._lines = []
+        try:
+            expression = yield self._expression(term, scope)
+            return self._lines, expression
+        finally:
+            self._lines = lines
+
+    def _emit_captured(self, lines: list[tuple[int, str]], shift: int):
+        self._lines.extend((level + shift, text) for level, text in lines)
+
+    def _write_tail(self, term, scope: _Scope):
+        """Write ``term`` as the rest of ``scope``'s body: its result is returned."""
+        while isinstance(term, Let):
+            yield self._write_let(term, scope)
+            term = term.next_term
+
+        if isinstance(term, If):
+            level = self._level
+            keyword_ = "if"
+            while isinstance(term, If):
+                lines, condition = yield self._capture(term.condition, scope)
+                if lines and keyword_ == "elif":
+                    # The condition needs statements: they go in the else.
+                    self._emit("else:")
+                    self._level += 1
+                    keyword_ = "if"
+                self._emit_captured(lines, 0)
+                self._emit(f"{keyword_} {condition}:")
+                self._level += 1
+                yield self._write_tail(term.then, scope)
+                self._level -= 1
+                keyword_ = "elif"
+                term = term.otherwise
+            self._emit("else:")
+            self._level += 1
+            yield self._write_tail(term, scope)
+            self._level = level
+            return
+
+        if (
+            isinstance(term, Call)
+            and scope.tail_call is not None
+            and Compiler._is_tail_call(term, scope.tail_call, scope.symbol_table)
+        ):
+            yield self._write_tail_call(term, scope)
+            self._emit("continue")
+            scope.loops = True
+            return
+
+        expression = yield self._expression(term, scope)
+        self._emit(f"return {expression}" if scope.function else expression)
+
+    def _write_tail_call(self, term: Call, scope: _Scope):
+        """Rebind the parameters to the arguments of a tail self-call."""
+        arguments = yield self._operands(term.arguments, scope)
+        # Parameters passed on unchanged are left alone.
+        stores = [
+            (parameter, argument)
+            for parameter, argument in zip(scope.tail_call.parameters, arguments)
+            if parameter != argument
+        ]
+        if not stores:
+            return
+        last = term.arguments[-1]
+        str_add = (
+            isinstance(last, Binary)
+            and last.op == BinaryOp.Add
+            and add_kind(self.types, last) == "str"
+            and stores[-1][0] == scope.tail_call.parameters[-1]
+        )
+        if str_add and len(stores) > 1:
+            # Stored on its own right after the ``+``, CPython appends to the
+            # string in place; the other arguments wait in temporaries.
+            *others, (parameter, argument) = stores
+            temporaries = [self._temporary() for _ in others]
+            self._emit(f"{', '.join(temporaries)} = {', '.join(value for _, value in others)}")
+            self._emit(f"{parameter} = {argument}")
+            self._emit(f"{', '.join(name for name, _ in others)} = {', '.join(temporaries)}")
+            return
+        names, values = zip(*stores)
+        self._emit(f"{', '.join(names)} = {', '.join(values)}")
+
+    def _write_let(self, term: Let, scope: _Scope):
+        name = _python_name(scope.symbol_table.variable(term))
+        if isinstance(term.value, Function):
+            yield self._write_function(term.value, name, term.name.text, scope)
+        else:
+            value = yield self._expression(term.value, scope)
+            self._emit(f"{name} = {value}")
+
+    def _write_function(self, function: Function, name: str, rinha_name: str, scope: _Scope):
+        function_symbol_table = scope.symbol_table.context_for(function)
+        parameters = [
+            _python_name(function_symbol_table.variable(param)) for param in function.parameters
+        ]
+        if id(function) in self.memoized_functions:
+            self._uses_memoize = True
+            self._emit(f"@{LRU_CACHE_NAME}(maxsize={self.memoize_cache_size}, typed=True)")
+        self._emit(f"def {name}({', '.join(parameters)}):")
+        function_scope = _Scope(function_symbol_table, function=True)
+        if self.tail_calls and Compiler._can_eliminate_tail_calls(function_symbol_table):
+            function_scope.tail_call = TailCallTarget(rinha_name, parameters, None)
+        # The body's expressions nest from the start of its statements.
+        lines, depth = self._lines, self._depth
+        self._lines, self._depth = [], 0
+        self._level += 1
+        try:
+            yield self._write_tail(function.value, function_scope)
+        finally:
+            body, self._lines, self._depth = self._lines, lines, depth
+            self._level -= 1
+        if function_scope.loops:
+            self._lines.append((self._level + 1, "while True:"))
+        self._emit_captured(body, 1 if function_scope.loops else 0)
+
+    def _operands(self, terms: list, scope: _Scope):
+        """Expressions of ``terms``, still evaluated from left to right.
+
+        An operand's statements run before its expression; the operands on
+        its left are first stored in temporaries so they are not evaluated
+        after those statements.
+        """
+        expressions = []
+        ends = []
+        for term in terms:
+            expressions.append((yield self._expression(term, scope)))
+            ends.append(len(self._lines))
+        for index in reversed(range(len(terms) - 1)):
+            if ends[index] == ends[-1] or isinstance(terms[index], (Int, Str, Bool, Function)):
+                continue
+            temporary = self._temporary()
+            self._lines.insert(ends[index], (self._level, f"{temporary} = {expressions[index]}"))
+            expressions[index] = temporary
+        return expressions
+
+    def _expression(self, term, scope: _Scope):
+        """Python expression of ``term``, writing the statements it needs first.
+
+        Every ``_SPILL_DEPTH`` levels of nesting the value is stored in a
+        temporary, as CPython's parser rejects deeply nested parentheses.
+        """
+        self._depth += 1
+        try:
+            expression = yield self._nested_expression(term, scope)
+        finally:
+            self._depth -= 1
+        if (self._depth + 1) % _SPILL_DEPTH or isinstance(term, (Int, Str, Bool, Var)):
+            return expression
+        temporary = self._temporary()
+        self._emit(f"{temporary} = {expression}")
+        return temporary
+
+    def _nested_expression(self, term, scope: _Scope):
+        while isinstance(term, Let):
+            yield self._write_let(term, scope)
+            term = term.next_term
+
+        if isinstance(term, (Int, Str, Bool)):
+            text = repr(term.value)
+            return f"({text})" if text.startswith("-") else text
+
+        if isinstance(term, Var):
+            return _python_name(scope.symbol_table.variable(term))
+
+        if isinstance(term, Function):
+            self._temporaries += 1
+            name = f"__rinha_fn{self._temporaries}"
+            yield self._write_function(term, name, SymbolTable.anonymous_context_name, scope)
+            return name
+
+        if isinstance(term, Call):
+            callee, *arguments = yield self._operands([term.callee, *term.arguments], scope)
+            return f"{callee}({', '.join(arguments)})"
+
+        if isinstance(term, Print):
+            self.print_count += 1
+            value = yield self._expression(term.value, scope)
+            return f"{PRINT_HELPER_NAME}({value})"
+
+        if isinstance(term, Tuple):
+            first, second = yield self._operands([term.first, term.second], scope)
+            return f"({first}, {second})"
+
+        if isinstance(term, (First, Second)):
+            value = yield self._expression(term.value, scope)
+            return f"{value}[{0 if isinstance(term, First) else 1}]"
+
+        if isinstance(term, Binary) and term.op == BinaryOp.Add:
+            return (yield self._add(term, scope))
+
+        if isinstance(term, Binary) and term.op in (BinaryOp.And, BinaryOp.Or):
+            lhs = yield self._expression(term.lhs, scope)
+            lines, rhs = yield self._capture(term.rhs, scope)
+            if not lines:
+                return f"({lhs} {_OPERATORS[term.op]} {rhs})"
+            # The right-hand side only runs when the left one did not decide.
+            temporary = self._temporary()
+            self._emit(f"{temporary} = {lhs}")
+            self._emit(f"if {'' if term.op == BinaryOp.And else 'not '}{temporary}:")
+            self._emit_captured(lines, 1)
+            self._level += 1
+            self._emit(f"{temporary} = {rhs}")
+            self._level -= 1
+            return temporary
+
+        if isinstance(term, Binary) and term.op in DIVISION_HELPER_NAMES:
+            self.division_stats[term.op.value] += 1
+            lhs, rhs = yield self._operands([term.lhs, term.rhs], scope)
+            return f"{DIVISION_HELPER_NAMES[term.op]}({lhs}, {rhs})"
+
+        if isinstance(term, Binary):
+            lhs, rhs = yield self._operands([term.lhs, term.rhs], scope)
+            return f"({lhs} {_OPERATORS[term.op]} {rhs})"
+
+        if isinstance(term, If):
+            condition = yield self._expression(term.condition, scope)
+            then_lines, then = yield self._capture(term.then, scope)
+            otherwise_lines, otherwise = yield self._capture(term.otherwise, scope)
+            if not then_lines and not otherwise_lines:
+                return f"({then} if {condition} else {otherwise})"
+            temporary = self._temporary()
+            self._emit(f"if {condition}:")
+            self._emit_captured(then_lines, 1)
+            self._level += 1
+            self._emit(f"{temporary} = {then}")
+            self._level -= 1
+            self._emit("else:")
+            self._emit_captured(otherwise_lines, 1)
+            self._level += 1
+            self._emit(f"{temporary} = {otherwise}")
+            self._level -= 1
+            return temporary
+
+        raise TypeError(f"cannot compile {type(term).__name__}")
+
+    def _add(self, term: Binary, scope: _Scope):
+        """Rinha ``+`` with the cheapest expression its operand types allow."""
+        kind = add_kind(self.types, term)
+        self.add_stats[kind] += 1
+        lhs, rhs = yield self._operands([term.lhs, term.rhs], scope)
+        if kind == "int" or kind == "str":
+            return f"({lhs} + {rhs})"
+        if kind == "generic":
+            return f"{ADD_HELPER_NAME}({lhs}, {rhs})"
+
+        # Only the integer side needs formatting. String literals are written
+        # into the f-string; f-strings do not take expressions with quotes
+        # or backslashes, so if a side has some both are stored first.
+        operands = ((term.lhs, lhs), (term.rhs, rhs))
+        spill = any(
+            not isinstance(operand, Str) and any(char in expression for char in "'\"\\")
+            for operand, expression in operands
+        )
+        parts = []
+        for operand, expression in operands:
+            if isinstance(operand, Str):
+                parts.append(_fstring_literal(operand.value))
+                continue
+            if spill:
+                temporary = self._temporary()
+                self._emit(f"{temporary} = {expression}")
+                expression = temporary
+            parts.append(f"{{{expression}}}")
+        return f'f"{"".join(parts)}"'
@@ -0,0 +1,152 @@
+import contextlib
+import glob
+import io
+import os
+import sys
+import tempfile
+import unittest
+from bytecode import Bytecode
+from rinhac import Compiler
+from rinhac.ast.json_parser import load_ast
+from rinhac.optimizer import find_pure_functions, infer_types
+from rinhac.runtime import close_output
+from rinhac.source_compiler import SourceCompiler
+from rinhac.symbol_table import create_symbol_table
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+COMPILER_TEST_DATA = os.path.join(_current_dir, "test_data", "compiler")
+EVALUATION_ORDER_TEST_JSON = os.path.join(COMPILER_TEST_DATA, "evaluation_order_test.json")
+TAIL_CALL_TEST_JSON = os.path.join(COMPILER_TEST_DATA, "tail_call_test.json")
+CLOSURES_TEST_JSON = os.path.join(COMPILER_TEST_DATA, "closures_test.json")
+DEEP_RECURSION_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "runtime", "deep_recursion_test.json"
+)
+
+
+
+def _sum_chain_json(terms: int) -> str:
+    """``let x = 0; print(x + 1 + ... + 1)`` with ``terms`` additions."""
+    location = '"location": {"start": 0, "end": 0, "filename": "deep.rinha"}'
+    one = f'{{"kind": "Int", "value": 1, {location}}}'
+    expression = f'{{"kind": "Binary", "op": "Add", "lhs": ' * terms
+    expression += f'{{"kind": "Var", "text": "x", {location}}}'
+    expression += f', "rhs": {one}, {location}}}' * terms
+    return (
+        '{"name": "deep.rinha", "expression": '
+        f'{{"kind": "Let", "name": {{"text": "x", {location}}}, '
+        f'"value": {{"kind": "Int", "value": 0, {location}}}, '
+        f'"next": {{"kind": "Print", "value": {expression}, {location}}}, {location}}}, '
+        f"{location}}}"
+    )
+
+
+def _load(json_path):
+    with open(json_path, "rb") as f:
+        return load_ast(f, json_path)
+
+
+def _compile(compiler_class, json_path, memoize=False, entry_function=False, **options):
+    ast = _load(json_path)
+    symbol_table = create_symbol_table(ast, entry_function=entry_function)
+    if memoize:
+        options["memoized_functions"] = find_pure_functions(ast)
+    compiler = compiler_class(types=infer_types(ast), **options)
+    if compiler_class is Compiler:
+        return compiler.to_bytecode(ast, Bytecode(), symbol_table).to_code()
+    return compiler.to_code(ast, symbol_table)
+
+
+def _exec_output(code) -> tuple[str, dict]:
+    namespace = {"__name__": "__main__"}
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            exec(code, namespace)
+        finally:
+            close_output(namespace)
+    return output.getvalue(), namespace
+
+
+class TestSourceCompiler(unittest.TestCase):
+    def test_matches_bytecode_compiler(self):
+        for json_path in sorted(glob.glob(os.path.join(COMPILER_TEST_DATA, "*.json"))):
+            for memoize in (False, True):
+                for entry_function in (False, True):
+                    options = dict(memoize=memoize, entry_function=entry_function)
+                    with self.subTest(os.path.basename(json_path), **options):
+                        expected, _ = _exec_output(_compile(Compiler, json_path, **options))
+                        output, _ = _exec_output(_compile(SourceCompiler, json_path, **options))
+
+                        self.assertEqual(output, expected)
+
+    def test_evaluation_order(self):
+        output, _ = _exec_output(_compile(SourceCompiler, EVALUATION_ORDER_TEST_JSON))
+
+        self.assertEqual(
+            output.splitlines(),
+            [
+                "say a",
+                "say b",
+                "say asay b!",
+                "say lhs",
+                "say rhs",
+                "true",
+                "it's {7}",
+                "say first",
+                "say second",
+                "say second",
+            ],
+        )
+
+    def test_source(self):
+        ast = _load(CLOSURES_TEST_JSON)
+        source = SourceCompiler(types=infer_types(ast)).to_source(ast, create_symbol_table(ast))
+
+        # Functions are nested ``def``s and ``let``s plain assignments.
+        self.assertIn("\ndef captured_in_let_value(x):\n", source)
+        self.assertIn("\n    def doubled(", source)
+        self.assertIn("\n        value = (x * 2)\n", source)
+
+    def test_tail_calls(self):
+        _, namespace = _exec_output(_compile(SourceCompiler, TAIL_CALL_TEST_JSON))
+
+        self.assertEqual(namespace["sum"](100000, 0), 5000050000)
+        self.assertEqual(namespace["count_down"](100000), "done")
+        self.assertEqual(namespace["fib"](10), 55)
+
+        _, namespace = _exec_output(
+            _compile(SourceCompiler, TAIL_CALL_TEST_JSON, tail_calls=False)
+        )
+        with self.assertRaises(RecursionError):
+            namespace["sum"](100000, 0)
+
+    def test_deep_recursion(self):
+        code = _compile(
+            SourceCompiler, DEEP_RECURSION_TEST_JSON, entry_function=True, deep_recursion=(0, 0)
+        )
+        output, _ = _exec_output(code)
+
+        self.assertEqual(output, "100000\n100000\n")
+
+    def _deep_output(self, terms: int) -> tuple[str, str]:
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "deep.json")
+            with open(json_path, "w") as f:
+                f.write(_sum_chain_json(terms))
+            expected, _ = _exec_output(_compile(Compiler, json_path))
+            output, _ = _exec_output(_compile(SourceCompiler, json_path))
+        return output, expected
+
+    def test_deep_expression(self):
+        # Past CPython's limit of 200 nested parentheses.
+        output, expected = self._deep_output(250)
+
+        self.assertEqual(output, "250\n")
+        self.assertEqual(output, expected)
+
+    def test_expression_deeper_than_recursion_limit(self):
+        terms = sys.getrecursionlimit() * 2
+        output, expected = self._deep_output(terms)
+
+        self.assertEqual(output, f"{terms}\n")
+        self.assertEqual(output, expected)
@@ -0,0 +1,88 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from rinhac.utils.startup_profile import parse_import_time
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+_repository_dir = os.path.dirname(_current_dir)
+IF_ELSE_TEST_JSON = os.path.join(
+    _current_dir, "test_data", "compiler", "if_else_test.json"
+)
+
+# Modules only the compiling path needs; a cached ``run`` must not load them.
+COMPILE_ONLY_MODULES = {
+    "argparse",
+    "bytecode",
+    "dataclasses",
+    "json",
+    "typing",
+    "rinhac.ast",
+    "rinhac.compiler",
+    "rinhac.optimizer",
+    "rinhac.symbol_table",
+}
+
+# Extra wall time a cached ``rinhac run`` may take over a bare interpreter.
+STARTUP_BUDGET_MS = float(os.environ.get("RINHAC_STARTUP_BUDGET_MS", 60))
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        directory = self._directory.name
+        self.json_path = os.path.join(directory, "source.rinha.json")
+        shutil.copy(IF_ELSE_TEST_JSON, self.json_path)
+        self.environ = dict(
+            os.environ,
+            RINHAC_CACHE_DIR=os.path.join(directory, "cache"),
+            PYTHONPATH=_repository_dir,
+        )
+        self._python("-m", "rinhac", "run", self.json_path)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _python(self, *args) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, *args],
+            env=self.environ,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    def _best_time(self, *args, repeat: int = 7) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self._python(*args)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def test_cached_run_imports(self):
+        process = self._python("-X", "importtime", "-m", "rinhac", "run", self.json_path)
+        modules = {record.module for record in parse_import_time(process.stderr.splitlines())}
+
+        self.assertEqual(process.stdout, "if_else_fn.rinha\n")
+        self.assertIn("rinhac.utils.compile_cache", modules)
+        self.assertEqual(modules & COMPILE_ONLY_MODULES, set())
+
+    def test_cold_start_time(self):
+        baseline = self._best_time("-c", "pass")
+        cached_run = self._best_time("-m", "rinhac", "run", self.json_path)
+
+        self.assertLess((cached_run - baseline) * 1e3, STARTUP_BUDGET_MS)
+
+    def test_startup_profile(self):
+        process = self._python("-m", "rinhac", "--startup-profile", "run", self.json_path)
+
+        self.assertEqual(process.stdout, "if_else_fn.rinha\n")
+        self.assertIn("startup profile:", process.stderr)
+        # The package's modules are too quick to be sure of a place in the
+        # top modules, but the per-package totals have them.
+        self.assertRegex(process.stderr, r"by package:.* rinhac \d")
+        self.assertNotIn("import time:", process.stderr)
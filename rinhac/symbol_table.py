@@ -5,7 +5,13 @@ from rinhac.ast import (
     Function,
     Call,
     Let,
+    Parameter,
     Binary,
+    If,
+    Tuple,
+    First,
+    Second,
+    Print,
     File,
 )
 
@@ -19,95 +25,318 @@ class Symbol:
     referenced_count: int = 0
 
 
+@dataclass(slots=True)
+class _Declare:
+    """Walk step that declares a let binding once its value has been seen."""
+
+    let: Let
+
+
+@dataclass(slots=True)
+class _FunctionBody:
+    """Walk step that declares a function's parameters and visits its body."""
+
+    function: Function
+
+
 class SymbolTable:
+    """Symbols of one scope: the module or a single function.
+
+    ``create_symbol_table`` resolves every name once. Afterwards each table
+    knows the cell variables it owns, the free variables it receives from
+    enclosing functions and the load type of every name used in its scope,
+    so code generation only reads them.
+
+    Each binding is a variable of its own. A ``let`` shadowing a name of the
+    same scope stores to a new variable, so closures created before it keep
+    seeing the earlier value; ``variable`` names the one a term uses.
+    """
+
     module_context_name = "<rinha:module>"
+    entry_context_name = "<rinha:main>"
+    anonymous_context_name = "<rinha:fn>"
+
     def __init__(self, context_name: str = None, parent: "SymbolTable" = None):
         self.context_name = context_name or self.module_context_name
+        # Symbols by variable name; ``_names`` maps each Rinha name to the
+        # variable it is bound to at the current point of the walk.
         self._context_symbols: Dict[str, Symbol] = {}
+        self._names: Dict[str, str] = {}
+        # Variables of the terms of this scope whose name is not the Rinha one.
+        self._term_variables: Dict[int, str] = {}
         self.parent: SymbolTable = parent
         self._tables: Dict[str, SymbolTable] = {}
+        self._function_tables: Dict[int, SymbolTable] = {}
+        self._children: list[SymbolTable] = []
+        # Dicts used as ordered sets, so the code object layout is stable.
+        self._cellvars: Dict[str, None] = {}
+        self._freevars: Dict[str, None] = {}
+        self._load_types: Dict[str, str] = {}
+        # Scope that declared each variable used here, or None when it was
+        # used before its declaration was seen.
+        self._owners: Dict[str, Optional[SymbolTable]] = {}
+
+    @property
+    def is_module(self) -> bool:
+        return self.parent is None
+
+    @property
+    def cellvars(self) -> list[str]:
+        return list(self._cellvars)
+
+    @property
+    def freevars(self) -> list[str]:
+        return list(self._freevars)
+
+    def is_cellvar(self, symbol_name: str) -> bool:
+        return symbol_name in self._cellvars
 
     def get_context(self, context_name: str) -> Optional["SymbolTable"]:
         return self._tables.get(context_name)
 
-    def lookup(self, symbol_name: str) -> Symbol | None:
-        symbol = self._context_symbols.get(symbol_name)
-        if symbol:
-            return symbol
+    def context_for(self, function: Function) -> Optional["SymbolTable"]:
+        return self._function_tables.get(id(function))
+
+    def entry_context(self) -> Optional["SymbolTable"]:
+        """Scope of the synthetic entry function, if the program has one."""
+        return self._tables.get(self.entry_context_name)
+
+    def declare_entry(self) -> "SymbolTable":
+        """Table for a function wrapping the whole program.
+
+        Top-level bindings then live in its fast locals, or in cells when a
+        function captures them, instead of the module globals.
+        """
+        table = self._new_context(self.entry_context_name, None)
+        self._tables[self.entry_context_name] = table
+        return table
+
+    def variable(self, term: Var | Let | Parameter) -> str:
+        """Variable that ``term`` loads, or stores, in this scope."""
+        variable = self._term_variables.get(id(term))
+        if variable is not None:
+            return variable
+        return term.name.text if isinstance(term, Let) else term.text
+
+    def symbols(self) -> list[Symbol]:
+        return list(self._context_symbols.values())
 
-        if symbol_name == self.context_name:  # Special case, load recursive function
-            return Symbol(symbol_name, "Function", "GLOBAL", self.context_name)
+    def is_recursive_reference(self, symbol_name: str) -> bool:
+        return (
+            symbol_name == self.context_name
+            and symbol_name not in self._names
+        )
 
-        if self.parent:
-            return self.parent.lookup(symbol_name)
+    def _resolve(self, symbol_name: str):
+        table = self
+        while table is not None:
+            variable = table._names.get(symbol_name)
+            if variable is not None:
+                return table._context_symbols[variable], table
+            table = table.parent
+        return None, None
 
-        return None
+    def _resolve_variable(self, variable: str):
+        table = self
+        while table is not None:
+            symbol = table._context_symbols.get(variable)
+            if symbol:
+                return symbol, table
+            table = table.parent
+        return None, None
+
+    def _is_taken(self, variable: str) -> bool:
+        return (
+            variable in self._context_symbols
+            or variable in self._owners
+            or variable in self._freevars
+        )
+
+    def lookup(self, symbol_name: str) -> Symbol | None:
+        return self._resolve(symbol_name)[0]
+
+    def _new_context(self, context_name: str, function: Optional[Function]) -> "SymbolTable":
+        table = SymbolTable(context_name, self)
+        self._children.append(table)
+        if function is not None:
+            self._function_tables[id(function)] = table
+        return table
 
     def declare(
         self,
         symbol_name: str,
         symbol_type: Literal["Var", "Function"],
-        load_type: Literal["GLOBAL", "NAME", "FAST", "DREF"] = "FAST",
-    ):
-        if symbol_name in self._context_symbols:
-            raise Exception(f"Symbol {symbol_name} already declared!")
+        load_type: Literal["GLOBAL", "NAME", "FAST", "DEREF"] = "FAST",
+        function: Optional[Function] = None,
+    ) -> str:
+        """Declare ``symbol_name`` in this scope and return its variable.
+
+        The variable is named after ``symbol_name`` unless the scope already
+        uses that name, as when a ``let`` shadows an earlier one. Functions
+        get their own table, registered under the variable and, when given,
+        under the ``function`` term itself.
+        """
+        variable = symbol_name
+        count = 0
+        while self._is_taken(variable):
+            count += 1
+            variable = f"__rinha_{symbol_name}_{count}"
 
-        symbol = Symbol(symbol_name, symbol_type, load_type, self.context_name)
-        if self.context_name == "<rinha:module>":
+        symbol = Symbol(variable, symbol_type, load_type, self.context_name)
+        if self.is_module:
             symbol.load_type = "NAME"
+        self._context_symbols[variable] = symbol
+        self._names[symbol_name] = variable
 
-        self._context_symbols[symbol_name] = symbol
         if symbol_type == "Function":
-            self._tables[symbol_name] = SymbolTable(symbol_name, self)
+            self._tables[variable] = self._new_context(symbol_name, function)
+        return variable
 
-    def reference(self, symbol_name: str):
-        symbol = self.lookup(symbol_name)
-        if symbol:
-            symbol.referenced_count += 1
-            if symbol.context_name == self.context_name:
-                return
-            if symbol.context_name == "<rinha:module>":
-                symbol.load_type = "NAME"
-                return
-                
-            symbol.load_type = "DEREF"
+    def declare_anonymous(self, function: Function) -> "SymbolTable":
+        """Table for a function literal that is not bound by a ``let``."""
+        return self._new_context(self.anonymous_context_name, function)
+
+    def reference(self, symbol_name: str) -> tuple[str, Optional["SymbolTable"]]:
+        """Variable ``symbol_name`` is bound to here, and the scope owning it."""
+        symbol, owner = self._resolve(symbol_name)
+        if symbol is None:
+            return symbol_name, None
+        symbol.referenced_count += 1
+        if owner is self or owner.is_module:
+            return symbol.name, owner
+
+        # Captured from an enclosing function: it lives in a cell of the
+        # owner and every function in between passes it down as a free var.
+        symbol.load_type = "DEREF"
+        owner._cellvars[symbol.name] = None
+        table = self
+        while table is not owner:
+            table._freevars[symbol.name] = None
+            table = table.parent
+        return symbol.name, owner
+
+    def load_type(self, symbol_name: str) -> Literal["GLOBAL", "NAME", "FAST", "DEREF"]:
+        """How code in this scope loads and stores ``symbol_name``."""
+        load_type = self._load_types.get(symbol_name)
+        if load_type is None:
+            load_type = self._resolve_load_type(symbol_name)
+        return load_type
+
+    def _resolve_load_type(self, variable: str) -> str:
+        owner = self._owners.get(variable)
+        if owner is None:
+            symbol, owner = self._resolve_variable(variable)
+        else:
+            symbol = owner._context_symbols[variable]
+        if owner is self:
+            return symbol.load_type
+        if symbol is None or owner.is_module:
+            # Module bindings are globals; unknown names are looked up there
+            # too, so functions declared later at the top level still resolve.
+            return "NAME" if self.is_module else "GLOBAL"
+        return "DEREF"
+
+    def finalize(self):
+        """Fix the load type of every name used in each scope of the tree."""
+        pending = [self]
+        while pending:
+            table = pending.pop()
+            for variable in table._owners:
+                table._load_types[variable] = table._resolve_load_type(variable)
+            pending.extend(table._children)
+
+    def _use(
+        self, term: Var | Let | Parameter, variable: str, owner: Optional["SymbolTable"]
+    ):
+        if variable != (term.name.text if isinstance(term, Let) else term.text):
+            self._term_variables[id(term)] = variable
+        if self._owners.get(variable) is None:
+            self._owners[variable] = owner
 
 
 def print_symbol_table(table: SymbolTable, depth: int = 0):
-    prefix = "│   " * (depth - 1) + "├─ " if depth > 0 else ""
-    for symbol in table._context_symbols.values():
+    pending = [(symbol, table, depth) for symbol in reversed(table.symbols())]
+    while pending:
+        symbol, table, depth = pending.pop()
+        prefix = "│   " * (depth - 1) + "├─ " if depth > 0 else ""
         print(f"{prefix} {symbol.symbol_type} {symbol.name} {symbol.load_type}")
         if symbol.symbol_type == "Function":
-            print_symbol_table(table.get_context(symbol.name), depth + 1)
+            context = table.get_context(symbol.name)
+            pending.extend(
+                (child, context, depth + 1) for child in reversed(context.symbols())
+            )
+
+
+def create_symbol_table(term, table: SymbolTable = None, entry_function: bool = False):
+    """Declare and reference symbols in source order using an explicit stack.
+
+    Every term kind is visited, so names used in let values, conditions,
+    tuples and prints are resolved like any other. Once the walk is done the
+    load types of all scopes are fixed with ``SymbolTable.finalize``.
+
+    With ``entry_function`` the program body is resolved in the scope of a
+    synthetic function (see ``SymbolTable.declare_entry``), which the
+    compiler then emits and calls from the module code.
+    """
+    root = table
+    pending = [(term, table)]
+    while pending:
+        term, table = pending.pop()
+
+        if isinstance(term, File):
+            root = table = SymbolTable()
+            if entry_function:
+                table = root.declare_entry()
+            pending.append((term.expression, table))
+
+        elif isinstance(term, Let):
+            pending.append((term.next_term, table))
+            pending.append((_Declare(term), table))
+            if not isinstance(term.value, Function):
+                pending.append((term.value, table))
+
+        elif isinstance(term, _Declare):
+            let = term.let
+            if isinstance(let.value, Function):
+                variable = table.declare(let.name.text, "Function", function=let.value)
+                table._use(let, variable, table)
+                function_context = table.context_for(let.value)
+                pending.append((_FunctionBody(let.value), function_context))
+            else:
+                table._use(let, table.declare(let.name.text, "Var"), table)
+
+        elif isinstance(term, Function):
+            function_context = table.declare_anonymous(term)
+            pending.append((_FunctionBody(term), function_context))
 
+        elif isinstance(term, _FunctionBody):
+            for param in term.function.parameters:
+                table._use(param, table.declare(param.text, "Var", "FAST"), table)
+            pending.append((term.function.value, table))
 
-def create_symbol_table(term, table: SymbolTable = None):
-    if isinstance(term, File):
-        table = SymbolTable()
-        create_symbol_table(term.expression, table)
+        elif isinstance(term, Var):
+            table._use(term, *table.reference(term.text))
 
-    elif isinstance(term, Let) and not isinstance(term.value, Function):
-        table.declare(term.name.text, "Var")
-        create_symbol_table(term.next_term, table)
+        elif isinstance(term, Call):
+            pending.extend((arg, table) for arg in reversed(term.arguments))
+            pending.append((term.callee, table))
 
-    elif isinstance(term, Let) and isinstance(term.value, Function):
-        table.declare(term.name.text, "Function")
-        function_context = table.get_context(term.name.text)
-        for param in term.value.parameters:
-            function_context.declare(param.text, "Var", "FAST")
-        create_symbol_table(term.value.value, function_context)
-        create_symbol_table(term.next_term, table)
+        elif isinstance(term, Binary):
+            pending.append((term.rhs, table))
+            pending.append((term.lhs, table))
 
-    elif isinstance(term, Var):
-        table.reference(term.text)
+        elif isinstance(term, If):
+            pending.append((term.otherwise, table))
+            pending.append((term.then, table))
+            pending.append((term.condition, table))
 
-    elif isinstance(term, Call):
-        create_symbol_table(term.callee, table)
-        for arg in term.arguments:
-            create_symbol_table(arg, table)
+        elif isinstance(term, Tuple):
+            pending.append((term.second, table))
+            pending.append((term.first, table))
 
-    elif isinstance(term, Binary):
-        create_symbol_table(term.lhs, table)
-        create_symbol_table(term.rhs, table)
+        elif isinstance(term, (First, Second, Print)):
+            pending.append((term.value, table))
 
-    return table
+    if root is not None:
+        root.finalize()
+    return root
@@ -29,7 +29,8 @@ class TestSymbolTable(unittest.TestCase):
         """
         self.assertEqual(symbol_table.lookup("add").symbol_type, "Function")
         self.assertEqual(symbol_table.lookup("add").load_type, "NAME")
-        self.assertEqual(symbol_table.lookup("add").referenced_count, 0)
+        # Referenced once by the call inside the final print.
+        self.assertEqual(symbol_table.lookup("add").referenced_count, 1)
 
         self.assertEqual(symbol_table.lookup("minus").symbol_type, "Function")
         self.assertEqual(symbol_table.lookup("minus").load_type, "NAME")
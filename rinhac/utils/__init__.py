@@ -1,4 +1,16 @@
-from .print_ast import print_tree
-from .pyc_converter import code_to_pyc_bytecode
+import importlib
+
+_exports = {
+    "print_tree": ".print_ast",
+    "code_to_pyc_bytecode": ".pyc_converter",
+}
 
 __all__ = ["print_tree", "code_to_pyc_bytecode"]
+
+
+def __getattr__(name):
+    # Submodules are imported on first use, so the light ones (the compile
+    # cache, the pyc converter) do not pull in the AST classes.
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_exports[name], __name__), name)
@@ -0,0 +1,136 @@
+import time
+from types import CodeType
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("profile", "name", "wall_start", "cpu_start", "memory_start")
+
+    def __init__(self, profile: "BuildProfile", name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        if self.profile.memory:
+            import tracemalloc
+
+            tracemalloc.reset_peak()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        record = {"phase": self.name, "wall_ms": wall * 1e3, "cpu_ms": cpu * 1e3}
+        if self.profile.memory:
+            import tracemalloc
+
+            current, peak = tracemalloc.get_traced_memory()
+            record["peak_kib"] = (peak - self.memory_start) / 1024
+            record["retained_kib"] = (current - self.memory_start) / 1024
+        self.profile.phases.append(record)
+        return False
+
+
+class BuildProfile:
+    """Wall time, CPU time and tracemalloc peak of each build phase.
+
+    A disabled profile hands out one shared no-op context manager, so the
+    instrumented build pays a method call per phase and nothing else. Size
+    counts that need a walk of the tree should be guarded by ``enabled``.
+    """
+
+    def __init__(self, timings: bool = False, memory: bool = False):
+        self.enabled = timings or memory
+        self.memory = memory
+        self.phases: list[dict] = []
+        self.counts: dict[str, int] = {}
+        if memory:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def count(self, name: str, value: int):
+        self.counts[name] = value
+
+    def stop(self):
+        if self.memory:
+            import tracemalloc
+
+            tracemalloc.stop()
+
+    def to_dict(self) -> dict:
+        return {"phases": self.phases, "counts": self.counts}
+
+    def format_text(self) -> str:
+        header = f"{'phase':<20}{'wall (ms)':>11}{'cpu (ms)':>11}"
+        if self.memory:
+            header += f"{'peak (KiB)':>13}{'kept (KiB)':>13}"
+        lines = [header]
+        for record in self.phases:
+            line = f"{record['phase']:<20}{record['wall_ms']:>11.3f}{record['cpu_ms']:>11.3f}"
+            if self.memory:
+                line += f"{record['peak_kib']:>13.1f}{record['retained_kib']:>13.1f}"
+            lines.append(line)
+        wall = sum(record["wall_ms"] for record in self.phases)
+        cpu = sum(record["cpu_ms"] for record in self.phases)
+        lines.append(f"{'total':<20}{wall:>11.3f}{cpu:>11.3f}")
+        if self.counts:
+            lines.append(", ".join(f"{name} {value}" for name, value in self.counts.items()))
+        return "\n".join(lines)
+
+    def format(self, report_format: str) -> str:
+        if report_format == "json":
+            import json
+
+            return json.dumps(self.to_dict(), indent=4)
+        return self.format_text()
+
+
+def count_nodes(ast) -> int:
+    """Number of terms in ``ast``, the File included."""
+    from rinhac.ast import Term
+
+    count = 0
+    pending = [ast]
+    while pending:
+        term = pending.pop()
+        count += 1
+        for slot in term.__slots__:
+            value = getattr(term, slot)
+            if isinstance(value, Term):
+                pending.append(value)
+            elif isinstance(value, list):
+                pending.extend(item for item in value if isinstance(item, Term))
+    return count
+
+
+def count_instructions(code: CodeType) -> tuple[int, int]:
+    """Return (instructions, code objects) of ``code`` and its nested code."""
+    instructions = code_objects = 0
+    pending = [code]
+    while pending:
+        code = pending.pop()
+        code_objects += 1
+        instructions += len(code.co_code) // 2
+        pending.extend(const for const in code.co_consts if isinstance(const, CodeType))
+    return instructions, code_objects
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+from functools import cache
+from importlib.util import MAGIC_NUMBER
+from operator import attrgetter
+from rinhac import __version__
+from rinhac.utils.rinha_source import ast_name, source_path
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SKIPPED_DIRECTORIES = {"__pycache__", "test_data"}
+_ENTRY_SUFFIX = ".pyc"
+
+
+def default_cache_dir() -> str:
+    """``$RINHAC_CACHE_DIR``, or ``rinhac`` under the XDG cache directory."""
+    directory = os.environ.get("RINHAC_CACHE_DIR")
+    if directory:
+        return directory
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "rinhac")
+
+
+@cache
+def _compiler_fingerprint() -> bytes:
+    """Digest of the compiler sources, so edits invalidate cached output.
+
+    Like the interpreter's own ``.pyc`` checks it covers the size and
+    modification time of each source rather than its contents, which
+    saves reading them all on every cached run.
+    """
+    digest = hashlib.sha256()
+    pending = [""]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(os.path.join(_PACKAGE_DIR, directory)) as scan:
+            entries = sorted(scan, key=attrgetter("name"))
+        for entry in entries:
+            path = os.path.join(directory, entry.name)
+            if entry.is_dir():
+                if entry.name not in _SKIPPED_DIRECTORIES:
+                    pending.append(path)
+            elif entry.name.endswith(".py") and not entry.name.endswith("_test.py"):
+                stat = entry.stat()
+                digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+    return digest.digest()
+
+
+def line_source_data(ast_file: str, ast_data: bytes) -> bytes:
+    """The ``.rinha`` source line numbers are mapped against, for the key.
+
+    Empty when that is the AST file itself, whose bytes the key has anyway.
+    """
+    path = source_path(ast_file, ast_name(ast_data))
+    if path == ast_file:
+        return b""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+class CompileCache:
+    """Content-addressed store of compiled ``.pyc`` data.
+
+    Entries are keyed by a hash of the AST bytes, the Rinha source its line
+    numbers come from, the compiler version and sources, the interpreter
+    magic number and the build options. Entries are
+    written to a temporary file and renamed into place, so concurrent
+    builders only ever see complete files. Once the directory grows past
+    ``max_size`` bytes the least recently used entries are removed.
+    """
+
+    def __init__(self, directory: str | None = None, max_size: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory or default_cache_dir()
+        self.max_size = max_size
+
+    def key(self, ast_data: bytes, source_data: bytes = b"", **options) -> str:
+        """Key of ``ast_data`` built with ``options``; see ``line_source_data``."""
+        digest = hashlib.sha256()
+        digest.update(__version__.encode())
+        digest.update(MAGIC_NUMBER)
+        digest.update(_compiler_fingerprint())
+        digest.update(repr(sorted(options.items())).encode())
+        digest.update(hashlib.sha256(ast_data).digest())
+        digest.update(hashlib.sha256(source_data).digest())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        if not data.startswith(MAGIC_NUMBER):
+            return None
+        return data
+
+    def put(self, key: str, data: bytes, evict: bool = True):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_atomic(self._path(key), data)
+            if evict:
+                self.evict()
+        except OSError:
+            # The cache is an optimization; a read-only or full disk must not
+            # fail the build.
+            pass
+
+    def evict(self):
+        entries = []
+        total = 0
+        if not os.path.isdir(self.directory):
+            return
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(_ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def write_atomic(path: str, data: bytes):
+    """Write ``data`` to ``path`` so readers see either the old or new file."""
+    directory, name = os.path.split(os.path.abspath(path))
+    temporary_path = os.path.join(
+        directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from importlib.util import MAGIC_NUMBER
+from unittest import mock
+import rinhac.__main__ as rinhac_main
+from rinhac.utils.compile_cache import CompileCache
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+IF_ELSE_TEST_JSON = os.path.join(
+    _current_dir, "..", "test_data", "compiler", "if_else_test.json"
+)
+IF_ELSE_TEST_RINHA = os.path.join(
+    _current_dir, "..", "test_data", "compiler", "if_else_test.rinha"
+)
+
+
+class TestCompileCache(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_key(self):
+        cache = CompileCache(self.directory)
+        key = cache.key(b"{}", memoize=False)
+
+        self.assertEqual(cache.key(b"{}", memoize=False), key)
+        self.assertNotEqual(cache.key(b"{ }", memoize=False), key)
+        self.assertNotEqual(cache.key(b"{}", memoize=True), key)
+        self.assertNotEqual(cache.key(b"{}", b"let x = 1;", memoize=False), key)
+
+    def test_get_put(self):
+        cache = CompileCache(os.path.join(self.directory, "cache"))
+        data = MAGIC_NUMBER + b"code"
+
+        self.assertIsNone(cache.get("key"))
+        cache.put("key", data)
+        self.assertEqual(cache.get("key"), data)
+        self.assertEqual(os.listdir(cache.directory), ["key.pyc"])
+
+    def test_rejects_foreign_entries(self):
+        cache = CompileCache(self.directory)
+        cache.put("key", b"not a pyc")
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_evicts_least_recently_used(self):
+        cache = CompileCache(self.directory)
+        for age, key in enumerate(("old", "used", "new")):
+            cache.put(key, MAGIC_NUMBER + b"code")
+            os.utime(cache._path(key), (age, age))
+        cache.get("old")
+        cache.max_size = 2 * (len(MAGIC_NUMBER) + 4)
+        cache.evict()
+
+        self.assertEqual(sorted(os.listdir(self.directory)), ["new.pyc", "old.pyc"])
+
+    def test_build_hit_skips_compilation(self):
+        output = os.path.join(self.directory, "out.pyc")
+        with mock.patch.dict(os.environ, {"RINHAC_CACHE_DIR": self.directory}):
+            rinhac_main.build(IF_ELSE_TEST_JSON, output)
+            with open(output, "rb") as f:
+                pyc_data = f.read()
+            os.remove(output)
+
+            with mock.patch.object(rinhac_main, "_get_ast", side_effect=AssertionError):
+                rinhac_main.build(IF_ELSE_TEST_JSON, output)
+            with open(output, "rb") as f:
+                self.assertEqual(f.read(), pyc_data)
+
+            with mock.patch.object(
+                rinhac_main, "_get_ast", wraps=rinhac_main._get_ast
+            ) as get_ast:
+                rinhac_main.build(IF_ELSE_TEST_JSON, output, cache=False)
+                rinhac_main.build(IF_ELSE_TEST_JSON, output, memoize=True)
+            self.assertEqual(get_ast.call_count, 2)
+
+    def test_source_edit_misses(self):
+        # Line numbers come from the .rinha next to the AST, which the AST
+        # bytes do not cover.
+        ast_file = os.path.join(self.directory, "if_else_test.json")
+        source_file = os.path.join(self.directory, "if_else_test.rinha")
+        with open(IF_ELSE_TEST_JSON, "rb") as f:
+            ast_data = f.read()
+        with open(ast_file, "wb") as f:
+            # Only the copy next to the AST is found.
+            f.write(ast_data.replace(b"./rinhac/test_data/compiler/", b"missing/"))
+        output = os.path.join(self.directory, "out.pyc")
+        with mock.patch.dict(os.environ, {"RINHAC_CACHE_DIR": self.directory}), mock.patch.object(
+            rinhac_main, "_get_ast", wraps=rinhac_main._get_ast
+        ) as get_ast:
+            rinhac_main.build(ast_file, output)
+            shutil.copy(IF_ELSE_TEST_RINHA, source_file)
+            rinhac_main.build(ast_file, output)
+            rinhac_main.build(ast_file, output)
+            with open(source_file, "ab") as f:
+                f.write(b"\n")
+            rinhac_main.build(ast_file, output)
+
+        self.assertEqual(get_ast.call_count, 3)
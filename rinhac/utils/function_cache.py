@@ -0,0 +1,220 @@
+import marshal
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from importlib.util import MAGIC_NUMBER
+from types import CodeType
+from typing import TYPE_CHECKING, Optional
+from rinhac.ast import (
+    BinaryOp,
+    Var,
+    Function,
+    Call,
+    Let,
+    Str,
+    Int,
+    Binary,
+    Bool,
+    If,
+    Tuple,
+    First,
+    Second,
+    Print,
+    File,
+    LocationTable,
+)
+from rinhac.optimizer.type_inference import INT
+from rinhac.symbol_table import SymbolTable
+from rinhac.utils.compile_cache import (
+    DEFAULT_CACHE_SIZE,
+    CompileCache,
+    default_cache_dir,
+)
+
+if TYPE_CHECKING:
+    from rinhac.compiler import Compiler
+
+
+class FunctionCache(CompileCache):
+    """Persistent store of the code object compiled for each Rinha function.
+
+    Entries are keyed by ``function_keys`` and hold the marshalled code
+    object with the ``+`` and peephole statistics, the ``print`` count and
+    the ``/`` and ``%`` counts of its body, so a rebuild after an edit only compiles the functions whose
+    subtree or scope changed. Entries are not evicted on every store; the
+    build calls ``evict`` once at the end.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_size: int = DEFAULT_CACHE_SIZE):
+        super().__init__(directory or os.path.join(default_cache_dir(), "functions"), max_size)
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, key: str) -> Optional[tuple[CodeType, Counter, Counter, int, Counter]]:
+        data = self.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        try:
+            code, add_stats, rewrite_stats, print_count, division_stats = marshal.loads(
+                data[len(MAGIC_NUMBER):]
+            )
+        except (EOFError, ValueError, TypeError):
+            # Unreadable, or written by a version with another entry layout.
+            self.misses += 1
+            return None
+        self.hits += 1
+        return code, Counter(add_stats), Counter(rewrite_stats), print_count, Counter(division_stats)
+
+    def store(
+        self,
+        key: str,
+        code: CodeType,
+        add_stats: Counter,
+        rewrite_stats: Counter,
+        print_count: int,
+        division_stats: Counter,
+    ):
+        entry = (code, dict(add_stats), dict(rewrite_stats), print_count, dict(division_stats))
+        self.put(key, MAGIC_NUMBER + marshal.dumps(entry), evict=False)
+
+
+@dataclass(slots=True)
+class _Frame:
+    """Tokens of the function being hashed, nested functions as their keys."""
+
+    symbol_table: SymbolTable
+    parameters: list[str]
+    tokens: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class _EndFunction:
+    """Walk step that hashes a function once its whole body has been seen."""
+
+    function: Function
+    frame: _Frame
+    parent: _Frame
+
+
+def _push_function(
+    function: Function,
+    name: str,
+    location: int,
+    parent: _Frame,
+    compiler: "Compiler",
+    locations: LocationTable,
+    pending: list,
+):
+    table = parent.symbol_table.context_for(function)
+    parameters = [table.variable(param) for param in function.parameters]
+    frame = _Frame(table, parameters)
+    # Names are counted so that no list can run into the next one.
+    frame.tokens.extend(
+        [
+            name,
+            locations.lines[location],
+            locations.filename(location),
+            len(parameters),
+            *parameters,
+            len(table.cellvars),
+            *table.cellvars,
+            len(table.freevars),
+            *table.freevars,
+            compiler.tail_calls and compiler._can_eliminate_tail_calls(table),
+        ]
+    )
+    # What the parent emits around the code object.
+    parent.tokens.append(locations.lines[function.location])
+    parent.tokens.append(id(function) in compiler.memoized_functions)
+    pending.append(_EndFunction(function, frame, parent))
+    pending.append((function.value, frame))
+
+
+def function_keys(
+    term: File, symbol_table: SymbolTable, compiler: "Compiler", cache: CompileCache
+) -> dict[int, str]:
+    """Cache key of every function in ``term``, by ``id`` of its ``Function``.
+
+    A key covers everything ``Compiler`` reads while compiling the function:
+    the terms of its body and their line numbers, the variable each name in
+    it resolves to and how that is loaded, its cell and free variables, the types that specialize its
+    additions, whether its nested functions are memoized, and the keys of
+    those nested functions. The compiler options and sources are added by
+    ``cache.key``. The tree is walked once with an explicit stack.
+    """
+    locations = term.locations
+    lines = locations.lines
+    options = {
+        "backend": compiler.backend.version,
+        "tail_calls": compiler.tail_calls,
+        "memoize_cache_size": compiler.memoize_cache_size,
+        "types": compiler.types is not None,
+        "rewrites": sorted(compiler.optimizer.rewrites) if compiler.optimizer else None,
+    }
+    keys = {}
+    module = _Frame(symbol_table, [])
+    pending = [(term.expression, module)]
+    while pending:
+        task = pending.pop()
+        if isinstance(task, _EndFunction):
+            frame = task.frame
+            digest = "\0".join(map(str, frame.tokens)).encode()
+            key = keys[id(task.function)] = cache.key(digest, **options)
+            # The parent's code holds this function's code as a constant.
+            task.parent.tokens.append(key)
+            continue
+
+        node, frame = task
+        tokens = frame.tokens
+        tokens.append(type(node).__name__)
+        tokens.append(lines[node.location])
+        table = frame.symbol_table
+
+        if isinstance(node, Let) and isinstance(node.value, Function):
+            tokens.append(node.name.text)
+            tokens.append(table.variable(node))
+            tokens.append(table.load_type(table.variable(node)))
+            pending.append((node.next_term, frame))
+            _push_function(
+                node.value, node.name.text, node.location, frame, compiler, locations, pending
+            )
+        elif isinstance(node, Function):
+            _push_function(
+                node, SymbolTable.anonymous_context_name, node.location, frame, compiler, locations, pending
+            )
+        elif isinstance(node, Let):
+            tokens.append(table.variable(node))
+            tokens.append(table.load_type(table.variable(node)))
+            pending.append((node.next_term, frame))
+            pending.append((node.value, frame))
+        elif isinstance(node, Var):
+            tokens.append(table.variable(node))
+            tokens.append(table.load_type(table.variable(node)))
+        elif isinstance(node, Call):
+            tokens.append(len(node.arguments))
+            if isinstance(node.callee, Var):
+                tokens.append(table.is_recursive_reference(node.callee.text))
+            pending.extend((argument, frame) for argument in reversed(node.arguments))
+            pending.append((node.callee, frame))
+        elif isinstance(node, (Str, Int, Bool)):
+            tokens.append(repr(node.value))
+        elif isinstance(node, Binary):
+            tokens.append(node.op.name)
+            if node.op == BinaryOp.Add:
+                tokens.append(compiler._add_kind(node))
+                if compiler.types is not None:
+                    tokens.append(compiler.types.type_of(node.lhs) == INT)
+                    tokens.append(compiler.types.type_of(node.rhs) == INT)
+            pending.append((node.rhs, frame))
+            pending.append((node.lhs, frame))
+        elif isinstance(node, If):
+            pending.append((node.otherwise, frame))
+            pending.append((node.then, frame))
+            pending.append((node.condition, frame))
+        elif isinstance(node, Tuple):
+            pending.append((node.second, frame))
+            pending.append((node.first, frame))
+        elif isinstance(node, (First, Second, Print)):
+            pending.append((node.value, frame))
+    return keys
@@ -0,0 +1,121 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from types import CodeType
+from bytecode import Bytecode
+from rinhac.ast import Let
+from rinhac.ast.json_parser import load_ast
+from rinhac.compiler import Compiler
+from rinhac.optimizer import PeepholeOptimizer, infer_types
+from rinhac.runtime import close_output
+from rinhac.symbol_table import create_symbol_table
+from rinhac.utils.function_cache import FunctionCache
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+CLOSURES_TEST_JSON = os.path.join(
+    _current_dir, "..", "test_data", "compiler", "closures_test.json"
+)
+SHADOWING_TEST_JSON = os.path.join(
+    _current_dir, "..", "test_data", "compiler", "shadowing_test.json"
+)
+# Functions of closures_test.rinha, and those bound at its top level.
+FUNCTION_COUNT = 15
+TOP_LEVEL_FUNCTION_COUNT = 7
+
+
+def _load(json_path):
+    with open(json_path, "rb") as f:
+        return load_ast(f, json_path)
+
+
+def _load_closures_test():
+    return _load(CLOSURES_TEST_JSON)
+
+
+def _compile(ast, function_cache=None):
+    compiler = Compiler(
+        types=infer_types(ast), function_cache=function_cache, optimizer=PeepholeOptimizer()
+    )
+    code = compiler.to_bytecode(ast, Bytecode(), create_symbol_table(ast)).to_code()
+    return code, compiler
+
+
+def _lines(code):
+    """Line table of ``code`` and of the code objects nested in it."""
+    lines = [(code.co_filename, code.co_name, list(code.co_lines()))]
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            lines.extend(_lines(const))
+    return lines
+
+
+def _top_level_function(ast, name):
+    term = ast.expression
+    while not (isinstance(term, Let) and term.name.text == name):
+        term = term.next_term
+    return term.value
+
+
+class TestFunctionCache(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_rebuild_splices_cached_code(self):
+        expected, expected_compiler = _compile(_load_closures_test())
+
+        cache = FunctionCache(self.directory)
+        code, _ = _compile(_load_closures_test(), cache)
+        self.assertEqual((cache.hits, cache.misses), (0, FUNCTION_COUNT))
+        self.assertEqual(len(os.listdir(self.directory)), FUNCTION_COUNT)
+
+        # Only the top-level functions are looked up: their bodies, nested
+        # functions included, are not compiled at all.
+        cache = FunctionCache(self.directory)
+        rebuilt, compiler = _compile(_load_closures_test(), cache)
+        self.assertEqual((cache.hits, cache.misses), (TOP_LEVEL_FUNCTION_COUNT, 0))
+
+        self.assertEqual(code, expected)
+        self.assertEqual(rebuilt, expected)
+        self.assertEqual(_lines(rebuilt), _lines(expected))
+        self.assertEqual(compiler.add_stats, expected_compiler.add_stats)
+        self.assertEqual(compiler.optimizer.stats, expected_compiler.optimizer.stats)
+
+    def test_changed_function_is_compiled_again(self):
+        _compile(_load_closures_test(), FunctionCache(self.directory))
+
+        ast = _load_closures_test()
+        # ``let value = x * 2`` in ``doubled``, inside ``captured_in_let_value``.
+        doubled = _top_level_function(ast, "captured_in_let_value").value.value
+        doubled.value.value.rhs.value = 3
+        cache = FunctionCache(self.directory)
+        code, _ = _compile(ast, cache)
+
+        # The changed function and the one containing it are compiled; the
+        # other top-level functions come from the cache.
+        self.assertEqual((cache.hits, cache.misses), (TOP_LEVEL_FUNCTION_COUNT - 1, 2))
+        namespace = {}
+        exec(code, namespace)
+        self.assertEqual(namespace["captured_in_let_value"](21), 63)
+        self.assertEqual(namespace["nested_recursion"](10), 5)
+
+    def test_key_covers_shadowed_names(self):
+        _compile(_load(SHADOWING_TEST_JSON), FunctionCache(self.directory))
+
+        # Without the first ``let x``, the one ``latest`` reads is no longer
+        # a shadowing binding with a variable of its own.
+        ast = _load(SHADOWING_TEST_JSON)
+        ast.expression.name.text = "w"
+        code, _ = _compile(ast, FunctionCache(self.directory))
+        namespace = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                exec(code, namespace)
+            finally:
+                close_output(namespace)
+        self.assertEqual(namespace["latest"](), 2)
@@ -1,21 +1,41 @@
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_right
+from operator import methodcaller
+from typing import Any, Dict
+from rinhac.utils.rinha_source import source_path
+
+_NEWLINE = re.compile(b"\n")
+
+
 class IndexLineMapper:
+    """Maps byte offsets of a file to 1-based line numbers.
+
+    Line starts are kept in a sorted ``array`` built in one pass of the regex
+    engine over an mmap of the file, so lookups are a single bisect.
+    """
 
     def __init__(self, file_path):
         self.file_path = file_path
-        self.index_line_map = {}
+        self.size = os.path.getsize(file_path)
+        self.line_starts = array("q", [0])
 
-        with open(self.file_path) as f:
-            char_count = 0
-            for index, line in enumerate(f):
-                line_number = index + 1
-                self.index_line_map[line_number] = {}
-                self.index_line_map[line_number]['start'] = char_count
-                char_count += len(line)
-                self.index_line_map[line_number]['end'] = char_count - 1
+        if self.size:
+            with open(self.file_path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as source:
+                self.line_starts.extend(
+                    map(methodcaller("end"), _NEWLINE.finditer(source))
+                )
 
+    @classmethod
+    def for_ast(cls, ast_file_path: str, json_ast: Dict[str, Any]) -> "IndexLineMapper":
+        """Index the Rinha source the AST was parsed from, when it is around."""
+        return cls(source_path(ast_file_path, json_ast.get("name")))
 
     def get_line_number(self, char_index: int) -> int:
-        for index, line in self.index_line_map.items():
-            if line['start'] <= char_index <= line['end']:
-                return index
-        raise Exception('char_index out of bounds')
+        if not 0 <= char_index < self.size:
+            raise Exception('char_index out of bounds')
+        return bisect_right(self.line_starts, char_index)
@@ -0,0 +1,67 @@
+import json
+import os
+import unittest
+from rinhac.utils.index_line_mapper import IndexLineMapper
+from rinhac.utils.rinha_source import ast_name
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+IF_ELSE_TEST_RINHA = os.path.join(
+    _current_dir, "..", "test_data", "compiler", "if_else_test.rinha"
+)
+IF_ELSE_TEST_JSON = os.path.join(
+    _current_dir, "..", "test_data", "compiler", "if_else_test.json"
+)
+OPERATORS_TEST_RINHA = os.path.join(
+    _current_dir, "..", "test_data", "compiler", "operators_test.rinha"
+)
+
+
+class TestIndexLineMapper(unittest.TestCase):
+    def test_get_line_number(self):
+        index_line_mapper = IndexLineMapper(IF_ELSE_TEST_RINHA)
+        with open(IF_ELSE_TEST_RINHA, "rb") as f:
+            source = f.read()
+
+        for offset in range(len(source)):
+            self.assertEqual(
+                index_line_mapper.get_line_number(offset),
+                source.count(b"\n", 0, offset) + 1,
+            )
+        with self.assertRaises(Exception):
+            index_line_mapper.get_line_number(len(source))
+        with self.assertRaises(Exception):
+            index_line_mapper.get_line_number(-1)
+
+    def test_byte_offsets(self):
+        # The Rinha parser reports byte offsets; this file has accented comments.
+        index_line_mapper = IndexLineMapper(OPERATORS_TEST_RINHA)
+        with open(OPERATORS_TEST_RINHA, "rb") as f:
+            source = f.read()
+
+        offset = source.index(b"let or_fn")
+        self.assertEqual(index_line_mapper.get_line_number(offset), 57)
+        self.assertNotEqual(source.decode().index("let or_fn"), offset)
+
+    def test_for_ast_indexes_source(self):
+        with open(IF_ELSE_TEST_JSON) as f:
+            json_ast = json.load(f)
+        index_line_mapper = IndexLineMapper.for_ast(IF_ELSE_TEST_JSON, json_ast)
+
+        self.assertTrue(index_line_mapper.file_path.endswith("if_else_test.rinha"))
+        print_offset = json_ast["expression"]["next"]["location"]["start"]
+        self.assertEqual(index_line_mapper.get_line_number(print_offset), 10)
+
+    def test_for_ast_falls_back_to_ast_file(self):
+        index_line_mapper = IndexLineMapper.for_ast(IF_ELSE_TEST_JSON, {"name": "missing.rinha"})
+
+        self.assertEqual(index_line_mapper.file_path, IF_ELSE_TEST_JSON)
+
+    def test_ast_name(self):
+        with open(IF_ELSE_TEST_JSON, "rb") as f:
+            ast_data = f.read()
+
+        self.assertEqual(ast_name(ast_data), json.loads(ast_data)["name"])
+        # ``let`` names are objects; escapes are decoded.
+        ast_data = b'{"expression": {"name": {"text": "x"}}, "name" : "a\\"b.rinha"}'
+        self.assertEqual(ast_name(ast_data), 'a"b.rinha')
+        self.assertIsNone(ast_name(b'{"expression": {"name": {"text": "x"}}}'))
@@ -16,63 +16,76 @@ from rinhac.ast.ast_objects import (
 )
 
 
-def print_tree(node, depth=0):
-    prefix = "│   " * (depth - 1) + "├─ " if depth > 0 else ""
+def _format_node(node, lines):
+    if isinstance(node, File):
+        return f"[File {node.name}] ({lines[node.location]})"
+    elif isinstance(node, Var):
+        return f"Var {node.text} ({lines[node.location]})"
+    elif isinstance(node, Function):
+        params = " ".join(param.text for param in node.parameters)
+        return f"Function {params} ({lines[node.location]})"
+    elif isinstance(node, Call):
+        return "Call"
+    elif isinstance(node, Let):
+        return f"Let {node.name.text} ({lines[node.location]})"
+    elif isinstance(node, Str):
+        return f'String "{node.value}"'
+    elif isinstance(node, Int):
+        return f"Int {node.value} ({lines[node.location]})"
+    elif isinstance(node, Binary):
+        return f"Binary Operator {node.op.value} ({lines[node.location]})"
+    elif isinstance(node, Bool):
+        return f"Bool {node.value} ({lines[node.location]})"
+    elif isinstance(node, If):
+        return f"If ({lines[node.location]})"
+    elif isinstance(node, Tuple):
+        return f"Tuple ({lines[node.location]})"
+    elif isinstance(node, First):
+        return f"First ({lines[node.location]})"
+    elif isinstance(node, Second):
+        return f"Second ({lines[node.location]})"
+    elif isinstance(node, Print):
+        return f"Print ({lines[node.location]})"
+
+
+class _Line(str):
+    """A literal line queued between the children of a node."""
+
+
+def print_tree(node, depth=0, locations=None):
+    """Print the tree under ``node``; ``locations`` defaults to the ``File``'s table."""
+    lines = (locations if locations is not None else node.locations).lines
+    pending = [(node, depth)]
+    while pending:
+        node, depth = pending.pop()
+        if isinstance(node, _Line):
+            print(node)
+            continue
 
-    def format_node(node):
+        prefix = "│   " * (depth - 1) + "├─ " if depth > 0 else ""
+        print(f"{prefix}{_format_node(node, lines)}")
+
+        children = []
         if isinstance(node, File):
-            return f"[File {node.name}] ({node.location.line_number})"
-        elif isinstance(node, Var):
-            return f"Var {node.text} ({node.location.line_number})"
+            children = [(node.expression, depth + 1)]
         elif isinstance(node, Function):
-            params = " ".join(param.text for param in node.parameters)
-            return f"Function {params} ({node.location.line_number})"
+            children = [(node.value, depth + 1)]
         elif isinstance(node, Call):
-            return "Call"
+            children = [(node.callee, depth + 1)]
+            children.extend((arg, depth + 2) for arg in node.arguments)
         elif isinstance(node, Let):
-            return f"Let {node.name.text} ({node.location.line_number})"
-        elif isinstance(node, Str):
-            return f'String "{node.value}"'
-        elif isinstance(node, Int):
-            return f"Int {node.value} ({node.location.line_number})"
+            children = [(node.value, depth + 1), (node.next_term, depth)]
         elif isinstance(node, Binary):
-            return f"Binary Operator {node.op.value} ({node.location.line_number})"
-        elif isinstance(node, Bool):
-            return f"Bool {node.value} ({node.location.line_number})"
+            children = [(node.lhs, depth + 1), (node.rhs, depth + 1)]
         elif isinstance(node, If):
-            return f"If ({node.location.line_number})"
+            children = [
+                (node.condition, depth + 1),
+                (node.then, depth + 1),
+                (_Line(prefix + "otherwise"), depth),
+                (node.otherwise, depth + 1),
+            ]
         elif isinstance(node, Tuple):
-            return f"Tuple ({node.location.line_number})"
-        elif isinstance(node, First):
-            return f"First ({node.location.line_number})"
-        elif isinstance(node, Second):
-            return f"Second ({node.location.line_number})"
-        elif isinstance(node, Print):
-            return f"Print ({node.location.line_number})"
-
-    print(f"{prefix}{format_node(node)}")
-
-    if isinstance(node, File):
-        print_tree(node.expression, depth + 1)
-    elif isinstance(node, Function):
-        print_tree(node.value, depth + 1)
-    elif isinstance(node, Call):
-        print_tree(node.callee, depth + 1)
-        for arg in node.arguments:
-            print_tree(arg, depth + 2)
-    elif isinstance(node, Let):
-        print_tree(node.value, depth + 1)
-        print_tree(node.next_term, depth)
-    elif isinstance(node, Binary):
-        print_tree(node.lhs, depth + 1)
-        print_tree(node.rhs, depth + 1)
-    elif isinstance(node, If):
-        print_tree(node.condition, depth + 1)
-        print_tree(node.then, depth + 1)
-        print(prefix + "otherwise")
-        print_tree(node.otherwise, depth + 1)
-    elif isinstance(node, Tuple):
-        print_tree(node.first, depth + 1)
-        print_tree(node.second, depth + 1)
-    elif isinstance(node, First) or isinstance(node, Second) or isinstance(node, Print):
-        print_tree(node.value, depth + 1)
+            children = [(node.first, depth + 1), (node.second, depth + 1)]
+        elif isinstance(node, First) or isinstance(node, Second) or isinstance(node, Print):
+            children = [(node.value, depth + 1)]
+        pending.extend(reversed(children))
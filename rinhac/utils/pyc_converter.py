@@ -30,3 +30,11 @@ def code_to_pyc_bytecode(code, mtime=0, source_size=0):
     data.extend(marshal.dumps(code))
 
     return data
+
+
+def pyc_bytecode_to_code(data):
+    """Load the code object from .pyc data written by code_to_pyc_bytecode"""
+    if not data.startswith(MAGIC_NUMBER):
+        raise ValueError("bad magic number in .pyc data")
+    header_size = 16 if sys.version_info >= (3, 7) else 12
+    return marshal.loads(memoryview(data)[header_size:])
@@ -0,0 +1,74 @@
+"""Where the Rinha source of an AST file is.
+
+Kept apart from ``index_line_mapper`` with nothing but ``os`` imported, as
+the compile cache looks the source up on every cached run.
+"""
+import os
+
+_NAME_MEMBER = b'"name"'
+_WHITESPACE = b" \t\r\n"
+
+
+def source_path(ast_file_path: str, name: str | None) -> str:
+    """The file whose offsets the locations of an AST named ``name`` are.
+
+    AST locations are offsets into the ``.rinha`` source, so that is the
+    file to index. Falls back to the AST file itself when the source
+    cannot be found next to it or at the path recorded in the AST.
+    """
+    ast_directory = os.path.dirname(ast_file_path)
+    candidates = [os.path.splitext(ast_file_path)[0]]
+    if name:
+        candidates += [name, os.path.join(ast_directory, os.path.basename(name))]
+
+    for candidate in candidates:
+        if candidate.endswith(".rinha") and os.path.isfile(candidate):
+            return candidate
+    return ast_file_path
+
+
+def _skip_whitespace(data: bytes, position: int) -> int:
+    while position < len(data) and data[position] in _WHITESPACE:
+        position += 1
+    return position
+
+
+def _string_end(data: bytes, position: int) -> int:
+    """Index of the quote closing the JSON string opened at ``position``."""
+    end = data.find(b'"', position + 1)
+    while end != -1:
+        backslashes = 0
+        while data[end - 1 - backslashes] == ord("\\"):
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end
+        end = data.find(b'"', end + 1)
+    return -1
+
+
+def ast_name(ast_data: bytes) -> str | None:
+    """The ``name`` of the JSON AST ``ast_data``, without decoding the rest.
+
+    Only the file object has a string ``name``; those of ``let``s are
+    objects and are skipped.
+    """
+    index = ast_data.find(_NAME_MEMBER)
+    while index != -1:
+        position = _skip_whitespace(ast_data, index + len(_NAME_MEMBER))
+        if ast_data[position:position + 1] == b":":
+            position = _skip_whitespace(ast_data, position + 1)
+            if ast_data[position:position + 1] == b'"':
+                end = _string_end(ast_data, position)
+                if end == -1:
+                    return None
+                value = ast_data[position:end + 1]
+                if b"\\" not in value:
+                    return value[1:-1].decode(errors="replace")
+                import json
+
+                try:
+                    return json.loads(value)
+                except ValueError:
+                    return None
+        index = ast_data.find(_NAME_MEMBER, index + 1)
+    return None
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+_IMPORT_TIME_PREFIX = "import time:"
+
+
+@dataclass(slots=True)
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    @property
+    def package(self) -> str:
+        return self.module.split(".")[0]
+
+
+def parse_import_time(lines) -> list[ImportRecord]:
+    """Parse ``-X importtime`` output, skipping the header and other lines."""
+    records = []
+    for line in lines:
+        if not line.startswith(_IMPORT_TIME_PREFIX):
+            continue
+        fields = line[len(_IMPORT_TIME_PREFIX):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        records.append(
+            ImportRecord(
+                module=module,
+                self_us=int(fields[0]),
+                cumulative_us=int(fields[1]),
+                depth=(len(name) - len(module) - 1) // 2,
+            )
+        )
+    return records
+
+
+def summarize(records: list[ImportRecord], wall_time: float, top: int = 15) -> str:
+    total_us = sum(record.self_us for record in records)
+    lines = [
+        f"startup profile: {wall_time * 1e3:.1f} ms wall, "
+        f"{total_us / 1e3:.1f} ms importing {len(records)} modules",
+        f"{'self (ms)':>11}{'cumulative (ms)':>17}  module",
+    ]
+    for record in sorted(records, key=lambda record: record.self_us, reverse=True)[:top]:
+        lines.append(
+            f"{record.self_us / 1e3:>11.2f}{record.cumulative_us / 1e3:>17.2f}  {record.module}"
+        )
+
+    packages: dict[str, int] = {}
+    for record in records:
+        packages[record.package] = packages.get(record.package, 0) + record.self_us
+    by_package = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    lines.append(
+        "by package: "
+        + ", ".join(f"{package} {self_us / 1e3:.1f}" for package, self_us in by_package[:top])
+    )
+    return "\n".join(lines)
+
+
+def profile_startup(argv: list[str]) -> int:
+    """Run ``python -m rinhac <argv>`` under ``-X importtime`` and summarize it.
+
+    The program output is passed through; the summary goes to stderr.
+    """
+    command = [sys.executable, "-X", "importtime", "-m", "rinhac", *argv]
+    start = time.perf_counter()
+    process = subprocess.run(command, stderr=subprocess.PIPE, text=True)
+    wall_time = time.perf_counter() - start
+
+    stderr_lines = process.stderr.splitlines()
+    for line in stderr_lines:
+        if not line.startswith(_IMPORT_TIME_PREFIX):
+            print(line, file=sys.stderr)
+    print(summarize(parse_import_time(stderr_lines), wall_time), file=sys.stderr)
+    return process.returncode
@@ -1,8 +1,12 @@
 #!/bin/sh
 
 if [ "$#" -eq 0 ]; then
-  python -m rinhac -b /var/rinha/source.rinha.json
-  python /var/rinha/source.rinha.pyc
+  if [ -n "$RINHAC_SOCKET" ]; then
+    # Runs on a 'rinhac serve' daemon, or locally when none is listening.
+    python -m rinhac.client /var/rinha/source.rinha.json
+  else
+    python -m rinhac run /var/rinha/source.rinha.json
+  fi
 else
   python -m rinhac "$@"
 fi